@@ -0,0 +1,1324 @@
+"""
+ani_format.py - Reading and writing of .ani animation files for the panel
+
+.ani v1 is the original text format. A quoted comment block, the FPS, Length, Type, and Side_Length lines and then one
+line per frame of "index r g b, " records. Every pixel of every frame has to be split and int() parsed on playback.
+A frame is shown for 1 / fps seconds, frames that change nothing are empty lines.
+
+.ani v2 is a binary container holding the same information so a frame can be decoded straight out of a memory map
+with no string parsing at all
+
+    header      magic "ANI2", version u8, type u8, side_length u16, fps f64, length u32, frame_count u32, index_offset u32
+    frames      per frame: encoding u8, count u16 followed by
+                    FRAME_DELTA - count records of (index u16, r u8, g u8, b u8)
+                    FRAME_FULL  - count pixels of (r u8, g u8, b u8) in strip order
+                    FRAME_HOLD  - nothing, the panel is left as it is for count more 1 / fps steps
+                    FRAME_OPS   - count bytes of drawing ops, each an opcode u8 followed by
+                        OP_PIXELS     record_count u16 then record_count (index u16, r u8, g u8, b u8) records
+                        OP_FILL_RUN   start u16, length u16, r u8, g u8, b u8
+                        OP_COPY_RUN   source u16, destination u16, length u16
+                        OP_FILL_RECT  x u8, y u8, width u8, height u8, r u8, g u8, b u8
+                        OP_COPY_RECT  source_x u8, source_y u8, width u8, height u8, x u8, y u8
+                    FRAME_INDEXED_FULL  - count bytes of palette_size u16, palette_size (r u8, g u8, b u8) colors and
+                                          a palette index u8 per pixel in strip order
+                    FRAME_INDEXED_DELTA - count bytes of added u16, added (r u8, g u8, b u8) colors appended to the
+                                          palette, then the changed pixels as index u16s followed by their palette
+                                          index u8s (in the same order)
+                    FRAME_BLOCK - count is the codec (index in BLOCK_CODECS), followed by compressed_size u32, raw_size
+                                  u32 and compressed_size bytes that decompress to raw_size bytes of whole frames
+    index       frame_count u32 offsets (from the start of the file) of every frame, written by finalize_ani_file
+    keyframes   keyframe_count u32 followed by the u32 frame numbers of every FRAME_FULL/FRAME_INDEXED_FULL frame
+
+Every FRAME_DELTA/FRAME_FULL frame is shown for one 1 / fps step and a FRAME_HOLD keeps the frame before it up for
+count more, so a frame's duration is 1 plus the holds after it. Writers collapse runs of identical frames (empty deltas)
+into a single hold and frames that last a different amount of time each (gifs) are a frame plus a hold at a small step,
+players sleep through a hold in one go rather than waking and showing the same panel every step. length in the header is
+the number of steps the file plays for and frame_count the number of frames (holds included) in the index.
+
+Drawing ops describe motion a delta would have to spell out pixel by pixel (a scroll or shift is one copy, a cleared
+area one fill). Runs are in strip order, rects are on the panel grid, the strip's own layout before any rotation: column
+x is the x'th side_length pixels of the strip and y counts from the end the even columns start at, so cell (x, y) is
+strip index x * side_length + y for even x and x * side_length + side_length - 1 - y for odd x (panel_geometry's frame
+with rotate_k 0). Ops run in order and a copy reads the panel as it was before that op, so overlapping copies scroll.
+
+Palette indexed frames store a color once and then a single byte per pixel that uses it. Every keyframe starts the
+palette over, a FRAME_INDEXED_FULL with its own palette and a FRAME_FULL with an empty one, and indexed deltas append
+the colors they bring in, so the palette a frame refers to is always rebuilt by replaying from its keyframe. Writers only
+use an indexed frame when it's smaller than the rgb one (a palette holds at most 256 colors).
+
+Frames can be compressed in blocks of about BLOCK_BYTES with zlib (or zstd when the zstandard package is installed) so
+less has to be read off a slow SD card. Frame offsets always point where a frame sits once every block is replaced by the
+frames it holds, so AniReader decompresses every block when the file is opened, before a single frame is played, and
+reads the result exactly like an uncompressed file. compression_stats() measures what each codec would do for a file.
+
+Everything is little endian. A file that was never finalized (index_offset of 0) is still playable, the reader just walks
+the frames to build the index itself, and files written before the keyframe table existed get theirs from the frame
+headers the first time it's needed.
+
+Delta frames only hold what changed so reaching frame n means applying every frame before it. To keep that bounded v2
+files get a keyframe (a FRAME_FULL or FRAME_INDEXED_FULL frame of the whole panel) at least every keyframe_interval
+frames, so seeking only replays the frames from the last keyframe at or before n (AniReader.seek) however long the file
+is.
+
+AniWriter writes either version through a single buffered handle into a hidden temporary file next to the destination
+and renames it into place once the last frame is written, so a half written .ani never shows up where players look.
+The fps and length can be left out when the source is streamed, they are patched into the header when it's closed.
+
+"""
+
+import itertools
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from bisect import bisect_right
+from functools import partial
+
+
+ANI_V2_MAGIC = b"ANI2"
+ANI_V2_VERSION = 2
+
+ANI_V2_HEADER = struct.Struct("<4sBBHdIII")
+FRAME_HEADER = struct.Struct("<BH")
+DELTA_RECORD = struct.Struct("<HBBB")
+
+# frame encodings
+FRAME_DELTA = 0
+FRAME_FULL = 1
+FRAME_HOLD = 2
+FRAME_OPS = 3
+FRAME_INDEXED_FULL = 4
+FRAME_INDEXED_DELTA = 5
+FRAME_BLOCK = 6
+
+# frames that set every pixel (and start the palette over)
+KEYFRAME_ENCODINGS = (FRAME_FULL, FRAME_INDEXED_FULL)
+
+# most colors a palette can hold (indexes are a byte)
+MAX_PALETTE_COLORS = 256
+PALETTE_SIZE = struct.Struct("<H")
+
+# drawing ops of a FRAME_OPS frame and the fields following each opcode
+OP_PIXELS = 0
+OP_FILL_RUN = 1
+OP_COPY_RUN = 2
+OP_FILL_RECT = 3
+OP_COPY_RECT = 4
+
+OP_FIELDS = {
+    OP_PIXELS: struct.Struct("<H"),
+    OP_FILL_RUN: struct.Struct("<HHBBB"),
+    OP_COPY_RUN: struct.Struct("<HHH"),
+    OP_FILL_RECT: struct.Struct("<BBBBBBB"),
+    OP_COPY_RECT: struct.Struct("<BBBBBB"),
+}
+
+# largest body of the frames whose count is their size in bytes (FRAME_OPS and the indexed frames)
+MAX_BODY_BYTES = 0xFFFF
+
+# codecs a FRAME_BLOCK can be compressed with (the count of the frame is the index in this list)
+BLOCK_CODECS = [None, "zlib", "zstd"]
+BLOCK_HEADER = struct.Struct("<II")
+
+# raw bytes of frames gathered before they're compressed as a block (a block always ends on a whole frame)
+BLOCK_BYTES = 1 << 16
+
+# blocks are compressed once and decompressed on every play, so the slowest (smallest) levels are used
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+
+# longest hold one FRAME_HOLD can carry (count is a u16), longer holds are written as several
+MAX_HOLD_STEPS = 0xFFFF
+
+# most frames written between keyframes (each keyframe costs a full frame, side_length * side_length * 3 bytes)
+KEYFRAME_INTERVAL = 60
+
+# the Type: line of a v1 file stored as a single byte in v2 (index in this list)
+ANI_TYPES = ["images", "text", "gif", "effect", "clock", "image", "video"]
+
+# characters reserved for the FPS:/Length: values of a v1 header that are only known once every frame is written
+V1_PATCHED_FIELD_WIDTH = 24
+
+
+"""
+Function_Helper: type_to_code - converts a .ani Type string to the byte stored in a v2 header
+Expects: kind be one of ANI_TYPES
+Does: Returns the index of kind in ANI_TYPES
+"""
+def type_to_code(kind):
+    try:
+        return ANI_TYPES.index(kind)
+    except ValueError:
+        raise ValueError("Unknown .ani type: " + str(kind))
+
+
+"""
+Function_Helper: codec_to_code - converts a block codec name to the count stored in a FRAME_BLOCK
+Expects: codec be one of BLOCK_CODECS other than None
+Does: Returns the index of codec in BLOCK_CODECS
+"""
+def codec_to_code(codec):
+    if codec not in BLOCK_CODECS[1:]:
+        raise ValueError("Unknown .ani block codec: " + str(codec))
+    return BLOCK_CODECS.index(codec)
+
+
+"""
+Function_Helper: load_codec - returns the functions that compress and decompress a FRAME_BLOCK of a codec
+Expects: codec be one of BLOCK_CODECS other than None
+Does: Returns (compress, decompress), zstd comes from Python's compression.zstd (3.14+) or the zstandard package and
+raises a ValueError when neither is installed
+"""
+def load_codec(codec):
+    if codec == "zlib":
+        return partial(zlib.compress, level=ZLIB_LEVEL), zlib.decompress
+
+    if codec == "zstd":
+        try:
+            from compression import zstd
+            return partial(zstd.compress, level=ZSTD_LEVEL), zstd.decompress
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compressed .ani files need the zstandard package (pip install zstandard)") from None
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress, zstandard.ZstdDecompressor().decompress
+
+    raise ValueError("Unknown .ani block codec: " + str(codec))
+
+
+"""
+Function_Helper: codec_available - checks whether a block codec can be used on this machine
+Expects: codec be one of BLOCK_CODECS other than None
+Does: Returns True when load_codec() finds the codec's module (zlib always is, zstd needs zstandard or Python 3.14+)
+"""
+def codec_available(codec):
+    try:
+        load_codec(codec)
+    except ValueError:
+        return False
+    return True
+
+
+"""
+Function_Helper: encode_block - compresses whole frames into a v2 FRAME_BLOCK
+Expects: code be the codec's codec_to_code, compress its load_codec compress function, and frames the raw frame bytes
+Does: Returns the bytes of the block (frame header, block header, and the compressed frames)
+"""
+def encode_block(code, compress, frames):
+    data = compress(bytes(frames))
+    return FRAME_HEADER.pack(FRAME_BLOCK, code) + BLOCK_HEADER.pack(len(data), len(frames)) + data
+
+
+"""
+Function_Helper: encode_ani_header - returns the bytes of a .ani header
+Expects: fps be a number, length a frame count, kind one of ANI_TYPES, and version 1 or 2
+Does: Returns the v1 text header or the v2 binary header holding frame_count and index_offset
+"""
+def encode_ani_header(fps, length, kind, side_length, version=ANI_V2_VERSION, frame_count=0, index_offset=0):
+    if version == 1:
+        return ("\"\n\"\nFPS: " + str(fps) + "\nLength: " + str(length) + "\nType: " + str(kind)
+                + "\nSide_Length: " + str(side_length) + "\n").encode()
+
+    return ANI_V2_HEADER.pack(ANI_V2_MAGIC, ANI_V2_VERSION, type_to_code(kind), int(side_length), float(fps),
+                              int(length), frame_count, index_offset)
+
+
+"""
+Function: write_ani_header - Creates (or truncates) the .ani file at file_path and writes the metadata header to it
+Expects: file_path be writable, fps be a number, length a frame count, kind one of ANI_TYPES, and version 1 or 2
+Does: Writes the v1 text header or the v2 binary header (frame_count/index_offset are patched by finalize_ani_file)
+"""
+def write_ani_header(file_path, fps, length, kind, side_length, version=ANI_V2_VERSION):
+    with open(file_path, "wb") as file:
+        file.write(encode_ani_header(fps, length, kind, side_length, version))
+
+
+"""
+Function: encode_v1_frame - formats pixel records as a v1 text frame line
+Expects: records be an iterable of (index, r, g, b) tuples
+Does: Returns the frame line (including its newline)
+"""
+def encode_v1_frame(records):
+    return " " + "".join(f"{index} {r} {g} {b}, " for index, r, g, b in records) + "\n"
+
+
+"""
+Function: encode_delta_frame - packs a list of changed pixels into a v2 FRAME_DELTA block
+Expects: records be an iterable of (index, r, g, b) tuples in the order they should be applied
+Does: Returns the bytes of the frame (frame header followed by the packed records)
+"""
+def encode_delta_frame(records):
+    body = bytearray()
+    count = 0
+    for index, r, g, b in records:
+        body += DELTA_RECORD.pack(index, r, g, b)
+        count += 1
+
+    return FRAME_HEADER.pack(FRAME_DELTA, count) + body
+
+
+"""
+Function: encode_full_frame - packs every pixel of a frame into a v2 FRAME_FULL block
+Expects: pixels be an iterable of (r, g, b) tuples in strip order covering the whole panel
+Does: Returns the bytes of the frame (frame header followed by the packed RGB triplets)
+"""
+def encode_full_frame(pixels):
+    body = bytearray()
+    for r, g, b in pixels:
+        body += bytes((r, g, b))
+
+    return FRAME_HEADER.pack(FRAME_FULL, len(body) // 3) + body
+
+
+"""
+Function: encode_indexed_full_frame - packs a whole panel and its palette into a v2 FRAME_INDEXED_FULL block
+Expects: palette be a list of at most MAX_PALETTE_COLORS (r, g, b) tuples and palette_indexes the palette index of every
+pixel in strip order
+Does: Returns the bytes of the frame (frame header followed by the palette and the index bytes)
+"""
+def encode_indexed_full_frame(palette, palette_indexes):
+    body = bytearray(PALETTE_SIZE.pack(len(palette)))
+    for color in palette:
+        body += bytes(color)
+    body += bytes(palette_indexes)
+
+    return FRAME_HEADER.pack(FRAME_INDEXED_FULL, len(body)) + body
+
+
+"""
+Function: encode_indexed_delta_frame - packs changed pixels into a v2 FRAME_INDEXED_DELTA block
+Expects: added be the (r, g, b) colors appended to the palette by this frame, indexes the changed strip indexes, and
+palette_indexes the palette index of each (after the colors are added)
+Does: Returns the bytes of the frame (frame header followed by the added colors, the u16 indexes, and the index bytes)
+"""
+def encode_indexed_delta_frame(added, indexes, palette_indexes):
+    body = bytearray(PALETTE_SIZE.pack(len(added)))
+    for color in added:
+        body += bytes(color)
+    body += struct.pack("<%dH" % len(indexes), *indexes)
+    body += bytes(palette_indexes)
+
+    return FRAME_HEADER.pack(FRAME_INDEXED_DELTA, len(body)) + body
+
+
+"""
+Function: encode_ops_frame - packs drawing ops into a v2 FRAME_OPS block
+Expects: ops be a list of op tuples, (OP_PIXELS, records) or the opcode followed by its OP_FIELDS values
+Does: Returns the bytes of the frame (frame header followed by the packed ops)
+"""
+def encode_ops_frame(ops):
+    body = bytearray()
+    for op in ops:
+        body.append(op[0])
+        if op[0] == OP_PIXELS:
+            records = list(op[1])
+            body += OP_FIELDS[OP_PIXELS].pack(len(records))
+            for index, r, g, b in records:
+                body += DELTA_RECORD.pack(index, r, g, b)
+        else:
+            body += OP_FIELDS[op[0]].pack(*op[1:])
+
+    return FRAME_HEADER.pack(FRAME_OPS, len(body)) + body
+
+
+"""
+Function_Helper: decode_ops - unpacks the body of a FRAME_OPS block
+Expects: body be the bytes (or a view of them) after the frame header
+Does: Yields the op tuples encode_ops_frame was given (OP_PIXELS records are a lazy iterator over body)
+"""
+def decode_ops(body):
+    offset = 0
+    while offset < len(body):
+        opcode = body[offset]
+        fields = OP_FIELDS.get(opcode)
+        if fields is None:
+            raise ValueError("Unknown .ani drawing op: " + str(opcode))
+        values = fields.unpack_from(body, offset + 1)
+        offset += 1 + fields.size
+
+        if opcode == OP_PIXELS:
+            end = offset + values[0] * DELTA_RECORD.size
+            yield OP_PIXELS, DELTA_RECORD.iter_unpack(body[offset:end])
+            offset = end
+        else:
+            yield (opcode,) + values
+
+
+"""
+Function_Helper: grid_column_run - returns the strip indexes a column of grid cells covers
+Expects: x, y, and height describe cells (x, y) to (x, y + height - 1) of a side_length panel grid
+Does: Returns (start, stop, reversed), the cells are strip indexes start to stop - 1, in the opposite order if reversed
+"""
+def grid_column_run(side_length, x, y, height):
+    if x % 2 == 0:
+        start = x * side_length + y
+        return start, start + height, False
+    start = x * side_length + side_length - y - height
+    return start, start + height, True
+
+
+"""
+Function_Helper: reverse_pixels - reverses the order of the rgb triplets in data
+Expects: data be packed rgb bytes
+Does: Returns a bytearray of the same pixels last to first
+"""
+def reverse_pixels(data):
+    reversed_data = bytearray(len(data))
+    for channel in range(3):
+        reversed_data[channel::3] = data[channel::3][::-1]
+    return reversed_data
+
+
+"""
+Function: apply_ops - Runs drawing ops on a panel
+Expects: panel be a bytearray of rgb triplets in strip order, side_length the panels side length, and ops op tuples
+Does: Updates panel with slice assignments (whole runs and rect columns at a time) and returns the strip indexes whose
+color changed, ascending
+"""
+def apply_ops(panel, side_length, ops):
+    before = bytes(panel)
+    touched = bytearray(len(panel) // 3)
+
+    for op in ops:
+        opcode = op[0]
+        if opcode == OP_PIXELS:
+            for index, r, g, b in op[1]:
+                panel[index * 3:index * 3 + 3] = bytes((r, g, b))
+                touched[index] = 1
+
+        elif opcode == OP_FILL_RUN:
+            start, length, r, g, b = op[1:]
+            panel[start * 3:(start + length) * 3] = bytes((r, g, b)) * length
+            touched[start:start + length] = b"\x01" * length
+
+        elif opcode == OP_COPY_RUN:
+            source, destination, length = op[1:]
+            panel[destination * 3:(destination + length) * 3] = panel[source * 3:(source + length) * 3]
+            touched[destination:destination + length] = b"\x01" * length
+
+        elif opcode == OP_FILL_RECT:
+            x, y, width, height, r, g, b = op[1:]
+            color = bytes((r, g, b)) * height
+            for column in range(x, x + width):
+                start, stop, reverse = grid_column_run(side_length, column, y, height)
+                panel[start * 3:stop * 3] = color
+                touched[start:stop] = b"\x01" * height
+
+        elif opcode == OP_COPY_RECT:
+            source_x, source_y, width, height, x, y = op[1:]
+            source = bytes(panel)
+            for column in range(width):
+                source_start, source_stop, source_reverse = grid_column_run(side_length, source_x + column, source_y,
+                                                                            height)
+                start, stop, reverse = grid_column_run(side_length, x + column, y, height)
+                pixels = source[source_start * 3:source_stop * 3]
+                panel[start * 3:stop * 3] = reverse_pixels(pixels) if source_reverse != reverse else pixels
+                touched[start:stop] = b"\x01" * height
+
+        else:
+            raise ValueError("Unknown .ani drawing op: " + str(opcode))
+
+    # whole strip columns are compared first so only the columns that really changed are checked pixel by pixel
+    changed = []
+    for start in range(0, len(touched), side_length):
+        stop = start + side_length
+        if not any(touched[start:stop]) or panel[start * 3:stop * 3] == before[start * 3:stop * 3]:
+            continue
+        changed += [index for index in itertools.compress(range(start, stop), touched[start:stop])
+                    if panel[index * 3:index * 3 + 3] != before[index * 3:index * 3 + 3]]
+    return changed
+
+
+"""
+Function_Helper: frame_size - returns the number of bytes a v2 frame takes up
+Expects: encoding and count come from a FRAME_HEADER
+Does: Returns the size of the frame including its header
+"""
+def frame_size(encoding, count):
+    if encoding == FRAME_DELTA:
+        return FRAME_HEADER.size + count * DELTA_RECORD.size
+    elif encoding == FRAME_FULL:
+        return FRAME_HEADER.size + count * 3
+    elif encoding == FRAME_HOLD:
+        return FRAME_HEADER.size
+    elif encoding in (FRAME_OPS, FRAME_INDEXED_FULL, FRAME_INDEXED_DELTA):
+        return FRAME_HEADER.size + count
+    raise ValueError("Unknown .ani frame encoding: " + str(encoding))
+
+
+"""
+Function_Helper: scan_frame_offsets - walks the frames of a v2 buffer starting at start and stopping at end
+Expects: buffer hold a v2 file and start point at the first frame
+Does: Returns a list containing the offset of every frame found
+"""
+def scan_frame_offsets(buffer, start, end):
+    offsets = []
+    offset = start
+    while offset + FRAME_HEADER.size <= end:
+        encoding, count = FRAME_HEADER.unpack_from(buffer, offset)
+        size = frame_size(encoding, count)
+        if offset + size > end:
+            # partially written frame (generator was interrupted) so stop here
+            break
+        offsets.append(offset)
+        offset += size
+
+    return offsets
+
+
+"""
+Function_Helper: expand_blocks - returns the frames of a v2 buffer with every FRAME_BLOCK decompressed in place
+Expects: buffer hold a v2 file and start point at the first frame
+Does: Returns (frames, stop), the bytes of every whole frame between start and end as an uncompressed file would hold
+them and the offset in buffer right after the last whole frame or block
+"""
+def expand_blocks(buffer, start, end):
+    frames = bytearray()
+    decompressors = {}
+    offset = start
+    while offset + FRAME_HEADER.size <= end:
+        encoding, count = FRAME_HEADER.unpack_from(buffer, offset)
+        if encoding == FRAME_BLOCK:
+            data_start = offset + FRAME_HEADER.size + BLOCK_HEADER.size
+            if data_start > end:
+                break
+            compressed_size, raw_size = BLOCK_HEADER.unpack_from(buffer, offset + FRAME_HEADER.size)
+            size = data_start + compressed_size - offset
+            if offset + size > end:
+                # partially written block (generator was interrupted) so stop here
+                break
+
+            if count not in decompressors:
+                decompressors[count] = load_codec(BLOCK_CODECS[count] if count < len(BLOCK_CODECS) else None)[1]
+            raw = decompressors[count](buffer[data_start:data_start + compressed_size])
+            if len(raw) != raw_size:
+                raise ValueError("Corrupt .ani frame block at offset " + str(offset))
+            frames += raw
+        else:
+            size = frame_size(encoding, count)
+            if offset + size > end:
+                break
+            frames += buffer[offset:offset + size]
+        offset += size
+
+    return frames, offset
+
+
+"""
+Function_Helper: split_blocks - groups the frames of a v2 buffer the way AniWriter compresses them
+Expects: buffer hold the uncompressed frames, offsets be their offsets, and end the offset right after the last frame
+Does: Returns a list of the raw bytes of each block, every block is the frames up to the first that reaches BLOCK_BYTES
+"""
+def split_blocks(buffer, offsets, end):
+    if not offsets:
+        return []
+
+    blocks = []
+    block_start = offsets[0]
+    for offset in itertools.chain(offsets[1:], [end]):
+        if offset - block_start >= BLOCK_BYTES or offset == end:
+            blocks.append(bytes(buffer[block_start:offset]))
+            block_start = offset
+    return blocks
+
+
+"""
+Function: compression_stats - measures how well each block codec compresses a v2 file and how long it takes to decode
+Expects: file_path point to a v2 .ani file (compressed or not) and repeats the number of timed decodes to keep the best of
+Does: Returns [(codec, raw bytes, compressed bytes, seconds to decompress every block)] for every codec in BLOCK_CODECS,
+the sizes and time are None for codecs that aren't installed
+"""
+def compression_stats(file_path, repeats=3):
+    with AniReader(file_path) as animation:
+        if animation.version != 2:
+            raise ValueError("Only v2 .ani files can be compressed, convert " + file_path + " with ani_format.py")
+        buffer = animation._map
+        offsets = animation.frame_offsets
+        end = offsets[-1] + frame_size(*FRAME_HEADER.unpack_from(buffer, offsets[-1])) if offsets else 0
+        blocks = split_blocks(buffer, offsets, end)
+    raw_bytes = sum(len(block) for block in blocks)
+
+    stats = []
+    for codec in BLOCK_CODECS[1:]:
+        try:
+            compress, decompress = load_codec(codec)
+        except ValueError:
+            stats.append((codec, raw_bytes, None, None))
+            continue
+
+        compressed = [compress(block) for block in blocks]
+        compressed_bytes = sum(FRAME_HEADER.size + BLOCK_HEADER.size + len(data) for data in compressed)
+        best = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for data in compressed:
+                decompress(data)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        stats.append((codec, raw_bytes, compressed_bytes, best))
+
+    return stats
+
+
+"""
+Function_Helper: scan_keyframes - finds the keyframes of a v2 buffer from its frame headers
+Expects: offsets be the frame offsets of buffer
+Does: Returns the frame numbers of every FRAME_FULL/FRAME_INDEXED_FULL frame
+"""
+def scan_keyframes(buffer, offsets):
+    return [frame_number for frame_number, offset in enumerate(offsets) if buffer[offset] in KEYFRAME_ENCODINGS]
+
+
+"""
+Function_Helper: scan_frame_steps - works out the step each frame of a v2 buffer starts at from its frame headers
+Expects: offsets be the frame offsets of buffer
+Does: Returns the starting step of every frame followed by the total number of steps (len(offsets) + 1 values)
+"""
+def scan_frame_steps(buffer, offsets):
+    steps = [0]
+    for offset in offsets:
+        encoding, count = FRAME_HEADER.unpack_from(buffer, offset)
+        steps.append(steps[-1] + (count if encoding == FRAME_HOLD else 1))
+    return steps
+
+
+"""
+Function_Helper: encode_index - returns the bytes of the frame index and keyframe table that end a v2 file
+Expects: offsets be the offset of every frame and keyframes the frame numbers of the keyframes
+Does: Returns the packed offsets followed by the keyframe count and frame numbers
+"""
+def encode_index(offsets, keyframes):
+    return (struct.pack("<%dI" % len(offsets), *offsets) + struct.pack("<I", len(keyframes))
+            + struct.pack("<%dI" % len(keyframes), *keyframes))
+
+
+"""
+Function: finalize_ani_file - Appends the frame offset and keyframe tables to a v2 file and patches frame_count/index_offset in its header
+Expects: file_path point to a .ani file that frames have finished being written to
+Does: Writes the frame index so readers can seek straight to any frame (does nothing to v1 files or already finalized files)
+"""
+def finalize_ani_file(file_path):
+    with open(file_path, "r+b") as file:
+        header = file.read(ANI_V2_HEADER.size)
+        if len(header) < ANI_V2_HEADER.size or header[:4] != ANI_V2_MAGIC:
+            return
+
+        magic, version, kind, side_length, fps, length, frame_count, index_offset = ANI_V2_HEADER.unpack(header)
+        if index_offset != 0:
+            return
+
+        data = header + file.read()
+        # offsets are where the frames sit with every block decompressed, the file itself only loses any partially
+        # written frame or block so the index sits right after the last whole one
+        frames, end = expand_blocks(data, ANI_V2_HEADER.size, len(data))
+        data = header + frames
+        offsets = scan_frame_offsets(data, ANI_V2_HEADER.size, len(data))
+
+        file.seek(end)
+        file.truncate()
+        file.write(encode_index(offsets, scan_keyframes(data, offsets)))
+
+        file.seek(0)
+        file.write(ANI_V2_HEADER.pack(magic, version, kind, side_length, fps, length, len(offsets), end))
+
+
+"""
+Class: AniWriter - Writes a .ani file frame by frame through one buffered handle and renames it into place when done
+Expects: file_path be the destination .ani, fps a number (None when it's only known once the frames are read, fps must
+then be set before close()), length the number of steps (None to count the steps written), kind one of ANI_TYPES,
+version 1 or 2, keyframe_interval the most frames to write between keyframes (None for no forced keyframes), indexed
+whether v2 frames may be palette indexed, and compression the BLOCK_CODECS codec to compress v2 frames with (or None)
+Does: Writes the header once, write_delta()/write_full() append a frame as a single chunk, write_hold() keeps the last
+frame up for more steps (an empty delta is a hold of 1, v2 merges a run of them into one FRAME_HOLD), write_ops() (v2
+only) appends a frame of drawing ops, and close() adds the v2
+frame index and keyframe table, patches the header, and renames the temporary file over file_path (abort() throws it
+away instead). Used as a context manager the file is only renamed into place if the block finishes without an exception.
+v2 writers keep the panel the frames build up (starting black, panel is a copy of it) so a delta or ops frame that is due
+for a keyframe, or that would take more bytes than the whole panel, is written as a FRAME_FULL of the panel instead.
+Indexed writers keep the palette since the last keyframe and write each delta or keyframe indexed when that's smaller,
+and compressed writers gather frames until there are BLOCK_BYTES of them and write them as one FRAME_BLOCK
+
+"""
+class AniWriter:
+    def __init__(self, file_path, fps, length, kind, side_length, version=ANI_V2_VERSION,
+                 keyframe_interval=KEYFRAME_INTERVAL, indexed=False, compression=None):
+        if compression is not None and version == 1:
+            raise ValueError("Only v2 .ani files can be compressed")
+
+        self.file_path = file_path
+        self.version = version
+        self.fps = fps
+        self.length = length
+        self.kind = kind
+        self.side_length = side_length
+        self.keyframe_interval = keyframe_interval
+        self.indexed = indexed
+        self.compression = compression
+        self.patch_fps = fps is None
+        self.patch_length = length is None
+        self.frame_offsets = []
+        self.keyframes = []
+        self.steps = 0
+
+        # steps the last frame is held for that haven't been written yet (so a run of holds becomes one FRAME_HOLD)
+        self._pending_hold = 0
+
+        # frames since (and including) the last keyframe, holds aren't counted as seeking never has to decode them
+        self._frames_since_keyframe = 0
+
+        # rgb of every strip index once the frames written so far are played
+        self._panel = bytearray(side_length * side_length * 3)
+
+        # (r, g, b) -> palette index of the palette readers will have built since the last keyframe
+        self._palette_lookup = {}
+
+        # frames waiting to be compressed into the next block
+        self._block = bytearray()
+        self._compress = load_codec(compression)[0] if compression is not None else None
+
+        # hidden and in the same directory so it is skipped by directory listings and the rename can't cross devices
+        directory, name = os.path.split(file_path)
+        self.temporary_path = os.path.join(directory, "." + name + ".tmp")
+        self._file = open(self.temporary_path, "wb", buffering=1 << 16)
+        header = self._header()
+        self._file.write(header)
+
+        # where the next frame starts once every block is decompressed (the file position when nothing is compressed)
+        self._offset = len(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def frame_count(self):
+        return len(self.frame_offsets)
+
+    # rgb of every strip index once the frames written so far are played (v2 only)
+    @property
+    def panel(self):
+        return bytes(self._panel)
+
+    # the header with the frame count and index so far (and the fps/length as they stand when they're patched on close)
+    def _header(self, index_offset=0):
+        fps = self.fps
+        length = self.length
+        if self.patch_fps:
+            fps = fps or 0.0
+        if self.patch_length:
+            length = self.steps
+
+        if self.version == 1:
+            # padded so the patched header is the same size as the one the frames were written after
+            if self.patch_fps:
+                fps = str(fps).ljust(V1_PATCHED_FIELD_WIDTH)
+            if self.patch_length:
+                length = str(length).ljust(V1_PATCHED_FIELD_WIDTH)
+
+        return encode_ani_header(fps, length, self.kind, self.side_length, self.version, self.frame_count,
+                                 index_offset)
+
+    # True when enough frames have been written since the last keyframe that the next frame should be one
+    def _keyframe_due(self):
+        if not self.keyframe_interval:
+            return False
+        return self._frames_since_keyframe >= self.keyframe_interval
+
+    def _write(self, chunk):
+        self.frame_offsets.append(self._offset)
+        self._offset += len(chunk)
+        if self._compress is None:
+            self._file.write(chunk)
+            return
+
+        self._block += chunk
+        if len(self._block) >= BLOCK_BYTES:
+            self._flush_block()
+
+    # compresses the frames gathered since the last block into a FRAME_BLOCK
+    def _flush_block(self):
+        if self._block:
+            self._file.write(encode_block(codec_to_code(self.compression), self._compress, self._block))
+            self._block = bytearray()
+
+    # writes the hold built up since the last frame
+    def _flush_hold(self):
+        while self._pending_hold:
+            count = min(self._pending_hold, MAX_HOLD_STEPS)
+            self._write(FRAME_HEADER.pack(FRAME_HOLD, count))
+            self._pending_hold -= count
+
+    # keeps the last frame on the panel for steps more steps
+    def write_hold(self, steps=1):
+        self.steps += steps
+        if self.version == 1:
+            for _ in range(steps):
+                self._write(encode_v1_frame(()).encode())
+        else:
+            self._pending_hold += steps
+
+    # appends a frame of changed pixels, records are (index, r, g, b) tuples
+    def write_delta(self, records):
+        if self.version == 1:
+            self.steps += 1
+            self._write(encode_v1_frame(records).encode())
+            return
+
+        records = list(records)
+        if not records:
+            self.write_hold()
+            return
+
+        self._flush_hold()
+        self.steps += 1
+        panel = self._panel
+        for index, r, g, b in records:
+            panel[index * 3:index * 3 + 3] = bytes((r, g, b))
+
+        if self._keyframe_due() or len(records) * DELTA_RECORD.size >= len(panel):
+            self._write_keyframe()
+        else:
+            self._frames_since_keyframe += 1
+            frame, added = self._encode_delta(records)
+            self._palette_lookup.update(added)
+            self._write(frame)
+
+    # returns the smaller of the FRAME_DELTA and FRAME_INDEXED_DELTA of records, along with the colors (and their
+    # palette indexes) writing it adds to the palette
+    def _encode_delta(self, records):
+        frame = encode_delta_frame(records)
+        if not self.indexed:
+            return frame, {}
+
+        lookup = self._palette_lookup
+        added = {}
+        palette_indexes = bytearray()
+        for index, r, g, b in records:
+            color = (r, g, b)
+            palette_index = lookup.get(color)
+            if palette_index is None:
+                palette_index = added.get(color)
+                if palette_index is None:
+                    palette_index = len(lookup) + len(added)
+                    if palette_index >= MAX_PALETTE_COLORS:
+                        return frame, {}
+                    added[color] = palette_index
+            palette_indexes.append(palette_index)
+
+        indexed = encode_indexed_delta_frame(list(added), [record[0] for record in records], palette_indexes)
+        if len(indexed) >= len(frame) or len(indexed) - FRAME_HEADER.size > MAX_BODY_BYTES:
+            return frame, {}
+        return indexed, added
+
+    # appends a frame holding every pixel, pixels are (r, g, b) tuples in strip order
+    def write_full(self, pixels):
+        self.steps += 1
+        if self.version == 1:
+            self._write(encode_v1_frame((index, r, g, b) for index, (r, g, b) in enumerate(pixels)).encode())
+            return
+
+        self._flush_hold()
+        body = encode_full_frame(pixels)[FRAME_HEADER.size:]
+        self._panel[:len(body)] = body
+        self._write_keyframe()
+
+    # appends a frame of drawing ops (see encode_ops_frame), a frame that changes nothing is a hold
+    def write_ops(self, ops):
+        if self.version == 1:
+            raise ValueError("Drawing ops can only be written to v2 .ani files")
+
+        ops = list(ops)
+        panel = self._panel
+        changed = apply_ops(panel, self.side_length, ops)
+        if not changed:
+            self.write_hold()
+            return
+
+        self._flush_hold()
+        self.steps += 1
+        frame = encode_ops_frame(ops)
+        body_size = len(frame) - FRAME_HEADER.size
+        if self._keyframe_due() or body_size >= len(panel) or body_size > MAX_BODY_BYTES:
+            self._write_keyframe()
+            return
+
+        self._frames_since_keyframe += 1
+        if self.indexed:
+            # the changed pixels as an indexed delta can still beat the ops
+            delta, added = self._encode_delta([(index, panel[index * 3], panel[index * 3 + 1], panel[index * 3 + 2])
+                                               for index in changed])
+            if len(delta) < len(frame):
+                frame = delta
+                self._palette_lookup.update(added)
+        self._write(frame)
+
+    # writes the panel as it stands as a FRAME_FULL (or a FRAME_INDEXED_FULL with a new palette when that's smaller)
+    def _write_keyframe(self):
+        self.keyframes.append(self.frame_count)
+        self._frames_since_keyframe = 1
+        self._palette_lookup = {}
+        frame = FRAME_HEADER.pack(FRAME_FULL, len(self._panel) // 3) + self._panel
+
+        if self.indexed:
+            lookup = {}
+            palette_indexes = bytearray()
+            for start in range(0, len(self._panel), 3):
+                color = tuple(self._panel[start:start + 3])
+                palette_index = lookup.get(color)
+                if palette_index is None:
+                    if len(lookup) == MAX_PALETTE_COLORS:
+                        break
+                    palette_index = lookup[color] = len(lookup)
+                palette_indexes.append(palette_index)
+            else:
+                indexed = encode_indexed_full_frame(list(lookup), palette_indexes)
+                if len(indexed) < len(frame) and len(indexed) - FRAME_HEADER.size <= MAX_BODY_BYTES:
+                    frame = indexed
+                    self._palette_lookup = lookup
+
+        self._write(frame)
+
+    # finishes the file and moves it to file_path
+    def close(self):
+        if self._file.closed:
+            return
+
+        if self.patch_fps and not self.fps:
+            self.abort()
+            raise ValueError("The fps of " + self.file_path + " was never set")
+
+        if self.version != 1:
+            self._flush_hold()
+            self._flush_block()
+            index_offset = self._file.tell()
+            self._file.write(encode_index(self.frame_offsets, self.keyframes))
+            self._file.seek(0)
+            self._file.write(self._header(index_offset))
+        elif self.patch_fps or self.patch_length:
+            self._file.seek(0)
+            self._file.write(self._header())
+        self._file.close()
+        os.replace(self.temporary_path, self.file_path)
+
+    # throws the partially written file away, file_path is left as it was
+    def abort(self):
+        if self._file.closed:
+            return
+
+        self._file.close()
+        os.remove(self.temporary_path)
+
+
+"""
+Function_Helper: time_to_step - returns the step playing at seconds into playback of a .ani
+Expects: fps and kind come from the files header
+Does: Returns the step number (at least 0), clock files hold a step per minute of the day whatever their fps
+"""
+def time_to_step(seconds, fps, kind):
+    if kind == "clock":
+        return max(int(seconds // 60), 0)
+    return max(int(seconds * fps), 0)
+
+
+"""
+Function_Helper: step_to_frame - returns the frame showing at a step
+Expects: frame_steps be the starting step of every frame followed by the total steps (as scan_frame_steps returns)
+Does: Returns the number of the frame the step falls in (clamped to the last frame)
+"""
+def step_to_frame(frame_steps, step):
+    return max(min(bisect_right(frame_steps, step) - 1, len(frame_steps) - 2), 0)
+
+
+"""
+Function_Helper: read_v1_header - reads the text header of a v1 .ani file leaving the file positioned at the first frame
+Expects: file be a v1 .ani file opened in text mode and positioned at its start
+Does: Returns (fps, length, kind, side_length) parsed from the header
+"""
+def read_v1_header(file):
+    file.readline()
+    while True:
+        line = file.readline()
+        if not line:
+            raise ValueError("Reached end of file while reading the .ani comment block")
+        if "\"" in line:
+            line = file.readline()
+            break
+    fps = float(line.split().pop())
+    length = int(float(file.readline().split().pop()))
+    kind = file.readline().split()[1]
+    side_length = int(file.readline().split().pop())
+
+    return fps, length, kind, side_length
+
+
+"""
+Function: read_ani_header - Reads only the metadata of a .ani file of either version
+Expects: file_path point to a .ani file
+Does: Returns (fps, length, kind, side_length) of the file
+"""
+def read_ani_header(file_path):
+    with open(file_path, "rb") as file:
+        header = file.read(ANI_V2_HEADER.size)
+
+    if header[:4] == ANI_V2_MAGIC:
+        magic, version, kind, side_length, fps, length, frame_count, index_offset = ANI_V2_HEADER.unpack(header)
+        return fps, length, ANI_TYPES[kind], side_length
+
+    with open(file_path, "r") as file:
+        return read_v1_header(file)
+
+
+"""
+Function_Helper: parse_v1_frame - turns a single v1 frame line into its pixel records
+Expects: line be a frame line from a v1 .ani file
+Does: Returns a list of (index, r, g, b) tuples
+"""
+def parse_v1_frame(line):
+    records = []
+    pixels = line.split(",")
+    pixels.pop()
+
+    for pixel in pixels:
+        pixel_details = pixel.split(" ")
+        records.append((int(pixel_details[1]), int(pixel_details[2]), int(pixel_details[3]), int(pixel_details[4])))
+
+    return records
+
+
+"""
+Class: FrameState - What decoding a v2 file's frames in order has to keep between them
+Expects: panel be a bytearray of the strip's rgb (None when no FRAME_OPS frames need it)
+Does: Holds the panel (updated by every frame when given) and the palette of (r, g, b) colors since the last keyframe,
+a keyframe replaces the palette list rather than clearing it so frames handed out before it keep theirs
+
+"""
+class FrameState:
+    def __init__(self, panel=None):
+        self.panel = panel
+        self.palette = []
+
+
+"""
+Class: IndexedFrame - The records of a FRAME_INDEXED_FULL/FRAME_INDEXED_DELTA frame
+Expects: indexes be the changed strip indexes, palette_indexes the palette index of each, and palette the FrameState
+palette they index
+Does: Iterates as (index, r, g, b) records like every other frame, players that keep their own copy of the palette
+(animation_cache) can use indexes and palette_indexes directly
+
+"""
+class IndexedFrame:
+    def __init__(self, indexes, palette_indexes, palette):
+        self.indexes = indexes
+        self.palette_indexes = palette_indexes
+        self.palette = palette
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __iter__(self):
+        palette = self.palette
+        for index, palette_index in zip(self.indexes, self.palette_indexes):
+            r, g, b = palette[palette_index]
+            yield index, r, g, b
+
+
+"""
+Class: AniReader - Opens a .ani file of either version and hands out its frames as (index, r, g, b) records
+Expects: file_name point to a readable .ani file
+Does: v2 files are memory mapped and each frame is a view into the map (no parsing or copying), v1 files are read line
+by line with the original text parser (compressed v2 files are decompressed into memory when opened instead, compression
+is the codec they use). Files holding FRAME_OPS frames keep the panel as they're played (ops copy what
+is already on it) and hand out the pixels each frame's ops changed, and palette indexed frames are handed out as
+IndexedFrames of the palette rebuilt from their keyframe. seek() collapses the frames from the nearest keyframe into the
+one frame that brings the panel to any frame, frame_at_time() turns a playback time into a frame number, and
+timed_frames() hands out each frame with the step it starts at and how many steps it stays up (holds and empty frames
+folded into the frame before)
+
+"""
+class AniReader:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._file = open(file_name, "rb")
+        self._map = None
+        self.frame_offsets = None
+        self._keyframes = None
+        self._frame_steps = None
+        self._encodings = None
+        self.compression = None
+
+        if self._file.read(4) == ANI_V2_MAGIC:
+            self.version = 2
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, version, kind, self.side_length, self.fps, self.length,
+             frame_count, index_offset) = ANI_V2_HEADER.unpack_from(self._map, 0)
+            self.kind = ANI_TYPES[kind]
+
+            if index_offset != 0:
+                self.frame_offsets = struct.unpack_from("<%dI" % frame_count, self._map, index_offset)
+
+                # files finalized before keyframes were tracked end right after the offsets
+                keyframe_table = index_offset + 4 * frame_count
+                if keyframe_table + 4 <= len(self._map):
+                    keyframe_count, = struct.unpack_from("<I", self._map, keyframe_table)
+                    self._keyframes = struct.unpack_from("<%dI" % keyframe_count, self._map, keyframe_table + 4)
+
+            # compressed files are decompressed whole up front and the frames decoded out of that instead of the map
+            first_frame = ANI_V2_HEADER.size
+            if len(self._map) > first_frame and self._map[first_frame] == FRAME_BLOCK:
+                try:
+                    frames, end = expand_blocks(self._map, first_frame, index_offset or len(self._map))
+                except ValueError as e:
+                    # a codec that isn't installed here (zstd) or a corrupt block
+                    self.close()
+                    raise ValueError("Can't decompress " + file_name + ": " + str(e)) from None
+                self.compression = BLOCK_CODECS[FRAME_HEADER.unpack_from(self._map, first_frame)[1]]
+                frames[:0] = self._map[:first_frame]
+                self._map.close()
+                self._map = bytes(frames)
+
+            if self.frame_offsets is None:
+                self.frame_offsets = scan_frame_offsets(self._map, ANI_V2_HEADER.size, len(self._map))
+        else:
+            self.version = 1
+            self._file.close()
+            self._file = open(file_name, "r")
+            self.fps, self.length, self.kind, self.side_length = read_v1_header(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            try:
+                self._map.close()
+            except BufferError:
+                # a frame view is still referenced somewhere, the map is freed once it is collected
+                pass
+        self._map = None
+        self._file.close()
+
+    # number of frames in the file (None for v1 files as that needs a full read of the file)
+    @property
+    def frame_count(self):
+        if self.frame_offsets is None:
+            return None
+        return len(self.frame_offsets)
+
+    # the frame encodings the file uses (empty for v1 files)
+    @property
+    def encodings(self):
+        if self._encodings is None:
+            self._encodings = set(self._map[offset] for offset in self.frame_offsets) if self.version == 2 else set()
+        return self._encodings
+
+    # True when the file has FRAME_OPS frames, which can only be decoded on top of the panel the frames before built
+    @property
+    def uses_ops(self):
+        return FRAME_OPS in self.encodings
+
+    # True when the file has palette indexed frames, which can only be decoded with the palette since their keyframe
+    @property
+    def uses_palette(self):
+        return FRAME_INDEXED_FULL in self.encodings or FRAME_INDEXED_DELTA in self.encodings
+
+    # returns the (index, r, g, b) records of the v2 frame starting at offset. state (a FrameState) is updated to the
+    # frame when given and is needed for FRAME_OPS frames (with a panel) and palette indexed frames
+    def decode_frame_at(self, offset, state=None):
+        encoding, count = FRAME_HEADER.unpack_from(self._map, offset)
+        if encoding == FRAME_HOLD:
+            return ()
+        start = offset + FRAME_HEADER.size
+        view = memoryview(self._map)[start:start + frame_size(encoding, count) - FRAME_HEADER.size]
+        panel = state.panel if state is not None else None
+
+        if encoding == FRAME_OPS:
+            if panel is None:
+                raise ValueError("FRAME_OPS frames of " + self.file_name + " need the panel to be decoded onto")
+            return [(index, panel[index * 3], panel[index * 3 + 1], panel[index * 3 + 2])
+                    for index in apply_ops(panel, self.side_length, decode_ops(view))]
+
+        if encoding in (FRAME_INDEXED_FULL, FRAME_INDEXED_DELTA):
+            if state is None:
+                raise ValueError("Palette indexed frames of " + self.file_name + " need the palette to be decoded with")
+            colors, = PALETTE_SIZE.unpack_from(view)
+            palette_end = PALETTE_SIZE.size + colors * 3
+            palette = [tuple(view[position:position + 3]) for position in range(PALETTE_SIZE.size, palette_end, 3)]
+
+            if encoding == FRAME_INDEXED_FULL:
+                state.palette = palette
+                palette_indexes = view[palette_end:]
+                indexes = range(len(palette_indexes))
+            else:
+                state.palette.extend(palette)
+                changed = (len(view) - palette_end) // 3
+                indexes = struct.unpack_from("<%dH" % changed, view, palette_end)
+                palette_indexes = view[palette_end + changed * 2:]
+
+            frame = IndexedFrame(indexes, palette_indexes, state.palette)
+            if panel is not None:
+                for index, r, g, b in frame:
+                    panel[index * 3:index * 3 + 3] = bytes((r, g, b))
+            return frame
+
+        if encoding == FRAME_DELTA:
+            if panel is not None:
+                for index, r, g, b in DELTA_RECORD.iter_unpack(view):
+                    panel[index * 3:index * 3 + 3] = bytes((r, g, b))
+            return DELTA_RECORD.iter_unpack(view)
+
+        if state is not None:
+            state.palette = []
+        if panel is not None:
+            panel[:len(view)] = view
+        return zip(range(count), view[0::3], view[1::3], view[2::3])
+
+    # returns the FrameState once every frame before frame_number is played (replayed from the keyframe before it), or
+    # None when the file's frames decode on their own
+    def _state_before(self, frame_number):
+        if not self.uses_ops and not self.uses_palette:
+            return None
+
+        state = FrameState(bytearray(self.side_length * self.side_length * 3) if self.uses_ops else None)
+        if frame_number > 0:
+            for offset in self.frame_offsets[self.keyframe_before(frame_number - 1):frame_number]:
+                self.decode_frame_at(offset, state)
+        return state
+
+    # frame numbers of the keyframes (empty for v1 files, which have no index to seek with)
+    @property
+    def keyframes(self):
+        if self._keyframes is None:
+            self._keyframes = scan_keyframes(self._map, self.frame_offsets) if self.version == 2 else []
+        return self._keyframes
+
+    # returns the last keyframe at or before frame_number (0 when there isn't one, playback has to start from the top)
+    def keyframe_before(self, frame_number):
+        position = bisect_right(self.keyframes, frame_number)
+        return self.keyframes[position - 1] if position else 0
+
+    # starting step of every frame followed by the total steps (None for v1 files, where every line is one step)
+    @property
+    def frame_steps(self):
+        if self._frame_steps is None and self.version == 2:
+            self._frame_steps = scan_frame_steps(self._map, self.frame_offsets)
+        return self._frame_steps
+
+    # number of steps the file plays for (None for v1 files)
+    @property
+    def steps(self):
+        if self.version != 2:
+            return None
+        return self.frame_steps[-1]
+
+    # returns the frame showing at seconds into playback
+    def frame_at_time(self, seconds):
+        step = time_to_step(seconds, self.fps, self.kind)
+        if self.version != 2:
+            return step
+        return step_to_frame(self.frame_steps, step)
+
+    # returns the records that bring the panel to frame_number's state (from its keyframe) as a single frame
+    def seek(self, frame_number):
+        if self.version != 2:
+            raise ValueError("Only v2 .ani files can be seeked, convert " + self.file_name + " with ani_format.py")
+
+        if self.uses_ops:
+            panel = self._state_before(frame_number + 1).panel
+            return list(zip(range(len(panel) // 3), panel[0::3], panel[1::3], panel[2::3]))
+
+        # replaying from the keyframe starts the palette over so a fresh state is enough
+        state = FrameState() if self.uses_palette else None
+        panel = {}
+        for offset in self.frame_offsets[self.keyframe_before(frame_number):frame_number + 1]:
+            for index, r, g, b in self.decode_frame_at(offset, state):
+                panel[index] = (index, r, g, b)
+        return list(panel.values())
+
+    # yields each frame in order from start as an iterable of (index, r, g, b) records
+    def frames(self, start=0):
+        if self.version == 2:
+            state = self._state_before(start)
+            for offset in self.frame_offsets[start:]:
+                yield self.decode_frame_at(offset, state)
+        else:
+            for _ in range(start):
+                self._file.readline()
+
+            line = self._file.readline()
+            while line:
+                yield parse_v1_frame(line)
+                line = self._file.readline()
+
+    # yields (steps, records, changes nothing) for each frame in order from start
+    def _stepped_frames(self, start):
+        if self.version == 2:
+            state = self._state_before(start)
+            for offset in self.frame_offsets[start:]:
+                encoding, count = FRAME_HEADER.unpack_from(self._map, offset)
+                if encoding == FRAME_HOLD:
+                    yield count, (), True
+                else:
+                    yield 1, self.decode_frame_at(offset, state), encoding == FRAME_DELTA and count == 0
+        else:
+            for records in self.frames(start):
+                yield 1, records, not records
+
+    # yields (step, steps, records) for each frame that changes the panel from start on, step being when it's shown and
+    # steps how long it stays up. Holds and empty frames lengthen the frame before them instead of being yielded. When
+    # start is past the beginning of a v2 file the first records are seek(start), the whole panel at that frame
+    def timed_frames(self, start=0):
+        frames = self._stepped_frames(start)
+        step = start if self.version != 2 else self.frame_steps[start]
+        if start and self.version == 2 and start < len(self.frame_offsets):
+            frames = itertools.chain([(next(frames)[0], self.seek(start), False)], frames)
+
+        current = None
+        for steps, records, empty in frames:
+            if current is not None and empty:
+                current[1] += steps
+            else:
+                if current is not None:
+                    yield tuple(current)
+                current = [step, steps, records]
+            step += steps
+
+        if current is not None:
+            yield tuple(current)
+
+
+"""
+Function: convert_v1_to_v2 - Converts an existing v1 text .ani into the v2 binary format
+Expects: source_path point to a v1 .ani file and destination_path be writable (may be the same path)
+Does: Writes every frame of the source as a FRAME_DELTA frame into a finalized v2 file
+"""
+def convert_v1_to_v2(source_path, destination_path):
+    with AniReader(source_path) as source:
+        if source.version != 1:
+            print(source_path + " is already a v2 .ani file")
+            return
+
+        with AniWriter(destination_path, source.fps, source.length, source.kind, source.side_length) as destination:
+            for frame in source.frames():
+                destination.write_delta(frame)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python ani_format.py <file.ani> [file.ani ...]  (converts v1 files to v2 in place)")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        convert_v1_to_v2(path, path)
+        print("Converted: " + path)
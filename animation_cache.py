@@ -0,0 +1,192 @@
+"""
+animation_cache.py - Keeps decoded .ani files in memory so replaying or switching between animations doesn't touch the disk
+
+Each animation is decoded once into per frame arrays of strip indexes and packed colors (the same value rpi_ws281x's
+Color() returns) so a frame can be handed to setPixelColor without any further work. Entries are keyed by path and
+modification time (an edited file is decoded again) and evicted least recently used first once the byte budget is hit.
+Holds and frames that change nothing aren't kept as frames at all, they only lengthen the duration of the frame before.
+Palette indexed frames are decoded with the palette packed once, each pixel's color is then a single lookup into it.
+
+"""
+
+import os
+import queue
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+
+from ani_format import AniReader, IndexedFrame, step_to_frame, time_to_step
+
+
+"""
+Function_Helper: pack_color - packs r, g, b into a single integer
+Expects: r, g, and b be within 0-255
+Does: Returns the color packed the same way rpi_ws281x's Color(r, g, b) packs it
+"""
+def pack_color(r, g, b):
+    return (r << 16) | (g << 8) | b
+
+
+"""
+Class: DecodedAnimation - a fully decoded .ani held in memory
+Expects: Built by decode_animation
+Does: Holds the header information, a list of (indexes, colors) array pairs (one pair per frame), how many steps each
+frame stays up (durations) and the step it starts at (frame_steps, followed by the total steps), as well as how many
+bytes the arrays take up. keyframes lists the frames that set every pixel so playback can start at any frame by
+applying only the frames from keyframe_before() on, play() is the playback loop shared by client.py and the gui
+
+"""
+class DecodedAnimation:
+    def __init__(self, fps, length, kind, side_length, frames, durations):
+        self.fps = fps
+        self.length = length
+        self.kind = kind
+        self.side_length = side_length
+        self.frames = frames
+        self.durations = durations
+        self.frame_steps = list(accumulate(durations, initial=0))
+        self.nbytes = sum(indexes.itemsize * len(indexes) + colors.itemsize * len(colors) for indexes, colors in frames)
+        self.keyframes = [frame_number for frame_number, (indexes, colors) in enumerate(frames)
+                          if len(indexes) == side_length * side_length]
+
+    # returns the last keyframe at or before frame_number (0 when there isn't one)
+    def keyframe_before(self, frame_number):
+        position = bisect_right(self.keyframes, frame_number)
+        return self.keyframes[position - 1] if position else 0
+
+    # returns the frame showing at seconds into playback
+    def frame_at_time(self, seconds):
+        return step_to_frame(self.frame_steps, time_to_step(seconds, self.fps, self.kind))
+
+    # plays the frames from start_seconds on to strip (any output from panel_output.py) paced by scheduler, starting part
+    # way in only replays the frames since the last keyframe (without showing them) to rebuild the panel. Returns the
+    # frame playback was cancelled at (scheduler.cancelled() became True) or None once the last frame has been up its
+    # full duration
+    def play(self, strip, scheduler, start_seconds=0):
+        cancelled = scheduler.cancelled or (lambda: False)
+
+        start_frame = self.frame_at_time(start_seconds)
+        for indexes, colors in self.frames[self.keyframe_before(start_frame):start_frame]:
+            strip.write_pixels(indexes, colors)
+
+        for frame_number in range(start_frame, len(self.frames)):
+            indexes, colors = self.frames[frame_number]
+            # only the output's frame is touched here, show() pushes the whole frame to the strip at once
+            strip.write_pixels(indexes, colors)
+
+            # a frame that is held is shown once and the scheduler waits until the next one is due, cancelled() is
+            # checked before that wait (the frame isn't shown) and during it as well as after it
+            scheduler.present(self.frame_steps[frame_number], strip.show, self.durations[frame_number])
+            if cancelled():
+                return frame_number
+
+        if not scheduler.finish():
+            return len(self.frames) - 1
+        return None
+
+
+"""
+Function: decode_animation - Reads every frame of a .ani file into packed arrays
+Expects: file_name point to a .ani file of either version
+Does: Returns a DecodedAnimation of the file
+"""
+def decode_animation(file_name):
+    frames = []
+    durations = []
+    # the palette being decoded with and its colors packed (extended as indexed deltas add colors)
+    palette = None
+    packed_palette = array("I")
+    with AniReader(file_name) as animation:
+        for step, steps, frame in animation.timed_frames():
+            if isinstance(frame, IndexedFrame):
+                if frame.palette is not palette:
+                    palette = frame.palette
+                    packed_palette = array("I")
+                packed_palette.extend(pack_color(r, g, b) for r, g, b in palette[len(packed_palette):])
+
+                indexes = array("H", frame.indexes)
+                colors = array("I", map(packed_palette.__getitem__, frame.palette_indexes))
+            else:
+                indexes = array("H")
+                colors = array("I")
+                for index, r, g, b in frame:
+                    indexes.append(index)
+                    colors.append(pack_color(r, g, b))
+            frames.append((indexes, colors))
+            durations.append(steps)
+
+        return DecodedAnimation(animation.fps, animation.length, animation.kind, animation.side_length, frames,
+                                durations)
+
+
+"""
+Class: AnimationCache - least recently used cache of DecodedAnimations bounded by the bytes the frames take up
+Expects: max_bytes be the most memory the cache should hold on to
+Does: get() returns a decoded animation (decoding it on a miss) and prefetch() decodes animations on a background thread
+so they're ready before they are asked for
+
+"""
+class AnimationCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefetch_queue = queue.Queue()
+        self._prefetch_thread = None
+
+    # key used for the entry, a changed mtime means the file was regenerated so it must be decoded again
+    def _key(self, file_name):
+        return file_name, os.stat(file_name).st_mtime_ns
+
+    def _lookup(self, key):
+        with self._lock:
+            animation = self._entries.get(key)
+            if animation is not None:
+                self._entries.move_to_end(key)
+            return animation
+
+    def _store(self, key, animation):
+        with self._lock:
+            # animations bigger than the whole budget are played straight from the decode and never cached
+            if animation.nbytes > self.max_bytes or key in self._entries:
+                return
+
+            # drop stale versions of the same file
+            for stale_key in [k for k in self._entries if k[0] == key[0]]:
+                self.current_bytes -= self._entries.pop(stale_key).nbytes
+
+            self._entries[key] = animation
+            self.current_bytes += animation.nbytes
+
+            while self.current_bytes > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    # returns the DecodedAnimation for file_name, decoding (and caching) it if needed
+    def get(self, file_name):
+        key = self._key(file_name)
+        animation = self._lookup(key)
+        if animation is None:
+            animation = decode_animation(file_name)
+            self._store(key, animation)
+        return animation
+
+    # queues file_names to be decoded in the background (already cached files are skipped by the worker)
+    def prefetch(self, file_names):
+        for file_name in file_names:
+            self._prefetch_queue.put(file_name)
+
+        if self._prefetch_thread is None:
+            self._prefetch_thread = threading.Thread(target=self._prefetch_worker, daemon=True)
+            self._prefetch_thread.start()
+
+    def _prefetch_worker(self):
+        while True:
+            file_name = self._prefetch_queue.get()
+            try:
+                self.get(file_name)
+            except (OSError, ValueError) as e:
+                print(f"Failed to prefetch {file_name}: {e}")
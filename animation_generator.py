@@ -6,27 +6,68 @@ this is a simple python script that creates a .ani file for my LED panel.
 .ani file type supports
 full RGB range, comments, FPS, type distinction, only necesary pixel updating (ONPU),
 and finally the ability to work with calibrated colors
+.ani files are written in the binary v2 format by default (see ani_format.py), set ani_version to 1 for the text format
+and ani_compression (--compression) to compress the frames of v2 files with zlib or zstd
 
 Supports
 Taking images from a folder and making them into an .ani
 Taking text and converting it to a .ani including color, fps, etc
 Taking a gif and converting it to .ani
+Taking a video (animated PNG/WebP, multi page TIFF, MJPEG, or numbered images) and converting it to .ani
 
+Usage
+python animation_generator.py                      the interactive menu
+python animation_generator.py <command> ...        images, text, gif, video, effect, clock, itinerary, or image (see -h)
+import animation_generator                         and call convert_images(), convert_gif(), generate_clock(), ... directly
 
 Future goals
 Add a insane amount of various effects (including the ability to customize each)
-Taking a video and converting it to .ani
 Daily information at a glance with background gif, images, or videos
 At a glance panel that will show local temperature, weather, sunrise, sunset, etc
 
 
 """
-from PIL import Image, ImageSequence
+import argparse
+import importlib.util
+import multiprocessing
+from contextlib import contextmanager
 import os
 import random
-import re
-import math
-import numpy as np
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ani_format
+
+
+"""
+Function_Helper: lazy_import - Imports a module that is only loaded once one of its attributes is first used
+Expects: name be an importable module name
+Does: Returns the module (registered in sys.modules so later imports of it share the same lazy module)
+"""
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# NumPy, PIL, and everything built on them are only loaded once a conversion actually runs, so the command line (and
+# scripts importing this module for one kind of conversion) don't pay for all of them up front
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageSequence = lazy_import("PIL.ImageSequence")
+color_calibration = lazy_import("color_calibration")
+drawing_ops = lazy_import("drawing_ops")
+panel_geometry = lazy_import("panel_geometry")
+perceptual_delta = lazy_import("perceptual_delta")
+video_ingest = lazy_import("video_ingest")
 
 
 square_matrix_size = 16
@@ -39,6 +80,34 @@ height = square_matrix_size
 # 3 is used for wall
 rotate_k = 3
 
+# Which .ani format to write, 2 is the binary memory mappable format and 1 the original text format
+ani_version = 2
+
+# Lossy OUNP, a pixel whose color changes by no more than this delta E (CIE76) isn't updated until the error it builds up
+# passes 4 times it (0 is lossless, around 2.3 is a just noticeable difference), see perceptual_delta.py
+delta_threshold = 0
+
+# v2 frames whose changes are mostly motion (scrolls, shifts, fills) are written as drawing ops when that's smaller than
+# a record per changed pixel, see drawing_ops.py
+use_drawing_ops = True
+
+# v2 frames are written palette indexed (each color stored once per keyframe, then a byte per pixel) whenever that's
+# smaller, gif frames rarely use more than a few dozen colors
+use_palette_frames = True
+
+# codec the frames of v2 files are compressed with in blocks (see ani_format.BLOCK_CODECS), None leaves them uncompressed.
+# With report_compression set every v2 file written is also compressed with each codec to report the size and decode
+# time it would get (a max level pass per codec, so it's off unless asked for with --report-compression)
+ani_compression = None
+report_compression = False
+
+# gif frame delays are in hundredths of a second, so a gif converted with its own timing plays in steps of this many ms
+# with each frame held for its delay (v1 files can't hold a frame so they get the average fps instead)
+gif_step_ms = 10
+
+# ms a gif frame without a delay of its own is shown for
+default_gif_duration = 100
+
 
 """
 variable that holds last frame that was printed (for optimization)
@@ -149,133 +218,118 @@ def get_color_rgb_load(color_name):
 Calibration
 """
 """
-Function_Helper: find_closest_color takes a calibrated_color translator, R,G, and B values and using euclidean shortest distance returns the most similar color
-Expects: calibrated_colors be correctly calibrated as well as r, g, and b be within the range for a RGB value
-Does: Returns the closest color to a given color using calibrated_colors 
+Function_Helper: find_closest_color takes a compiled calibration (color_calibration.ColorCalibration), R,G, and B values and returns the calibrated color
+of the most similar (euclidean shortest distance) calibrated color
+Expects: calibrated_colors be a loaded calibration as well as r, g, and b be within the range for a RGB value
+Does: Returns the closest color to a given color using calibrated_colors (a single table lookup)
 
 """
-# Function to find the closest color in the calibrated colors dictionary based on RGB values
+# Function to find the closest color in the calibration table based on RGB values
 def find_closest_color(calibrated_colors, r, g, b):
-    # Initialize variables
-    min_distance = float('inf')
-    closest_color = None
-    debug = False
-
-    # Iterate through calibrated colors
-    for color, values in calibrated_colors.items():
-        # Unpack original RGB values
-        original_rgb = values[0]
-        original_r, original_g, original_b = original_rgb
-        # Calculate Euclidean distance between original and given RGB values
-        distance = math.sqrt((original_r - r) ** 2 + (original_g - g) ** 2 + (original_b - b) ** 2)
-        # Update closest color if distance is smaller
-        if distance < min_distance:
-            min_distance = distance
-            closest_color = color
-
-    # Optional debug printing
-    if debug:
-        if closest_color != "black":
-            print("Original color RGB: " + str(calibrated_colors[closest_color][0]))
-            print("calibrated color RGB: " + str(calibrated_colors[closest_color][1]))
+    return calibrated_colors.calibrate_color(r, g, b)
 
-    # Return calibrated RGB values of the closest color
-    return calibrated_colors[closest_color][1]
 
 
 
 
 
+"""
+These are used as helpers to remove the grid found on gifs downloaded from the various sources (each pixel of the
+original drawn as a pitch by pitch block with grid lines between the blocks)
 
 """
-These are used as helpers to remove the grid found on gifs downloaded from the various sources
-Still in beta (working script needs better integration (handling file names through the process)
+# width/height in pixels of each block of the grid on upscaled gifs (a 16 by 16 gif scaled to 320 by 320)
+grid_pitch = 20
 
 """
+Function_Helper: most_common_block_colors - Gets the most common color of every pitch by pitch block of a frame (or a stack of frames)
+Expects: pixels be a (..., height, width, 3) RGB array and pitch be greater than 0, partial blocks on the edges are ignored
+Does: Returns a (..., height // pitch, width // pitch, 3) uint8 array of each blocks most common color (ties go to the lowest color)
+
 """
-Function_Helper: get_most_common_color - Is used to get the most common color in a grid of 20 by 20 useful for removing a grid imposed on some gifs/images
-Expects: Image be correctly initialized, grid_x, and grid_y be valid indexes of the 16 by 16 image
-Does: Returns the most common color in a grid of 20 by 20 given the image 
+def most_common_block_colors(pixels, pitch):
+    pixels = np.asarray(pixels)
+    rows, cols = pixels.shape[-3] // pitch, pixels.shape[-2] // pitch
+    pixels = pixels[..., :rows * pitch, :cols * pitch, :].astype(np.uint32)
+
+    # pack each color into one integer and gather every block into its own row of pitch * pitch colors
+    packed = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+    blocks = packed.reshape(packed.shape[:-2] + (rows, pitch, cols, pitch))
+    blocks = np.swapaxes(blocks, -3, -2).reshape(packed.shape[:-2] + (rows, cols, pitch * pitch))
+
+    # sorted, equal colors form runs, the position where the longest run ends holds the most common color
+    blocks = np.sort(blocks, axis=-1)
+    positions = np.arange(pitch * pitch)
+    run_starts = np.ones(blocks.shape, dtype=bool)
+    run_starts[..., 1:] = blocks[..., 1:] != blocks[..., :-1]
+    run_lengths = positions - np.maximum.accumulate(np.where(run_starts, positions, 0), axis=-1)
+    most_common = np.take_along_axis(blocks, run_lengths.argmax(axis=-1)[..., None], axis=-1)[..., 0]
+
+    return np.stack(((most_common >> 16) & 255, (most_common >> 8) & 255, most_common & 255), axis=-1).astype(np.uint8)
+
 
 """
-# Gets the most common color of the 16 by 16 (grids) image thats been scaled to 320 by 320
-def get_most_common_color(image, grid_x, grid_y):
-    # Get the dimensions of the image
-    width, height = image.size
+Function_Helper: remove_grid_from_frame - Fills every block of a frame with its most common color
+Expects: frame be a PIL image and pitch the grids block size
+Does: Returns a new RGB image the same size as frame with each block filled with its most common color (partial blocks
+on the right/bottom edge are left black)
 
-    # Calculate the grid boundaries
-    left = grid_x * 20
-    upper = grid_y * 20
-    right = min((grid_x + 1) * 20, width)
-    lower = min((grid_y + 1) * 20, height)
+"""
+def remove_grid_from_frame(frame, pitch=grid_pitch):
+    pixels = np.asarray(frame.convert("RGB"))
+    block_colors = most_common_block_colors(pixels, pitch)
+    rows, cols = block_colors.shape[:2]
 
-    # Crop the image to the grid boundaries
-    grid_image = image.crop((left, upper, right, lower))
+    modified_frame = np.zeros(pixels.shape, dtype=np.uint8)
+    modified_frame[:rows * pitch, :cols * pitch] = block_colors.repeat(pitch, axis=0).repeat(pitch, axis=1)
+    return Image.fromarray(modified_frame)
 
-    # Get the colors of all pixels in the grid
-    colors = grid_image.getcolors(grid_image.size[0] * grid_image.size[1])
 
-    if colors is None:
-        return (0, 0, 0)  # Return default color if no colors found in the grid
+"""
+Function_Helper: remove_grid_from_frames - Removes the grid from each frame of a sequence one frame at a time
+Expects: frames be an iterable of PIL images (ImageSequence.Iterator of a gif) and pitch the grids block size
+Does: Yields the frames with the grid removed, keeping each frames duration
 
-    # Find the most common color in the grid
-    most_common_color = max(colors, key=lambda item: item[0])[1]
+"""
+def remove_grid_from_frames(frames, pitch=grid_pitch):
+    for frame in frames:
+        modified_frame = remove_grid_from_frame(frame, pitch)
+        modified_frame.info["duration"] = frame.info.get("duration", 100)
+        yield modified_frame
 
-    return most_common_color
 
 # Removes the grid imposed on the frames of the given gif
 """
 Function: remove_grid_from_gif - Takes a gifs path and then iterates through each frame removing the grid from the frame and saving it to the gifs
-Expects: gif_path point to a gif file 
-Does: Removes the grid imposed on a 16 by 16 orignal resolution gif
+Expects: gif_path point to a gif file and pitch be the grids block size
+Does: Removes the grid imposed on a upscaled gif, frames are streamed into a temporary gif that then replaces the original
 """
-def remove_grid_from_gif(gif_path):
+def remove_grid_from_gif(gif_path, pitch=grid_pitch):
     print("Processing:", gif_path)
-    # Open the GIF
-    gif = Image.open(gif_path)
+    temp_path = gif_path + ".tmp"
 
-    # Create a list to store the modified frames
-    modified_frames = []
+    with Image.open(gif_path) as gif:
+        modified_frames = remove_grid_from_frames(ImageSequence.Iterator(gif), pitch)
+        first_frame = next(modified_frames)
+        first_frame.save(temp_path, format="GIF", save_all=True, append_images=modified_frames, loop=0)
 
-    # Copy the frame rate (duration) of each frame from the original GIF
-    durations = []
-
-    # Skip the first frame when iterating over frames
-    frames_iterator = ImageSequence.Iterator(gif)
-
-    # Iterate over each frame
-    for frame in frames_iterator:
-
-        frame = frame.convert('RGB')
-        # Create a new image to store the modified frame
-        modified_frame = Image.new("RGB", frame.size, (0, 0, 0))  # Create a new image with a black background
+    os.replace(temp_path, gif_path)
 
-        # Iterate over each grid in the frame
-        for y in range(frame.height // 20):
-            for x in range(frame.width // 20):
-                # Get the most common color in the grid
-                most_common_color = get_most_common_color(frame, x, y)
 
-                # Replace all colors in the grid with the most common color
-                for i in range(20):
-                    for j in range(20):
-                        modified_frame.putpixel((x * 20 + i, y * 20 + j), most_common_color)
-
-
-        # Append the modified frame to the list of modified frames
-        modified_frames.append(modified_frame)
+"""
+Function_Helper: apply_red_boost - Applies the panels red/blue boost (and green cut) to a whole image at once
+Expects: pixels be a (height, width, 3) signed integer array (so the adjustments can't wrap)
+Does: Returns the adjusted array, red and blue over 5 are raised by 20 and 30 and green lowered by 5 (clamped to 0-255)
+"""
+def apply_red_boost(pixels):
+    boosted = pixels.copy()
+    r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
 
-        # Copy the duration of the frame from the original GIF
-        durations.append(frame.info.get("duration", 100))
+    boosted[..., 0] = np.where(r > 5, np.minimum(r + 20, 255), r)
+    boosted[..., 1] = np.maximum(g - 5, 0)
+    boosted[..., 2] = np.where(b > 5, np.minimum(b + 30, 255), b)
 
-    # Save the modified frames as a new GIF
-    modified_frames[0].save(
-        gif_path,
-        save_all=True,
-        append_images=modified_frames[1:],
-        loop=0,
-        duration=durations
-    )
+    return boosted
 
 
 """
@@ -285,15 +339,12 @@ Assumptions - assumes that if square_side_length is the same as square_matrix_si
     if it's not then it doesn't resize
 """
 """
-Function: load_image_to_array - Takes a image, color, calibrated_colors, and the matrixes sides length and loads the image into a matrix
-Expects: image_path_or_frame, color, calibrated, colors, and square_side_length be correctly initialized 
-Does: Loads a image into a matrix of size square_side_length * square_side_length and returns it
+Function_Helper: load_image_pixels - Takes a image (or its path) and the matrixes sides length and returns its boosted pixels
+Expects: image_path_or_frame be a PIL image or a path to one and square_side_length be correctly initialized
+Does: Returns a (height, width, 3) int16 array of the images RGB values with the red boost applied
 
 """
-# take an image's path and convert it to a array of RGB values (or take it's shape as one color)
-def load_image_to_array(image_path_or_frame, color, calibrated_colors, square_side_length):
-    """Load an image and convert it to a two-dimensional array of RGB values."""
-
+def load_image_pixels(image_path_or_frame, square_side_length):
     red_boost = True
 
     if not isinstance(image_path_or_frame, Image.Image):
@@ -305,81 +356,100 @@ def load_image_to_array(image_path_or_frame, color, calibrated_colors, square_si
         # Convert the image to RGB mode (in case it's not already in RGB)
         image = image_path_or_frame.convert("RGB")
 
-    # Get the dimensions of the image
-    local_width, local_height = image.size
-
     # if their the same we assume we're ment to resize to the square_matrix_size (used for clock digits)
     if square_side_length == square_matrix_size:
 
-        if local_height != square_matrix_size:
+        if image.size[1] != square_matrix_size:
             image = image.resize((square_matrix_size, square_matrix_size), Image.NEAREST)
 
-            # Get the dimensions of the image
-            local_width, local_height = image.size
+    # one copy of the whole image, int16 so the boost can go past 255 (or below 0) before it is clamped
+    pixels = np.asarray(image, dtype=np.int16)
 
+    if red_boost:
+        pixels = apply_red_boost(pixels)
 
-    # Create a two-dimensional array to store the RGB values
-    image_array = [[(0, 0, 0) for _ in range(local_width)] for _ in range(local_height)]
+    return pixels
 
-    # Iterate over each pixel and store its RGB values in the array
-    for y in range(local_height):
-        for x in range(local_width):
-            r, g, b = image.getpixel((x, y))
 
-            if red_boost:
-                if r > 5:
-                    r += 20
+"""
+Function_Helper: font_color_rgb - Returns the RGB values a shape loaded in color is drawn with
+Expects: color be a color name (see get_color_rgb_load) and calibrated_colors the calibration (used if calibration is on)
+Does: Returns (r, g, b) of the color, calibrated when calibration is turned on
+"""
+def font_color_rgb(color, calibrated_colors):
+    r, g, b = get_color_rgb_load(color)
+    if calibration_dictionary != None:
+        r, g, b = find_closest_color(calibrated_colors, r, g, b)
+    return r, g, b
 
-                if b > 5:
-                    b += 30
-                g -= 5
 
-                if r > 255:
-                    r = 255
+"""
+Function: load_image_to_array - Takes a image, color, calibrated_colors, and the matrixes sides length and loads the image into a matrix
+Expects: image_path_or_frame, color, calibrated, colors, and square_side_length be correctly initialized 
+Does: Loads a image into a (square_side_length, square_side_length, 3) uint8 array and returns it
 
-                if b > 255:
-                    b = 255
+"""
+# take an image's path and convert it to a array of RGB values (or take it's shape as one color)
+def load_image_to_array(image_path_or_frame, color, calibrated_colors, square_side_length):
+    """Load an image and convert it to a (height, width, 3) array of RGB values."""
 
-                if g < 0:
-                    g = 0
+    pixels = load_image_pixels(image_path_or_frame, square_side_length)
 
-            if color is None:
-                if calibration_dictionary != None:
-                    r, g, b = find_closest_color(calibrated_colors, r, g, b)
-                    image_array[y][x] = (r, g, b)
-                else:
-                    image_array[y][x] = (r, g, b)
-            else:
-                if r != 0 or g != 0 or b != 0:
-                    r, g, b = get_color_rgb_load(color)
-                    if calibration_dictionary != None:
-                        r, g, b = find_closest_color(calibrated_colors, r, g, b)
-                    image_array[y][x] = (r, g, b)
-                else:
-                    r, g, b = get_color_rgb_load("black")
-                    image_array[y][x] = (r, g, b)
+    if color is None:
+        image_array = pixels.astype(np.uint8)
+        if calibration_dictionary != None:
+            image_array = calibrated_colors.calibrate_image(image_array)
+    else:
+        # every lit pixel becomes the font color, the rest black
+        image_array = np.zeros(pixels.shape, dtype=np.uint8)
+        image_array[pixels.any(axis=2)] = font_color_rgb(color, calibrated_colors)
 
     return image_array
 
+
 """
-rotate_matrix is used for ease of use while rather inefficient it quickly allows a user to rotate their display
-to improve ergonomics, functionality, and ease of use
+Glyph atlas - the Digits/ and Alphabet/ glyphs are each loaded from disk once as a mask of their lit pixels and every
+(glyph, color) pair is only colored once, so text and clock frames are built from slice assignments of cached arrays
+
 """
+# (glyph path, square_side_length) -> boolean (height, width) mask of the glyphs lit pixels
+glyph_masks = {}
+
+# (glyph path, color, square_side_length) -> read only (height, width, 3) uint8 glyph drawn in color
+glyph_atlas = {}
+
+"""
+Function: load_glyph_masks - Loads every png in a glyph folder (Digits, Alphabet) into glyph_masks
+Expects: folder be a folder of glyph pngs and square_side_length be passed as it would be to load_image_to_array
+Does: Fills glyph_masks with the mask of every glyph in the folder (keyed by folder + "/" + file name)
 """
-Function_Helper: rotate_matrix - Takes a matrix and the rotate_k and rotates it by 90 degrees rotate_k times using numpy
-Expects: the matrix be a square
-Does: returns a k times 90 degrees rotated_matrix of the orignally passed matrix
+def load_glyph_masks(folder, square_side_length):
+    for glyph_file in sorted(os.listdir(folder)):
+        if glyph_file.lower().endswith(".png"):
+            glyph_path = folder + "/" + glyph_file
+            glyph_masks[(glyph_path, square_side_length)] = load_image_pixels(glyph_path, square_side_length).any(axis=2)
 
+
+"""
+Function: get_glyph - Returns a glyph drawn in color (the same array load_image_to_array would return for it)
+Expects: glyph_path be a glyph png (e.g. "Digits/1.png"), color a color name, and calibrated_colors/square_side_length
+as they would be passed to load_image_to_array
+Does: Returns the cached read only glyph, loading its mask and coloring it only the first time it's asked for
 """
-def rotate_matrix(matrix, rotate_k):
-    # Convert the matrix to a NumPy array
-    np_matrix = np.array(matrix)
-    # Rotate the array clockwise by 90 degrees
-    rotated_matrix = np.rot90(np_matrix, k=rotate_k)
-    # Convert the rotated array back to a Python list
-    rotated_matrix = rotated_matrix.tolist()
-    return rotated_matrix
+def get_glyph(glyph_path, color, calibrated_colors, square_side_length):
+    glyph = glyph_atlas.get((glyph_path, color, square_side_length))
+    if glyph is None:
+        mask = glyph_masks.get((glyph_path, square_side_length))
+        if mask is None:
+            mask = load_image_pixels(glyph_path, square_side_length).any(axis=2)
+            glyph_masks[(glyph_path, square_side_length)] = mask
 
+        glyph = np.zeros(mask.shape + (3,), dtype=np.uint8)
+        glyph[mask] = font_color_rgb(color, calibrated_colors)
+        glyph.flags.writeable = False
+        glyph_atlas[(glyph_path, color, square_side_length)] = glyph
+
+    return glyph
 
 """
 OUNP - only update necessary pixels
@@ -387,46 +457,22 @@ In short this is the easiest quickest way to drastically (varies a lot on conten
 but also the amount of pixels to change per frame. Meaning either much larger matrixes can be updated at the same FPS
 or much higher FPS can be achieved.
 
-Potential to improve. Look for ways to remove even more unnecessary updates by looking for small changes in color (imperceptible)
+With delta_threshold above 0 changes too small to see are skipped as well (perceptual_delta.py)
 """
 """
 Function: only_update_necessary_pixels - This function takes the previous frame (in a series of frames) and the current frame and returns
-a matrix containing boolean values indicating if the pixel in each corresponding index has changed (indicating we need to update information)
-Expects: previous_image_array, and current_image_array are matrixes same size matrixes and matrixes holding color information
-Does: Returns a boolean matrix indicating which indexes colors changed from the previous and current frames
+a boolean array indicating if the pixel at each strip index has changed (indicating we need to update information)
+Expects: previous_strip, and current_strip are same size strip order color arrays (from panel_geometry.frame_to_strip),
+perceptual_delta be the files PerceptualDelta (None compares the colors exactly)
+Does: Returns a boolean array indicating which strip indexes colors changed (visibly when perceptual_delta is given) from
+the previous and current frames
 
 """
 # Function to determine which pixels need to be updated in the animation frame
-def only_update_necessary_pixels(previous_image_array, current_image_array):
-    # Initialize list to track pixels that need updating
-    pixels_to_update = [True for _ in range(square_matrix_size * square_matrix_size)]
-
-    # Iterate over each column of pixels
-    for x in range(width):
-        # Check if column index is even or odd
-        if x % 2 == 0:
-            # Iterate over each row of pixels in the column
-            for y in range(height):
-                # Extract RGB values of current and previous pixels
-                r1, g1, b1 = current_image_array[y][x]
-                r2, g2, b2 = previous_image_array[y][x]
-                # Calculate index of pixel in the flattened array
-                index = x * height + y
-                # Check if RGB values differ between current and previous pixels
-                pixels_to_update[index] = (r1 != r2) or (g1 != g2) or (b1 != b2)
-        else:
-            # Iterate over each row of pixels in the column in reverse order
-            for y in range(height - 1, -1, -1):
-                # Extract RGB values of current and previous pixels
-                r1, g1, b1 = current_image_array[y][x]
-                r2, g2, b2 = previous_image_array[y][x]
-                # Calculate index of pixel in the flattened array
-                index = x * height + (height - 1 - y)
-                # Check if RGB values differ between current and previous pixels
-                pixels_to_update[index] = (r1 != r2) or (g1 != g2) or (b1 != b2)
-
-    # Return list indicating which pixels need updating
-    return pixels_to_update
+def only_update_necessary_pixels(previous_strip, current_strip, perceptual_delta=None):
+    if perceptual_delta is not None:
+        return perceptual_delta.changed_mask(previous_strip, current_strip)
+    return panel_geometry.changed_strip_mask(previous_strip, current_strip)
 
 """
 Image_array/.ani printer
@@ -434,44 +480,97 @@ takes the previous frame, current frame, and the .ani file name and writes the c
 
 """
 """
-Function: print_frame_to_file - Take a file_name, previous_image_array, and current_image_array indicates what pixels are 
+Function: print_frame_to_file - Take a ani_writer, previous_image_array, and current_image_array indicates what pixels are 
 changed and writes it to a .ani file in .ani file format
-Expects: file_name, previous_image_array, and current_image_array are initialized and containing valid information 
-(path exists and matrixes contain color information and are same size) 
+Expects: ani_writer (ani_format.AniWriter), previous_image_array, and current_image_array are initialized and containing valid information 
+(matrixes contain color information and are same size) 
 Does: Prints the changes between the frames in .ani format
 
 """
 # takes the image_array (array of a images RGB values) and prints it to the .ani file
-def print_frame_to_file(file_name, previous_image_array, current_image_array):
-    height = len(current_image_array)
-    width = len(current_image_array[0])
+def print_frame_to_file(ani_writer, previous_image_array, current_image_array):
+    # put both frames into strip order (including the rotate_k rotation) with one gather each
+    previous_strip = panel_geometry.frame_to_strip(previous_image_array, rotate_k)
+    current_strip = panel_geometry.frame_to_strip(current_image_array, rotate_k)
+
+    # get what pixels to update from OUNP
+    tracker = perceptual_deltas.get(ani_writer)
+    indexes = np.flatnonzero(only_update_necessary_pixels(previous_strip, current_strip, tracker))
+    write_frame_records(ani_writer, indexes, current_strip[indexes], False)
 
-    # if the user wants the final result to be rotated then rotate it
-    if rotate_k != 0:
-        previous_image_array = rotate_matrix(previous_image_array, rotate_k)
-        current_image_array = rotate_matrix(current_image_array, rotate_k)
 
+"""
+Holds the PerceptualDelta of every .ani being written (keyed by its AniWriter)
+"""
+perceptual_deltas = {}
 
-    # get what pixels to update from OUNP
-    pixels_to_update  = only_update_necessary_pixels(previous_image_array, current_image_array)
-    with open(file_name + ".ani", "a") as file:
-        file.write(" ")
-        for x in range(width):  # Iterate over columns
-            if x % 2 == 0:  # Even columns
-                for y in range(height):  # Iterate over rows in each column
-                    count = x * height + y
-                    if pixels_to_update[count]:
-                        r1, g1, b1 = current_image_array[y][x]  # Access pixel at (x, y)
-                        file.write(f"{count} {r1} {g1} {b1}, ")
-
-            else:  # Odd columns
-                for y in range(height - 1, -1, -1):  # Iterate over rows in reverse order
-                    count = x * height + (height - 1 - y)
-                    if pixels_to_update[count]:
-                        r1, g1, b1 = current_image_array[y][x]  # Access pixel at (x, y)
-                        file.write(f"{count} {r1} {g1} {b1}, ")
-        file.write("\n")
-        file.flush()
+"""
+Function: open_ani_writer - Opens a .ani for writing in the configured format (ani_version, square_matrix_size, delta_threshold)
+Expects: file_path be the .ani to write, fps a number, length the number of frames (None to count them as they're
+written), and kind one of ani_format.ANI_TYPES
+Does: Yields the ani_format.AniWriter (used as with open_ani_writer(...) as ani_writer:) and once the file is written
+prints how many pixel updates (and bytes) the perceptual delta saved when delta_threshold is above 0 (and what each block
+codec would do for it when report_compression is set)
+"""
+@contextmanager
+def open_ani_writer(file_path, fps, length, kind):
+    record_bytes = ani_format.DELTA_RECORD.size if ani_version != 1 else None
+    compression = ani_compression if ani_version != 1 else None
+    with ani_format.AniWriter(file_path, fps, length, kind, square_matrix_size, ani_version,
+                              indexed=use_palette_frames, compression=compression) as ani_writer:
+        perceptual_deltas[ani_writer] = perceptual_delta.PerceptualDelta(delta_threshold, record_bytes=record_bytes)
+        try:
+            yield ani_writer
+        finally:
+            tracker = perceptual_deltas.pop(ani_writer)
+
+    # lossless files have nothing to report, every change is written
+    if tracker.frames and delta_threshold > 0:
+        print(file_path + ": " + tracker.report())
+    if report_compression and ani_version != 1:
+        print(file_path + ": " + compression_report(file_path))
+
+
+"""
+Function_Helper: compression_report - describes what compressing a v2 .ani with each block codec gives
+Expects: file_path point to a v2 .ani file
+Does: Returns the size of its frames and, per codec, the compression ratio, compressed size, and time to decompress
+"""
+def compression_report(file_path):
+    stats = ani_format.compression_stats(file_path)
+    if not stats or not stats[0][1]:
+        return "no frames to compress"
+
+    parts = []
+    for codec, raw_bytes, compressed_bytes, seconds in stats:
+        if compressed_bytes is None:
+            parts.append(f"{codec} not installed")
+        else:
+            parts.append(f"{codec} {raw_bytes / compressed_bytes:.2f}x ({compressed_bytes} bytes, "
+                         f"{seconds * 1000:.3f} ms to decompress)")
+    return f"{stats[0][1]} bytes of frames, " + ", ".join(parts)
+
+
+"""
+Function_Helper: write_frame_records - appends one frame of records to the .ani being written by ani_writer
+Expects: ani_writer be the files ani_format.AniWriter, indexes be the strip indexes to write (ascending), colors the
+matching (r, g, b) rows, and full_frame indicate indexes covers every pixel
+Does: Appends the frame as one chunk (a text line for v1 or a v2 frame block of whichever encoding is smallest)
+"""
+def write_frame_records(ani_writer, indexes, colors, full_frame):
+    colors = np.asarray(colors).tolist()
+
+    if full_frame:
+        ani_writer.write_full(colors)
+        return
+
+    records = [(index, r1, g1, b1) for index, (r1, g1, b1) in zip(indexes.tolist(), colors)]
+    if use_drawing_ops and ani_writer.version != 1:
+        ops = drawing_ops.find_ops(ani_writer.panel, records, ani_writer.side_length)
+        if ops is not None:
+            ani_writer.write_ops(ops)
+            return
+    ani_writer.write_delta(records)
 
 
 """
@@ -522,13 +621,13 @@ Falling astroids function
 """
 """
 Function: failing_astroids_effect - takes the time, framerate, filename, matrix side length, and calibration dictionary 
-and makes length_of_time * frame_rate number of frames of the falling_astroids_effect saving them to the given .ani file_name
-Expects: length_of_time, frame_rate, file_name, square_matrix,size, and calibration file all correctly intiialized
+and makes length_of_time * frame_rate number of frames of the falling_astroids_effect saving them through the given ani_writer
+Expects: length_of_time, frame_rate, ani_writer, square_matrix,size, and calibration file all correctly intiialized and
+probability be the chance out of 100 of a new astroid each frame
 Does: Makes a .ani file containing frame data demonstrating the falling_astroids_effect
 
 """
-def falling_astroids_effect(length_of_time, frame_rate, file_name, square_matrix_size, calbration_dictionary):
-    probability = int(input("Please enter the probability of of 100: "))
+def falling_astroids_effect(length_of_time, frame_rate, ani_writer, square_matrix_size, calbration_dictionary, probability):
     number_of_frames_to_generate = length_of_time * frame_rate
     frame_count = 0
     # Create the blanked out image_array filled with black pixels
@@ -571,7 +670,7 @@ def falling_astroids_effect(length_of_time, frame_rate, file_name, square_matrix
             else:  # If all positions are taken, reset non_taken_positions
                 non_taken_positions = list(range(square_matrix_size))
 
-        print_frame_to_file(file_name, previous_image_array, image_array)
+        print_frame_to_file(ani_writer, previous_image_array, image_array)
         frame_count += 1
 
 
@@ -579,18 +678,17 @@ def falling_astroids_effect(length_of_time, frame_rate, file_name, square_matrix
 Placeholder as realistically need higher pixel panel to make
 """
 """
-Function: bouncing_ball - given length_of_time, frame_rate, file_name, and square_matrix_size and makes frames 
-showcasing a bouncing ball saving them to the .ani file_name
-Expects: length_of_time, frame_rate, file_name, square_matrix_size all correctly initialized
-Does: Prints frames to the given file_name .ani showcasing a ball bouncing around
+Function: bouncing_ball - given length_of_time, frame_rate, ani_writer, and square_matrix_size and makes frames 
+showcasing a bouncing ball saving them through ani_writer
+Expects: length_of_time, frame_rate, ani_writer, square_matrix_size all correctly initialized and num_balls be the
+number of balls
+Does: Prints frames through the given ani_writer showcasing a ball bouncing around
 
 """
-def bouncing_ball(length_of_time, frame_rate, file_name, square_matrix_size, calibration_dictionary):
+def bouncing_ball(length_of_time, frame_rate, ani_writer, square_matrix_size, calibration_dictionary, num_balls):
     direction_dictionary = {'down': (1, 0), 'up': (-1, 0), 'right': (0, 1), 'left': (0, -1), 'down_right': (1, 1),
                             'down_left': (1, -1), 'up_right': (-1, 1), 'up_left': (-1, -1)}
 
-    num_balls = int(input("Please enter the number of balls: "))
-
     balls = []
 
     for _ in range(num_balls):
@@ -696,7 +794,7 @@ def bouncing_ball(length_of_time, frame_rate, file_name, square_matrix_size, cal
                 hit_wall_flag = True  # Set flag if the ball hits the wall
 
         # Print the frame to the file
-        print_frame_to_file(file_name, previous_image_array, image_array)
+        print_frame_to_file(ani_writer, previous_image_array, image_array)
         frame_count += 1
 
 
@@ -719,15 +817,14 @@ def array_to_matrix(image_array, rows, cols):
 Moving lines function
 """
 """
-Function: moving_lines - takes length_of_time, frame_rate, file_name, and square_matrix_size and creates frames 
+Function: moving_lines - takes length_of_time, frame_rate, ani_writer, and square_matrix_size and creates frames 
 showcasing colors lines moving across the panel printing these frames to the indicated .ani file
-Expects: length_of_time, frame_rate, file_name, square_matrix_size are all correctly initialized
-Does: Prints frames containing color lines moving around the panel to the indicated .ani file_name
+Expects: length_of_time, frame_rate, ani_writer, square_matrix_size are all correctly initialized and length_of_line
+be the number of pixels in each line
+Does: Prints frames containing color lines moving around the panel through the indicated ani_writer
 
 """
-def moving_lines(length_of_time, frame_rate, file_name, square_matrix_size, calibration_dictionary):
-    length_of_line = input("Please enter the number of pixels each line should be: ")
-    length_of_line = int(length_of_line)
+def moving_lines(length_of_time, frame_rate, ani_writer, square_matrix_size, calibration_dictionary, length_of_line):
 
     image_as_one_dimensional_array = [(0, 0, 0)] * (square_matrix_size * square_matrix_size)
 
@@ -750,7 +847,7 @@ def moving_lines(length_of_time, frame_rate, file_name, square_matrix_size, cali
             previous_image_array = [row[:] for row in image_array]  # Create a deep copy of image_array
             image_array = array_to_matrix(image_as_one_dimensional_array, square_matrix_size, square_matrix_size)
             #print(image_array)
-            print_frame_to_file(file_name, previous_image_array, image_array)
+            print_frame_to_file(ani_writer, previous_image_array, image_array)
             frame_count = frame_count + 1
 
             for j in range(len(image_as_one_dimensional_array) - 1, 0, -1):
@@ -763,32 +860,145 @@ End effects
 
 
 """
-GIF helper
+Function_Helper: gif_hold_steps - returns how many steps to hold a gif frame for after the one it's shown for
+Expects: duration be the frames delay in milliseconds
+Does: Returns the delay in gif_step_ms steps less the first (every frame is shown for at least one step)
+"""
+def gif_hold_steps(duration):
+    return max(int(round(duration / gif_step_ms)), 1) - 1
+
+
 """
+Function: convert_gif - Converts a gif into a .ani
+Expects: gif_path point to a gif file, output_path be the .ani to write, fps the .ani fps (None uses the gifs frame
+durations), insert_black_frame whether to end on a black frame, remove_grid be True if the gif has a grid imposed on it,
+and pitch the grids block size
+Does: Reads the gif in a single pass writing each frame as it's decoded, with fps None every frame is held for its own
+delay (in gif_step_ms steps) and the length is patched into the header once the last frame is read. Returns (frames
+written, seconds taken), an existing .ani is only replaced once the new one is complete (left as it was if the
+conversion fails)
 """
-Function_Helper: get_gif_fps returns the fps of the given gif file_name
-Expects: file_path point to a valid gif file
-Does: returns the fps of the indicated gif file_name
+def convert_gif(gif_path, output_path, fps=None, insert_black_frame=False, remove_grid=False, pitch=grid_pitch):
+    start = time.perf_counter()
+
+    # Create the blanked out image_array filled with black pixels
+    image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
+    frames_written = 0
+    durations = []
+
+    # frames keep their own delays unless an fps was asked for (or the format can't hold frames)
+    timed = fps is None and ani_version != 1
+    file_fps = 1000 / gif_step_ms if timed else fps
+
+    with Image.open(gif_path) as gif, open_ani_writer(output_path, file_fps, None, "gif") as ani_writer:
+
+        # Iterate over each frame in the GIF and add it to the animation file, frames are used in place as the grid
+        # removal and resize already make new images
+        for frame_number, frame in enumerate(ImageSequence.Iterator(gif)):
+            # the first frame is skipped, as the seek loop this replaced always did (its delay isn't counted either)
+            if frame_number == 0:
+                continue
+
+            duration = frame.info.get("duration") or default_gif_duration
+            durations.append(duration)
+
+            # the grid is removed from each frame as it is read rather than rewriting the gif first
+            if remove_grid:
+                frame = remove_grid_from_frame(frame, pitch)
+            frame = frame.resize((square_matrix_size, square_matrix_size), Image.NEAREST)
+
+            previous_image_array = image_array
+            image_array = load_image_to_array(frame, None, calibration_dictionary, square_matrix_size)
+
+            print_frame_to_file(ani_writer, previous_image_array, image_array)
+            frames_written += 1
+
+            if timed:
+                ani_writer.write_hold(gif_hold_steps(duration))
+
+        average_duration = sum(durations) / len(durations) if durations else default_gif_duration
+
+        if insert_black_frame:
+            previous_image_array = image_array
+            image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
+            print_frame_to_file_debug(ani_writer, previous_image_array, image_array)
+            frames_written += 1
+
+            # shown for an average frame
+            if timed:
+                ani_writer.write_hold(gif_hold_steps(average_duration))
+
+        # fps from the average frame duration in milliseconds
+        if fps is None and not timed:
+            ani_writer.fps = 1000 / average_duration
+
+    return frames_written, time.perf_counter() - start
+
 
 """
-# gets the gif's FPS
-def get_gif_fps(file_path):
-    with Image.open(file_path) as img:
-        duration = img.info['duration']  # Get the duration of each frame in milliseconds
-        fps = 1000 / duration  # Convert duration from milliseconds to seconds
-        return fps
+Function: convert_gif_to_ani - Converts a single gif into a .ani of the same name next to it (folder mode's per file work)
+Expects: gif_path point to a gif file, remove_grid be True if the gif has a grid imposed on it, and pitch the grids block size
+Does: Writes the .ani with convert_gif and returns (frames written, seconds taken)
+"""
+def convert_gif_to_ani(gif_path, remove_grid, pitch=grid_pitch):
+    return convert_gif(gif_path, os.path.splitext(gif_path)[0] + ".ani", remove_grid=remove_grid, pitch=pitch)
+
 
 """
-Function_Helper: get_gif_number_of_frames returns how many frames are in the gif file_name
-Expects: file_name points to a valid gif file
-Does: returns the number of frames in the gif
+Function: convert_gif_folder - Converts every gif in a folder to .ani files across a pool of processes
+Expects: folder_path be a folder, remove_grid be True if the gifs have a grid imposed on them, workers the number of
+processes (None uses every core), and pitch the grids block size
+Does: Converts the gifs in parallel printing each files throughput, a failed file is reported and the rest still convert,
+returns the list of (gif path, error) for the files that failed
+"""
+def convert_gif_folder(folder_path, remove_grid, workers=None, pitch=grid_pitch):
+    gif_paths = [
+        os.path.join(folder_path, filename)
+        for filename in sorted(os.listdir(folder_path))
+        if filename.endswith(".gif") or filename.endswith(".GIF")
+    ]
+    outcomes = []
+    start = time.perf_counter()
+
+    # the workers are forked so they inherit the settings this process was given (ani_version, delta_threshold, ...)
+    if "fork" in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            futures = {pool.submit(convert_gif_to_ani, gif_path, remove_grid, pitch): gif_path for gif_path in gif_paths}
+            for future in as_completed(futures):
+                error = future.exception()
+                outcomes.append((futures[future], None if error else future.result(), error))
+                report_conversion(*outcomes[-1])
+    else:
+        for gif_path in gif_paths:
+            try:
+                result, error = convert_gif_to_ani(gif_path, remove_grid, pitch), None
+            except Exception as e:
+                result, error = None, e
+            outcomes.append((gif_path, result, error))
+            report_conversion(*outcomes[-1])
+
+    failures = [(gif_path, error) for gif_path, result, error in outcomes if error is not None]
+    total_frames = sum(result[0] for gif_path, result, error in outcomes if error is None)
+
+    elapsed = time.perf_counter() - start
+    print(f"Converted {len(gif_paths) - len(failures)} of {len(gif_paths)} gifs ({total_frames} frames) in {elapsed:.2f}s")
+    for gif_path, error in failures:
+        print(f"FAILED {gif_path}: {error}")
+
+    return failures
+
 
 """
-# gets the number of frames in a gif
-def get_gif_number_of_frames(file_path):
-    with Image.open(file_path) as img:
-        total_frames = img.n_frames  # Get the total number of frames
-        return total_frames
+Function_Helper: report_conversion - Prints how a single conversion (gif or video) went
+Expects: result be (frames, seconds) or None and error the exception it failed with (or None)
+Does: Prints the files frames and frames per second or the error
+"""
+def report_conversion(file_path, result, error):
+    if error is not None:
+        print(f"{file_path}: failed ({error})")
+    else:
+        frames, seconds = result
+        print(f"{file_path}: {frames} frames in {seconds:.2f}s ({frames / max(seconds, 1e-9):.0f} frames/s)")
 
 
 
@@ -804,90 +1014,59 @@ Expects: same as print_frame_to_file
 Does: same as print_frame_to_file
 
 """
-def print_frame_to_file_debug(file_name, previous_image_array, current_image_array):
-    height = len(current_image_array)
-    width = len(current_image_array[0])
-    
-    if rotate_k != 0:
-        
-        previous_image_array = rotate_matrix(previous_image_array, rotate_k)
-        current_image_array = rotate_matrix(current_image_array, rotate_k)
-    
-    # get what pixels to update from OUNP
-    pixels_to_update  = only_update_necessary_pixels(previous_image_array, current_image_array)
-    
-    with open(file_name + ".ani", "a") as file:
-        file.write(" ")
-        for x in range(width):  # Iterate over columns
-            if x % 2 == 0:  # Even columns
-                for y in range(height):  # Iterate over rows in each column
-                    count = x * height + y
-                    r1, g1, b1 = current_image_array[y][x]  # Access pixel at (x, y)
-                    file.write(f"{count} {r1} {g1} {b1}, ")
-
-            else:  # Odd columns
-                for y in range(height - 1, -1, -1):  # Iterate over rows in reverse order
-                    count = x * height + (height - 1 - y)
-                    r1, g1, b1 = current_image_array[y][x]  # Access pixel at (x, y)
-                    file.write(f"{count} {r1} {g1} {b1}, ")
-        file.write("\n")
+def print_frame_to_file_debug(ani_writer, previous_image_array, current_image_array):
+    current_strip = panel_geometry.frame_to_strip(current_image_array, rotate_k)
+    if ani_writer in perceptual_deltas:
+        perceptual_deltas[ani_writer].reset(current_strip)
+    write_frame_records(ani_writer, np.arange(len(current_strip)), current_strip, True)
 
 """
 Function_Helper: imprint_matrix - takes a image_array and imprints the given character onto the image_array
 Expects: image_array, row, col, character, font_color, and calibration dictionary are all intialized
 Does: Returns the image_array except with the indicated character imprinting onto the array in the position specifiied by row and col
+(a NumPy image_array is stamped in place with a slice assignment of the cached glyph)
 
 """
 def imprint_matrix(row, col, image_array, character, font_color, calibration_dictionary):
-    character_array = []
-
     if character == ':':
-        character_array = load_image_to_array("Digits/" + str("colon") + ".png", font_color, calibration_dictionary, -1)
+        character_array = get_glyph("Digits/" + str("colon") + ".png", font_color, calibration_dictionary, -1)
     else:
-        character_array = load_image_to_array("Digits/" + str(character) + ".png", font_color, calibration_dictionary, -1)
-
-
-
-    character_array = np.array(character_array)
-    image_array = np.array(image_array)
+        character_array = get_glyph("Digits/" + str(character) + ".png", font_color, calibration_dictionary, -1)
 
+    # stamped in place when image_array is already an array (clock_generator reuses one frame array)
+    image_array = np.asarray(image_array)
 
     # Starting row and column index in the target array
     start_row = row
     start_col = col
 
-    # Get the dimensions of the source and target arrays
-    source_rows = len(character_array)
-    source_cols = len(character_array[0])
-    target_rows = len(image_array)
-    target_cols = len(image_array[0])
-
     # Calculate the ending row and column index in the target array
-    end_row = min(start_row + source_rows, target_rows)
-    end_col = min(start_col + source_cols, target_cols)
+    end_row = min(start_row + character_array.shape[0], image_array.shape[0])
+    end_col = min(start_col + character_array.shape[1], image_array.shape[1])
 
     # Place the source array into the target array
     image_array[start_row:end_row, start_col:end_col] = character_array[:end_row - start_row, :end_col - start_col]
 
-    image_array = image_array.tolist()
     return image_array
 
 """
-Function: clock_generator - takes a file_name, font_color, row_offset, col_offset and generates the .ani for 
+Function: clock_generator - takes a ani_writer, font_color, row_offset, col_offset and generates the .ani for 
 a clock from midnight to midnight
-Expects: file_name, font_color, row_offset, col_offset are all valid and initialized
-Does: generates frames of each minute of a clock from midnight to midnight and prints the frame data to a .ani file_name
+Expects: ani_writer, font_color, row_offset, col_offset are all valid and initialized
+Does: generates frames of each minute of a clock from midnight to midnight and prints the frame data through ani_writer
 
 """
-def clock_generator(file_name, font_color, row_offset, col_offset, calbration_dictionary):
+def clock_generator(ani_writer, font_color, row_offset, col_offset, calbration_dictionary):
 
     digit_col_length = 3
     colon_length = 2
 
-    # Create the blanked out image_array filled with black pixels
-    previous_image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
-    # Create the blanked out image_array filled with black pixels
-    current_image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
+    # every digit is loaded from disk once up front
+    load_glyph_masks("Digits", -1)
+
+    # Create the blanked out image_arrays filled with black pixels, the two are swapped and reused for every minute
+    previous_image_array = np.zeros((square_matrix_size, square_matrix_size, 3), dtype=np.uint8)
+    current_image_array = np.zeros((square_matrix_size, square_matrix_size, 3), dtype=np.uint8)
     
     for k in range(0,2):
         for j in range(0, 60):
@@ -911,9 +1090,9 @@ def clock_generator(file_name, font_color, row_offset, col_offset, calbration_di
 
 
 
-            print_frame_to_file_debug(file_name, previous_image_array, current_image_array)
-            previous_image_array = current_image_array
-            current_image_array = [[(0, 0, 0) for _ in range(width)] for _ in range(height)]
+            print_frame_to_file_debug(ani_writer, previous_image_array, current_image_array)
+            previous_image_array, current_image_array = current_image_array, previous_image_array
+            current_image_array[:] = 0
 
         for i in range(1, 12):
             for j in range(0, 60):
@@ -934,377 +1113,375 @@ def clock_generator(file_name, font_color, row_offset, col_offset, calbration_di
                 fourth_digit = j % 10
                 current_image_array = imprint_matrix(row_offset, col_offset + (digit_col_length * 3) + 2 + colon_length, current_image_array, fourth_digit, font_color, calibration_dictionary)
 
-                print_frame_to_file_debug(file_name, previous_image_array, current_image_array)
-                previous_image_array = current_image_array
-                current_image_array = [[(0, 0, 0) for _ in range(width)] for _ in range(height)]
+                print_frame_to_file_debug(ani_writer, previous_image_array, current_image_array)
+                previous_image_array, current_image_array = current_image_array, previous_image_array
+                current_image_array[:] = 0
 
 
 
 """
-Calibration File Reader - NOTE CURRENTLY UNUSED AS COLOR quality was significantly better than expected but code is functional
+CONVERSIONS - one function per kind of .ani with everything it needs passed in (nothing prompts), the menu and command
+line below are built on these and scripts can import them to convert many assets in one process (glyphs, calibration,
+and strip mappings stay cached between calls)
+
 """
-# Function to read calibration data from a file and store it in a dictionary
 """
-DEPRECATED to be removed
+Function: convert_images - Makes a .ani from a folder of images
+Expects: folder_path be a folder of images, output_path the .ani to write, frame_rate the fps, and number_of_frames the
+count of images named 1.png to number_of_frames.png (None uses every file in the folder, in listing order)
+Does: Writes each image as a frame of the .ani
 """
-def read_calibration_file(filename):
-    # Initialize an empty dictionary to store color calibration data
-    colors = {}
-    # Open the calibration file for reading
-    with open(filename, "r") as file:
-        # Iterate over each line in the file
-        for line in file:
-            # Extract the color name from the line
-            name = line[1:line.rfind('"')]
-            # Remove unnecessary characters and split the line into components
-            line = line[line.find("(") + 1:]
-            line = line.split()
-            # Extract original RGB values from the line
-            r_original = [int(num) for num in re.findall(r'\d+', line[0])][0]
-            g_original = [int(num) for num in re.findall(r'\d+', line[1])][0]
-            b_original = [int(num) for num in re.findall(r'\d+', line[2])][0]
-            # Extract calibrated RGB values from the line
-            r_calibrated = [int(num) for num in re.findall(r'\d+', line[4])][0]
-            g_calibrated = [int(num) for num in re.findall(r'\d+', line[5])][0]
-            b_calibrated = [int(num) for num in re.findall(r'\d+', line[6])][0]
-            # Store the color data in the dictionary
-            colors[name] = ((r_original, g_original, b_original), (r_calibrated, g_calibrated, b_calibrated))
+def convert_images(folder_path, output_path, frame_rate, number_of_frames=None):
+    if number_of_frames is not None:
+        image_paths = [os.path.join(folder_path, str(i) + ".png") for i in range(1, int(number_of_frames) + 1)]
+    else:
+        image_paths = [os.path.join(folder_path, current_file) for current_file in os.listdir(folder_path)]
 
-    # Return the dictionary containing color calibration data
-    return colors
+    # Create the blanked out image_array filled with black pixels
+    image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
+
+    # Write animation metadata to the file, it only appears at its path once every frame is written
+    with open_ani_writer(output_path, frame_rate, len(image_paths), "images") as ani_writer:
 
+        # Iterate over each frame and add it to the animation file
+        for image_path in image_paths:
+            previous_image_array = image_array
+            image_array = load_image_to_array(image_path, None, calibration_dictionary, square_matrix_size)
+            print_frame_to_file(ani_writer, previous_image_array, image_array)
 
+
+"""
+Function: convert_text - Makes a .ani showing text one character per frame
+Expects: text be letters and spaces, font_color a color name (see get_color_rgb_load), output_path the .ani to write,
+and frame_rate the fps
+Does: Writes a frame for every letter or space of text (anything else is skipped)
 """
-DRIVER
+def convert_text(text, font_color, output_path, frame_rate):
+    # every letter is loaded from disk once, repeated letters reuse the same colored glyph
+    load_glyph_masks("Alphabet", square_matrix_size)
 
+    # Create the blanked out image_array filled with black pixels
+    image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
+
+    # Write animation metadata to the file, it only appears at its path once every frame is written
+    with open_ani_writer(output_path, frame_rate, len(text), "text") as ani_writer:
+
+        # Iterate over each character in the text and add it to the animation file
+        for i in text:
+            previous_image_array = image_array
+            if i.isupper():
+                image_array = get_glyph("Alphabet/" + str(i) + ".png", font_color, calibration_dictionary, square_matrix_size)
+                print_frame_to_file(ani_writer, previous_image_array, image_array)
+            elif i.islower():
+                image_array = get_glyph("Alphabet/" + str(i) + "l" + ".png", font_color, calibration_dictionary, square_matrix_size)
+                print_frame_to_file(ani_writer, previous_image_array, image_array)
+            elif i.isspace():
+                image_array = get_glyph("Alphabet/" + "space" + ".png", font_color, calibration_dictionary, square_matrix_size)
+                print_frame_to_file(ani_writer, previous_image_array, image_array)
+
+
+"""
+Function: convert_video - Makes a .ani from a video (see video_ingest.py for the sources it reads)
+Expects: source_path be a multi frame image, MJPEG stream, or folder of numbered images, output_path the .ani to write,
+frame_rate the fps, and source_fps the fps of sources without frame durations (None uses frame_rate)
+Does: Streams the frames into the .ani one at a time and returns (frames written, seconds taken)
 """
-# Check if the file exists
-if os.path.exists("calibration.cal"):
-    calibration_dictionary = read_calibration_file("calibration.cal")
+def convert_video(source_path, output_path, frame_rate, source_fps=None):
+    start = time.perf_counter()
+    frames_written = 0
 
-else:
-    calibration_dictionary = None
+    # Create the blanked out image_array filled with black pixels
+    image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
 
-# DONT USE CALIBRATION FILE SINCE COLORS ARE SATISFACTORY
-calibration_dictionary = None
+    # frames are streamed from the video and written one at a time so the clip is never held in memory, the length
+    # isn't known until the last frame so it is filled into the header once the file is finished
+    with open_ani_writer(output_path, frame_rate, None, "video") as ani_writer:
+        for frame in video_ingest.stream_video(source_path, square_matrix_size, frame_rate, source_fps):
+            previous_image_array = image_array
+            image_array = load_image_to_array(frame, None, calibration_dictionary, square_matrix_size)
+            print_frame_to_file(ani_writer, previous_image_array, image_array)
+            frames_written += 1
 
-# Ask the user if they want the final frame to be rotated
-#rotate_k = int(input("Please input K value: "))
+    return frames_written, time.perf_counter() - start
 
-# driver code that determines what type of animation the user wants and then walks them through the selections and creates the .ani file
-option = input("Please enter \n1 folders of images\n2 text \n3 gif \n4 video"
-                + "\n5 Effects \n6 24 hour clock\n7 itinerary\n8 single images\n:")
 
-# Create the blanked out image_array filled with black pixels
-image_array = [[(0, 0, 0) for _ in range(width)] for _ in range(height)]
+# effect name -> (effect function, name of the option it takes)
+EFFECTS = {
+    "falling_asteroids": (falling_astroids_effect, "probability"),
+    "bouncing_ball": (bouncing_ball, "num_balls"),
+    "moving_lines": (moving_lines, "length_of_line"),
+}
 
-# images
-if int(option) == 1:
-    # Prompt the user for input
-    folders_name = input("Please enter the folder's name: ") + "/"
+"""
+Function: generate_effect - Makes a .ani of one of the EFFECTS
+Expects: effect be a name in EFFECTS, output_path the .ani to write, length_of_time the seconds to generate, frame_rate
+the fps, and option the effects setting (astroid probability out of 100, number of balls, or pixels per line)
+Does: Writes length_of_time * frame_rate frames of the effect
+"""
+def generate_effect(effect, output_path, length_of_time, frame_rate, option):
+    effect_function, option_name = EFFECTS[effect]
 
-    numbered_or_random = input("Are the images numbered 1-x?(Y/N):")
+    # Write animation metadata to the file, it only appears at its path once every frame is written
+    with open_ani_writer(output_path, frame_rate, int(frame_rate * length_of_time), "effect") as ani_writer:
+        effect_function(length_of_time, frame_rate, ani_writer, square_matrix_size, calibration_dictionary, option)
 
-    if numbered_or_random.lower() == "y":
 
-        number_of_pictures = int(input("Please enter the number of frames: "))
-        file_name = input("Please enter the name for the output file: ")
-        frame_rate = input("Please enter the desired frames per second: ")
+"""
+Function_Helper: centered_clock_offsets - Returns the (row, col) offsets that center the clock on the panel
+Expects: square_matrix_size be over 8
+Does: Returns the offsets the clock is column centered at
+"""
+def centered_clock_offsets():
+    if square_matrix_size > 16:
+        return 0, (((square_matrix_size // 16) // 2) * 16) - 8
+    return 0, 0
 
-        # Prepare the file path
-        file_path = file_name + ".ani"
 
-        calibration_dictionary = None
+"""
+Function: generate_clock - Makes the 24 hour clock .ani (a frame per minute from midnight to midnight)
+Expects: output_path be the .ani to write, font_color a color name, and row_offset/col_offset where the time is drawn
+Does: Writes the clock, raises ValueError if the panel is too small to show it
+"""
+def generate_clock(output_path, font_color, row_offset=0, col_offset=0):
+    if square_matrix_size <= 8:
+        raise ValueError("clock isn't able to be shown on such a small display")
 
-        # Remove the file if it already exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print("File deleted successfully.")
-        else:
-            print("File does not exist.")
+    # Write animation metadata to the file
+    #TODO unblock (FPS of 0.016666666667)
+    with open_ani_writer(output_path, 24, 1440, "clock") as ani_writer:
+        clock_generator(ani_writer, font_color, int(row_offset), int(col_offset), calibration_dictionary)
 
-        # Write animation metadata to the file
-        with open(file_name + ".ani", "a") as file:
-            file.write("\"\n")
-            file.write("\"\n")
-            file.write("FPS: " + str(frame_rate) + "\n")
-            file.write("Length: " + str(number_of_pictures) + "\n")
-            file.write("Type: images\n")
-            file.write("Side_Length: " + str(square_matrix_size) + "\n")
 
-        # Iterate over each frame and add it to the animation file
-        for i in range(1, int(number_of_pictures) + 1):
-            previous_image_array = image_array
-            image_array = load_image_to_array(folders_name + str(i) + ".png", None, calibration_dictionary, square_matrix_size)
-            print_frame_to_file(file_name, previous_image_array, image_array)
+"""
+Function: convert_image - Makes a single frame .ani of an image
+Expects: image_path point to an image and output_path be the .ani to write
+Does: Writes the image as the only frame
+"""
+def convert_image(image_path, output_path):
+    # Create the blanked out image_array filled with black pixels
+    image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
 
-    else:
-        number_of_pictures = os.listdir(folders_name)
-        file_name = input("Please enter the name for the output file: ")
-        frame_rate = input("Please enter the desired frames per second: ")
+    # Write animation metadata to the file, it only appears at its path once every frame is written
+    with open_ani_writer(output_path, 1, 1, "image") as ani_writer:
+        previous_image_array = image_array
+        image_array = load_image_to_array(image_path, None, calibration_dictionary, square_matrix_size)
+        print_frame_to_file(ani_writer, previous_image_array, image_array)
 
-        # Prepare the file path
-        file_path = file_name + ".ani"
 
-        calibration_dictionary = None
+"""
+Function: add_itinerary_entry - Appends a file to an itinerary
+Expects: itinerary_path be the .iti file, file_name the .ani to play, seconds_to_account_for the seconds of the day left,
+and seconds_played how long it plays (no more than seconds_to_account_for)
+Does: Appends the entry and returns the seconds left to account for
+"""
+def add_itinerary_entry(itinerary_path, file_name, seconds_to_account_for, seconds_played):
+    if seconds_played > seconds_to_account_for:
+        raise ValueError("Thats too long you only have " + str(seconds_to_account_for) + " to allot for")
 
-        # Remove the file if it already exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print("File deleted successfully.")
-        else:
-            print("File does not exist.")
-
-        # Write animation metadata to the file
-        with open(file_name + ".ani", "a") as file:
-            file.write("\"\n")
-            file.write("\"\n")
-            file.write("FPS: " + str(frame_rate) + "\n")
-            file.write("Length: " + str(number_of_pictures) + "\n")
-            file.write("Type: images\n")
-            file.write("Side_Length: " + str(square_matrix_size) + "\n")
-
-        # Iterate over each file in the folder
-        for current_file in os.listdir(folders_name):
-            previous_image_array = image_array
-            image_array = load_image_to_array(folders_name + "/" + current_file, None, calibration_dictionary,
-                                              square_matrix_size)
-            print_frame_to_file(file_name, previous_image_array, image_array)
+    with open(itinerary_path, 'a') as file:
+        file.write((str(seconds_to_account_for) + " - " + str(seconds_to_account_for - seconds_played) + " : " + str(file_name) + "\n"))
 
+    return seconds_to_account_for - seconds_played
 
-# Text
-elif int(option) == 2:
-    # Prompt the user for text input
-    text = input("Please enter the text you want: ")
-    font_color = input("Please enter a color from the list. Options are:\nred, green, blue,\nblack, white, yellow,\ncyan, magenta, purple,\norange, pink, brown,\ngray, light_gray, dark_gray,\nolive, teal, navy: ")
-    file_name = input("Please enter the name for the output file: ")
-    frame_rate = input("Please enter the desired frames per second: ")
 
-    # Prepare the file path
-    file_path = file_name + ".ani"
+"""
+Function: random_gif_itinerary - Writes an itinerary that fills the whole day with random gifs
+Expects: itinerary_path be the .iti file to (re)write and gif_folder a folder of gif .ani files
+Does: Plays random .ani files from gif_folder 2 to 5 times each until the 86400 seconds of the day are used
+"""
+def random_gif_itinerary(itinerary_path, gif_folder="random_gif_anis"):
+    seconds_to_account_for = 86400
+    gifs = []
 
     # Remove the file if it already exists
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print("File deleted successfully.")
-    else:
-        print("File does not exist.")
+    if os.path.exists(itinerary_path):
+        os.remove(itinerary_path)
 
-    calibration_dictionary = None
+    # Iterate over each file in the folder
+    for filename in os.listdir(gif_folder):
+        if filename.endswith(".ANI") or filename.endswith(".ani"):
+            gif_path = os.path.join(gif_folder, filename)
+            # Read the FPS and length from the header (works for both .ani versions)
+            fps, length, kind, side_length = ani_format.read_ani_header(gif_path)
 
-    # Write animation metadata to the file
-    with open(file_name + ".ani", "a") as file:
-        file.write("\"\n")
-        file.write("\"\n")
-        file.write("FPS: " + str(frame_rate) + "\n")
-        file.write("Length: " + str(len(text)) + "\n")
-        file.write("Type: text\n")
-        file.write("Side_Length: " + str(square_matrix_size) + "\n")
-
-    # Iterate over each character in the text and add it to the animation file
-    for i in text:
-        previous_image_array = image_array
-        if i.isupper():
-            image_array = load_image_to_array("Alphabet/" + str(i) + ".png", font_color, calibration_dictionary, square_matrix_size)
-            print_frame_to_file(file_name, previous_image_array, image_array)
-        elif i.islower():
-            image_array = load_image_to_array("Alphabet/" + str(i) + "l" + ".png", font_color, calibration_dictionary, square_matrix_size)
-            print_frame_to_file(file_name, previous_image_array, image_array)
-        elif i.isspace():
-            image_array = load_image_to_array("Alphabet/" + "space" + ".png", font_color, calibration_dictionary, square_matrix_size)
-            print_frame_to_file(file_name, previous_image_array, image_array)
-
-# GIF
-elif int(option) == 3:
-
-    folder_or_file = input("Would you like to convert a folder of gifs?(Y/N)")
-
-    if folder_or_file.lower() == "n":
-
-        # Prompt the user for GIF input
-        gif_name = input("Please enter the file name of the gif: ")
-        gif_name = gif_name.replace('"', '').replace("'", "")
-        file_name = input("Please enter the output files name: ")
-        custom_fps = input("Do you want a custom FPS?(Y/N): ")
-        insert_black_frame = input("Insert a black frame at end of gif? (Y/N): ")
-        remove_grid = input("Remove a grid? (Y/N): ")
+            gifs.append((gif_path, int(round(int(float(length))//int(float(fps))))))
 
-        gif_type_check = gif_name[-4:]
+    while seconds_to_account_for > 0:
+        gif_path, duration = random.choice(gifs)
 
-        if gif_type_check.lower() != '.gif':
-            gif_name = gif_name + ".gif"
+        seconds_played = random.randint(2, 5) * duration
 
-        if remove_grid.lower() == 'y':
-            remove_grid_from_gif(gif_name)
-            #gif_name = "grid_removal/modified.gif"
+        with open(itinerary_path, 'a') as file:
+            file.write((str(seconds_to_account_for) + " - " + str(seconds_to_account_for - seconds_played) + " : " + str(gif_path) + "\n"))
 
-        if custom_fps.lower() == 'n':
-            # Get the frames per second from the GIF
-            fps = get_gif_fps(gif_name)
-        else:
-            fps = int(input("Please enter the desired FPS: "))
+        seconds_to_account_for = seconds_to_account_for - seconds_played
 
-        # Prepare the file path
-        file_path = file_name + ".ani"
 
-        calibration_dictionary = None
+"""
+Function_Helper: with_extension - Adds an extension to a file name that doesn't already end in it
+Expects: file_name be a path and extension be like ".ani"
+Does: Returns file_name ending in extension
+"""
+def with_extension(file_name, extension):
+    if file_name[-len(extension):].lower() != extension:
+        file_name = file_name + extension
+    return file_name
 
-        # Remove the file if it already exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print("File deleted successfully.")
-        else:
-            print("File does not exist.")
-
-        # Write animation metadata to the file
-        with open(file_name + ".ani", "a") as file:
-            file.write("\"\n")
-            file.write("\"\n")
-            file.write("FPS: " + str(fps) + "\n")
-            file.write("Length: " + str(get_gif_number_of_frames(gif_name)) + "\n")
-            file.write("Type: gif\n")
-            file.write("Side_Length: " + str(square_matrix_size) + "\n")
-
-        gif = Image.open(gif_name)
-        # Iterate over each frame in the GIF and add it to the animation file
-        while True:
-            try:
-                gif.seek(gif.tell() + 1)
-            except EOFError:
-                break
 
-            frame = gif.copy().resize((square_matrix_size, square_matrix_size), Image.NEAREST)
+"""
+Function_Helper: load_configured_calibration - Sets calibration_dictionary for the conversions
+Expects: NONE
+Does: Loads calibration.cal when it exists, it is then turned off as the colors are satisfactory without it
+"""
+def load_configured_calibration():
+    global calibration_dictionary
 
-            previous_image_array = image_array
-            image_array = load_image_to_array(frame, None, calibration_dictionary, square_matrix_size)
+    # Check if the file exists
+    if os.path.exists("calibration.cal"):
+        # compiled into a lookup table (cached next to calibration.cal) so calibrating a frame is one index
+        calibration_dictionary = color_calibration.load_calibration("calibration.cal")
 
-            print_frame_to_file_debug(file_name, previous_image_array, image_array)
+    else:
+        calibration_dictionary = None
+
+    # DONT USE CALIBRATION FILE SINCE COLORS ARE SATISFACTORY
+    calibration_dictionary = None
 
-        if insert_black_frame.lower() == 'y':
-            image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
-            print_frame_to_file_debug(file_name, previous_image_array, image_array)
 
+"""
+Function_Helper: remove_existing_file - Removes the file the menu is about to write (printing if it existed)
+Expects: file_path be a path
+Does: Removes file_path if it exists
+"""
+def remove_existing_file(file_path):
+    # Remove the file if it already exists
+    if os.path.exists(file_path):
+        os.remove(file_path)
+        print("File deleted successfully.")
     else:
-        # Prompt the user to input a folder containing GIF files
-        folder_path = input("Enter the folder path containing GIF files: ")
-        folder_path = folder_path.replace('"', '').replace("'", "")
-        remove_grid = input("Remove a grid? (Y/N): ")
-
-        # Iterate over each file in the folder
-        for filename in os.listdir(folder_path):
-            # Create the blanked out image_array filled with black pixels
-            previous_image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
-            # Create the blanked out image_array filled with black pixels
-            image_array = [[(0, 0, 0) for _ in range(square_matrix_size)] for _ in range(square_matrix_size)]
-            if filename.endswith(".gif") or filename.endswith(".GIF"):
-                gif_path = os.path.join(folder_path, filename)
+        print("File does not exist.")
 
-                if remove_grid.lower() == 'y':
-                    remove_grid_from_gif(gif_path)
 
-                # Get the frames per second from the GIF
-                fps = get_gif_fps(gif_path)
+"""
+Function: interactive_menu - The original prompt driven menu, walks the user through making one .ani
+Expects: NONE
+Does: Asks what type of animation the user wants and its settings then makes the .ani with the matching conversion
+"""
+def interactive_menu():
+    # Ask the user if they want the final frame to be rotated
+    #rotate_k = int(input("Please input K value: "))
 
-                file_name = filename[:-4]
+    # driver code that determines what type of animation the user wants and then walks them through the selections and creates the .ani file
+    option = input("Please enter \n1 folders of images\n2 text \n3 gif \n4 video"
+                    + "\n5 Effects \n6 24 hour clock\n7 itinerary\n8 single images\n:")
 
-                # Prepare the file path
-                file_path = folder_path + "/" + file_name + ".ani"
+    # images
+    if int(option) == 1:
+        # Prompt the user for input
+        folders_name = input("Please enter the folder's name: ") + "/"
 
-                calibration_dictionary = None
+        numbered_or_random = input("Are the images numbered 1-x?(Y/N):")
 
-                # Remove the file if it already exists
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    print("File deleted successfully.")
-                else:
-                    print("File does not exist.")
+        number_of_pictures = None
+        if numbered_or_random.lower() == "y":
+            number_of_pictures = int(input("Please enter the number of frames: "))
+        file_name = input("Please enter the name for the output file: ")
+        frame_rate = input("Please enter the desired frames per second: ")
 
-                # Write animation metadata to the file
-                with open(file_path, "a") as file:
-                    file.write("\"\n")
-                    file.write("\"\n")
-                    file.write("FPS: " + str(fps) + "\n")
-                    file.write("Length: " + str(get_gif_number_of_frames(gif_path)) + "\n")
-                    file.write("Type: gif\n")
-                    file.write("Side_Length: " + str(square_matrix_size) + "\n")
+        remove_existing_file(file_name + ".ani")
+        convert_images(folders_name, file_name + ".ani", frame_rate, number_of_pictures)
 
-                if not os.path.exists(gif_path):
-                    print("error invalid paths")
-                    sys.exit(1) # type: ignore
-                gif = Image.open(gif_path)
+    # Text
+    elif int(option) == 2:
+        # Prompt the user for text input
+        text = input("Please enter the text you want: ")
+        font_color = input("Please enter a color from the list. Options are:\nred, green, blue,\nblack, white, yellow,\ncyan, magenta, purple,\norange, pink, brown,\ngray, light_gray, dark_gray,\nolive, teal, navy: ")
+        file_name = input("Please enter the name for the output file: ")
+        frame_rate = input("Please enter the desired frames per second: ")
 
-                file_path = file_path[:-4]
+        remove_existing_file(file_name + ".ani")
+        convert_text(text, font_color, file_name + ".ani", frame_rate)
 
-                # Iterate over each frame in the GIF and add it to the animation file
-                while True:
-                    try:
-                        gif.seek(gif.tell() + 1)
-                    except EOFError:
-                        break
+    # GIF
+    elif int(option) == 3:
 
-                    frame = gif.copy().resize((square_matrix_size, square_matrix_size), Image.NEAREST)
+        folder_or_file = input("Would you like to convert a folder of gifs?(Y/N)")
 
-                    previous_image_array = image_array
-                    image_array = load_image_to_array(frame, None, calibration_dictionary, square_matrix_size)
+        if folder_or_file.lower() == "n":
 
-                    print_frame_to_file_debug(file_path, previous_image_array, image_array)
+            # Prompt the user for GIF input
+            gif_name = input("Please enter the file name of the gif: ")
+            gif_name = gif_name.replace('"', '').replace("'", "")
+            file_name = input("Please enter the output files name: ")
+            custom_fps = input("Do you want a custom FPS?(Y/N): ")
+            insert_black_frame = input("Insert a black frame at end of gif? (Y/N): ")
+            remove_grid = input("Remove a grid? (Y/N): ")
 
+            gif_name = with_extension(gif_name, ".gif")
 
+            fps = None
+            if custom_fps.lower() != 'n':
+                fps = int(input("Please enter the desired FPS: "))
 
-# Placeholder for video
-elif int(option) == 4:
-    print("This feature isn't currently implemented")
+            remove_existing_file(file_name + ".ani")
+            convert_gif(gif_name, file_name + ".ani", fps, insert_black_frame.lower() == 'y', remove_grid.lower() == 'y')
 
-# Effects
-elif int(option) == 5:
-    # Prompt the user for effect input
-    effect_option = int(input("Select an effect \n1 falling asteroids\n2 bouncing ball\n3 moving lines\n:"))
-    length_of_time = int(input("Length of time for the animation in seconds: "))
-    frame_rate = int(input("Desired frame rate: "))
-    file_name = input("Please enter the output file name: ")
+        else:
+            # Prompt the user to input a folder containing GIF files
+            folder_path = input("Enter the folder path containing GIF files: ")
+            folder_path = folder_path.replace('"', '').replace("'", "")
+            remove_grid = input("Remove a grid? (Y/N): ")
+
+            # Convert every gif in the folder, spread across all cores
+            convert_gif_folder(folder_path, remove_grid.lower() == 'y')
+
+    # Video
+    elif int(option) == 4:
+        # Prompt the user for the video (any multi frame image PIL reads, a MJPEG stream, or a folder of numbered images)
+        video_path = input("Please enter the video file (or folder of numbered images): ")
+        video_path = video_path.replace('"', '').replace("'", "")
+        file_name = input("Please enter the output files name: ")
+        frame_rate = float(input("Please enter the desired FPS: "))
+
+        # folders and MJPEG streams don't say how long each frame is shown
+        source_fps = None
+        if os.path.isdir(video_path) or video_path.lower().endswith(video_ingest.MJPEG_EXTENSIONS):
+            source_fps = float(input("Please enter the FPS the video was recorded at: "))
+
+        remove_existing_file(file_name + ".ani")
+        report_conversion(file_name + ".ani", convert_video(video_path, file_name + ".ani", frame_rate, source_fps), None)
+
+    # Effects
+    elif int(option) == 5:
+        # Prompt the user for effect input
+        effect_option = int(input("Select an effect \n1 falling asteroids\n2 bouncing ball\n3 moving lines\n:"))
+        length_of_time = int(input("Length of time for the animation in seconds: "))
+        frame_rate = int(input("Desired frame rate: "))
+        file_name = input("Please enter the output file name: ")
 
-    # Prepare the file path
-    file_path = file_name + ".ani"
+        if effect_option == 1:
+            effect, option = "falling_asteroids", int(input("Please enter the probability of of 100: "))
+        elif effect_option == 2:
+            effect, option = "bouncing_ball", int(input("Please enter the number of balls: "))
+        elif effect_option == 3:
+            effect, option = "moving_lines", int(input("Please enter the number of pixels each line should be: "))
+        else:
+            return
 
-    # Remove the file if it already exists
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print("File deleted successfully.")
-    else:
-        print("File does not exist.")
+        remove_existing_file(file_name + ".ani")
+        generate_effect(effect, file_name + ".ani", length_of_time, frame_rate, option)
+
+    # Clock
+    elif int(option) == 6:
+        if square_matrix_size <= 8:
+            print("clock isn't able to be shown on such a small display\n")
+            exit()
 
-    # Write animation metadata to the file
-    with open(file_name + ".ani", "a") as file:
-        file.write("\"\n")
-        file.write("\"\n")
-        file.write("FPS: " + str(frame_rate) + "\n")
-        file.write("Length: " + str(int(frame_rate * length_of_time)) + "\n")
-        file.write("Type: effect\n")
-        file.write("Side_Length: " + str(square_matrix_size) + "\n")
-
-    if effect_option == 1:
-        falling_astroids_effect(length_of_time, frame_rate, file_name, square_matrix_size, calibration_dictionary)
-    elif effect_option == 2:
-        bouncing_ball(length_of_time, frame_rate, file_name, square_matrix_size, calibration_dictionary)
-    elif effect_option == 3:
-        moving_lines(length_of_time, frame_rate, file_name, square_matrix_size, calibration_dictionary)
-
-# Clock
-elif int(option) == 6:
-    if square_matrix_size <= 8:
-        print("clock isn't able to be shown on such a small display\n")
-        exit()
-    else:
         file_name = input("Please enter the output file name: ")
         font_color = input("Please enter a color from the list. Options are:\nred, green, blue,\nwhite, yellow,\ncyan, magenta, purple,\norange, pink, brown,\ngray, light_gray, dark_gray,\nolive, teal, navy: ")
         should_center = input("Want it column centered? (Y/N): ")
         if should_center.lower() == 'y':
-            if square_matrix_size > 16:
-                col_offset = (((square_matrix_size // 16) // 2) * 16) - 8
-                row_offset = 0
-            else:
-                col_offset = 0
-                row_offset = 0
+            row_offset, col_offset = centered_clock_offsets()
         else:
             should_manual_offset = input("Want to give manual row/column offsets? (Y/N): ")
             if should_manual_offset.lower() == 'y':
@@ -1314,126 +1491,183 @@ elif int(option) == 6:
                 row_offset = 0
                 col_offset = 0
 
+        remove_existing_file(file_name + ".ani")
+        generate_clock(file_name + ".ani", font_color, row_offset, col_offset)
 
-        # Prepare the file path
-        file_path = file_name + ".ani"
+    elif int(option) == 7:
+        seconds_to_account_for = 86400
 
-        # Remove the file if it already exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print("File deleted successfully.")
-        else:
-            print("File does not exist.")
-
-        # Write animation metadata to the file
-        with open(file_name + ".ani", "a") as file:
-            file.write("\"\n")
-            file.write("\"\n")
-            #TODO unblock
-            #file.write("FPS: " + str("0.016666666667") + "\n")
-            file.write("FPS: " + str("24") + "\n")
-            file.write("Length: " + str("1440") + "\n")
-            file.write("Type: clock\n")
-            file.write("Side_Length: " + str(square_matrix_size) + "\n")
-
-        clock_generator(file_name, font_color, int(row_offset), int(col_offset), calibration_dictionary)
-
-elif int(option) == 7:
-    seconds_to_account_for = 86400
-
-    print("Welcome to the itinerary maker. Essentially a whole day is cut up into just seconds.\nSo you will be asked what file you want and then how long it should play.\nThis continues until all 86400 seconds are used.\n")
-    itinerary_file_name = input("Please enter the name of the itinerary file (without .iti extentsion): ")
-    random_gifs = input(("Want to just show random gifs? (Y/N): "))
-
-    if random_gifs.lower() == "n":
-
-        while seconds_to_account_for > 0:
-            file_name = input("Please enter the files name or path (with name): ")
+        print("Welcome to the itinerary maker. Essentially a whole day is cut up into just seconds.\nSo you will be asked what file you want and then how long it should play.\nThis continues until all 86400 seconds are used.\n")
+        itinerary_file_name = input("Please enter the name of the itinerary file (without .iti extentsion): ")
+        random_gifs = input(("Want to just show random gifs? (Y/N): "))
 
-            extentsion_check = file_name[-4:]
+        if random_gifs.lower() == "n":
 
-            if extentsion_check.lower() != ".ani":
-                file_name = file_name + ".ani"
+            while seconds_to_account_for > 0:
+                file_name = input("Please enter the files name or path (with name): ")
+                file_name = with_extension(file_name, ".ani")
 
-            seconds_played = int(input("Please enter how many seconds it should play for: "))
-            while seconds_to_account_for - seconds_played < 0:
-                seconds_played = int(input("Thats too long you only have " + str(seconds_to_account_for) + " to allot for enter a new number: "))
+                seconds_played = int(input("Please enter how many seconds it should play for: "))
+                while seconds_to_account_for - seconds_played < 0:
+                    seconds_played = int(input("Thats too long you only have " + str(seconds_to_account_for) + " to allot for enter a new number: "))
 
+                seconds_to_account_for = add_itinerary_entry(itinerary_file_name + ".iti", file_name,
+                                                             seconds_to_account_for, seconds_played)
 
-            with open(itinerary_file_name + '.iti', 'a') as file:
-                file.write((str(seconds_to_account_for) + " - " + str(seconds_to_account_for - seconds_played) + " : " + str(file_name) + "\n"))
-
-            seconds_to_account_for = seconds_to_account_for - seconds_played
-
-    else:
-        gifs = []
-        # Remove the file if it already exists
-        if os.path.exists(itinerary_file_name + ".iti"):
-            os.remove(itinerary_file_name + ".iti")
-            print("File deleted successfully.")
         else:
-            print("File does not exist.")
-
-        # Iterate over each file in the folder
-        for filename in os.listdir("random_gif_anis"):
-            if filename.endswith(".ANI") or filename.endswith(".ani"):
-                gif_path = os.path.join("random_gif_anis", filename)
-                # Perform grid removal on the GIF and replace it with the modified version
-                with open(gif_path, "r") as file:
-                    line = file.readline()
-                    while True:
-                        line = file.readline()
-                        if "\"" in line:
-                            line = file.readline()
-                            break
-                    fps = line.split().pop()
-                    length = file.readline()
-                    length = length.split().pop()
+            remove_existing_file(itinerary_file_name + ".iti")
+            random_gif_itinerary(itinerary_file_name + ".iti")
 
+    # single image
+    elif int(option) == 8:
+        # Prompt the user for input
+        pictures_path = input("Please enter the pictures path: ")
 
-                gifs.append((gif_path, int(round(int(float(length))//int(float(fps))))))
-
-        while seconds_to_account_for > 0:
-            gif_path, duration = random.choice(gifs)
-
-            seconds_played = random.randint(2, 5) * duration
-
-            with open(itinerary_file_name + '.iti', 'a') as file:
-                file.write((str(seconds_to_account_for) + " - " + str(seconds_to_account_for - seconds_played) + " : " + str(gif_path) + "\n"))
-
-            seconds_to_account_for = seconds_to_account_for - seconds_played
-
-# single image
-elif int(option) == 8:
-    # Prompt the user for input
-    pictures_path = input("Please enter the pictures path: ") + "/"
+        file_name = input("Please enter the name for the output file: ")
 
-    file_name = input("Please enter the name for the output file: ")
+        remove_existing_file(file_name + ".ani")
+        convert_image(pictures_path, file_name + ".ani")
+
+
+"""
+Function_Helper: build_argument_parser - Builds the command line, one sub command per conversion
+Expects: NONE
+Does: Returns the argparse.ArgumentParser
+"""
+def build_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Makes .ani files for the panel. Run without a command for the interactive menu.")
+    parser.add_argument("--ani-version", type=int, choices=(1, 2), default=ani_version,
+                        help="format to write, 2 is binary and 1 the original text format (default %(default)s)")
+    parser.add_argument("--delta-threshold", type=float, default=delta_threshold,
+                        help="skip color changes up to this delta E, 0 is lossless (default %(default)s)")
+    parser.add_argument("--compression", choices=ani_format.BLOCK_CODECS[1:], default=ani_compression,
+                        help="compress v2 frames in blocks with this codec (default uncompressed)")
+    parser.add_argument("--report-compression", action="store_true", default=report_compression,
+                        help="print the size and decode time each codec gives every v2 file written")
+    commands = parser.add_subparsers(dest="command")
+
+    images = commands.add_parser("images", help="a folder of images")
+    images.add_argument("folder")
+    images.add_argument("output")
+    images.add_argument("--fps", type=float, required=True)
+    images.add_argument("--numbered", type=int, metavar="N", help="use 1.png to N.png instead of every file")
+
+    text = commands.add_parser("text", help="text shown a character per frame")
+    text.add_argument("text")
+    text.add_argument("output")
+    text.add_argument("--color", default="red")
+    text.add_argument("--fps", type=float, required=True)
+
+    gif = commands.add_parser("gif", help="one gif, or every gif in a folder (each written next to its gif)")
+    gif.add_argument("gif", help="gif file or folder of gifs")
+    gif.add_argument("output", nargs="?", help="the .ani to write (single gifs only, defaults to next to the gif)")
+    gif.add_argument("--fps", type=float, help="defaults to the gifs frame duration")
+    gif.add_argument("--black-frame", action="store_true", help="end on a black frame")
+    gif.add_argument("--remove-grid", action="store_true")
+    gif.add_argument("--pitch", type=int, default=grid_pitch,
+                     help="block size of the grid --remove-grid removes (default %(default)s)")
+    gif.add_argument("--workers", type=int, help="processes for folders (default every core)")
+
+    video = commands.add_parser("video", help="animated PNG/WebP, multi page TIFF, MJPEG, or numbered images")
+    video.add_argument("source")
+    video.add_argument("output")
+    video.add_argument("--fps", type=float, required=True)
+    video.add_argument("--source-fps", type=float, help="for MJPEG and image folders (defaults to --fps)")
+
+    effect = commands.add_parser("effect", help="a generated effect")
+    effect.add_argument("effect", choices=sorted(EFFECTS))
+    effect.add_argument("output")
+    effect.add_argument("--seconds", type=int, required=True)
+    effect.add_argument("--fps", type=int, required=True)
+    effect.add_argument("--option", type=int, required=True,
+                        help="astroid probability out of 100, number of balls, or pixels per line")
+
+    clock = commands.add_parser("clock", help="the 24 hour clock")
+    clock.add_argument("output")
+    clock.add_argument("--color", default="red")
+    clock.add_argument("--center", action="store_true")
+    clock.add_argument("--row-offset", type=int, default=0)
+    clock.add_argument("--col-offset", type=int, default=0)
+
+    itinerary = commands.add_parser("itinerary", help="a day long itinerary (.iti)")
+    itinerary.add_argument("output")
+    itinerary.add_argument("--entry", nargs=2, action="append", default=[], metavar=("ANI", "SECONDS"),
+                           help="play ANI for SECONDS (repeatable, in order)")
+    itinerary.add_argument("--random-gifs", metavar="FOLDER", help="fill the day with random .ani files from FOLDER")
+
+    image = commands.add_parser("image", help="a single image")
+    image.add_argument("image")
+    image.add_argument("output")
+
+    return parser
+
+
+"""
+Function: main - Command line entry point
+Expects: argv be the arguments (None uses sys.argv)
+Does: Runs the sub command given (or the interactive menu when there isn't one)
+"""
+def main(argv=None):
+    global ani_version
+    global delta_threshold
+    global ani_compression
+    global report_compression
+
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+    # checked before anything is converted so a missing codec doesn't fail part way through writing
+    if args.compression is not None and not ani_format.codec_available(args.compression):
+        parser.error(f"{args.compression} compression isn't available here (zstd needs the zstandard package)")
+    ani_version = args.ani_version
+    delta_threshold = args.delta_threshold
+    ani_compression = args.compression
+    report_compression = args.report_compression
+    load_configured_calibration()
+
+    if args.command is None:
+        interactive_menu()
+
+    elif args.command == "images":
+        convert_images(args.folder, with_extension(args.output, ".ani"), args.fps, args.numbered)
+
+    elif args.command == "text":
+        convert_text(args.text, args.color, with_extension(args.output, ".ani"), args.fps)
+
+    elif args.command == "gif":
+        if os.path.isdir(args.gif):
+            failures = convert_gif_folder(args.gif, args.remove_grid, args.workers, args.pitch)
+            if failures:
+                sys.exit(1)
+        else:
+            output = with_extension(args.output or os.path.splitext(args.gif)[0], ".ani")
+            report_conversion(output, convert_gif(args.gif, output, args.fps, args.black_frame, args.remove_grid,
+                                                  args.pitch), None)
 
-    # Prepare the file path
-    file_path = file_name + ".ani"
+    elif args.command == "video":
+        output = with_extension(args.output, ".ani")
+        report_conversion(output, convert_video(args.source, output, args.fps, args.source_fps), None)
 
-    calibration_dictionary = None
+    elif args.command == "effect":
+        generate_effect(args.effect, with_extension(args.output, ".ani"), args.seconds, args.fps, args.option)
 
-    # Remove the file if it already exists
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print("File deleted successfully.")
-    else:
-        print("File does not exist.")
+    elif args.command == "clock":
+        row_offset, col_offset = centered_clock_offsets() if args.center else (args.row_offset, args.col_offset)
+        generate_clock(with_extension(args.output, ".ani"), args.color, row_offset, col_offset)
 
-    # Write animation metadata to the file
-    with open(file_name + ".ani", "a") as file:
-        file.write("\"\n")
-        file.write("\"\n")
-        file.write("FPS: 1" + "\n")
-        file.write("Length: 1" + "\n")
-        file.write("Type: image\n")
-        file.write("Side_Length: " + str(square_matrix_size) + "\n")
+    elif args.command == "itinerary":
+        itinerary_path = with_extension(args.output, ".iti")
+        if args.random_gifs:
+            random_gif_itinerary(itinerary_path, args.random_gifs)
+        else:
+            seconds_to_account_for = 86400
+            for file_name, seconds_played in args.entry:
+                seconds_to_account_for = add_itinerary_entry(itinerary_path, with_extension(file_name, ".ani"),
+                                                             seconds_to_account_for, int(seconds_played))
 
+    elif args.command == "image":
+        convert_image(args.image, with_extension(args.output, ".ani"))
 
-    previous_image_array = image_array
 
-    image_array = load_image_to_array(pictures_path, None, calibration_dictionary,
-                                          square_matrix_size)
-    print_frame_to_file(file_name, previous_image_array, image_array)
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,12 @@ import sys
 import random
 from datetime import datetime, timedelta
 
+from animation_cache import decode_animation
+from ani_format import AniReader
+from frame_scheduler import FrameScheduler
+import panel_geometry
+from panel_output import TkOutput
+
 
 """
 Function: rgb_to_hex - takes a given rgb value and correctly formats it for use on the tkinter gui
@@ -16,26 +22,21 @@ def rgb_to_hex(rgb):
 
 
 """
-Function: create_grid - Using the created canvas it creates the grid that emulates the pixels of our panel (dynamic size)
-Expects: Expects the canvas, cell_size, row, and col to all correctly be initialized
-Does: Creates the tkinter gui's grid emulating the LED panel
+Function: create_grid - Draws the colors grid onto the emulated panel (the TkOutput the client's playback also draws to)
+Expects: Expects the panel, strip_positions, and colors to all correctly be initialized
+Does: Sets every pixel of the emulated LED panel to its cell in colors and shows it
 """
 def create_grid(event=None):
-    # Clear previous grid items
-    canvas.delete("grid")
+    for index, position in enumerate(strip_positions.tolist()):
+        row, col = divmod(position, cols)
+        panel.setPixelColor(index, int(colors[row][col][1:], 16))
 
-    # Draw the new grid
-    for row in range(rows):
-        for col in range(cols):
-            color = colors[row][col]
-            # Create a rectangle item and add it to the canvas with a tag "grid"
-            canvas.create_rectangle(col * cell_size, row * cell_size, (col + 1) * cell_size, (row + 1) * cell_size,
-                                     fill=color, outline='black', tags="grid")
+    panel.show()
 
 
 """
 Function: color_wipe - Takes a color and wait_ms parameter (defaults to 0) and changes all emulated pixels to be that color
-Expects: Expects color_as_hex, canvas, rows, cols to be initialized 
+Expects: Expects color_as_hex, panel, rows, cols to be initialized 
 Does: Changes all emulated pixels on the gui to be the given color
 """
 def color_wipe(color_as_hex, wait_ms=0):
@@ -152,7 +153,23 @@ def itinerary_player(itinerary_file_name, side_length):
             line = file.readline()
             color_wipe(rgb_to_hex((0,0,0)), 0)
 
-def play_animation(file_name, side_length,  when_to_quit):
+"""
+Function: show_frame - Redraws the emulated panel with the current colors (the gui's strip.show())
+Expects: Expects the panel to be initialized
+Does: Redraws the grid and lets tkinter process the update
+"""
+def show_frame():
+    create_grid()
+
+
+"""
+Function: play_animation - Previews a .ani file on the emulated LED panel
+Expects: Expects file_name to be valid, side_length to be correct for the panel, and when_to_quit be a time.time() to stop
+at (-1 to play to the end), start_seconds is how far into the animation to start playing
+Does: Plays the animation through the same DecodedAnimation.play() loop client.py drives the real panel with, the emulated
+panel is just the TkOutput backend in place of the ws281x one
+"""
+def play_animation(file_name, side_length,  when_to_quit, start_seconds=0):
     if len(file_name) < 4:
         print("invalid animation file")
         sys.exit(1)
@@ -162,86 +179,18 @@ def play_animation(file_name, side_length,  when_to_quit):
             file_name = file_name + ".ani"
 
 
-    with open(file_name, "r") as file:
-        line = file.readline()
-        while True:
-            line = file.readline()
-            if "\"" in line:
-                line = file.readline()
-                break
-        fps = line.split().pop()
-        length = file.readline()
-        kind = file.readline().split()[1]
-        length_of_side = int(file.readline().split().pop())
-        
-        if length_of_side != side_length:
-            print("THIS ANIMATION FILE ISN'T MADE FOR A MATRIX OF THIS SIZE")
-            exit()
-        
-        print_flag = True
-        frames_that_lagged = 0
-        
-        fps_interval_ms = 1000.0 / float(fps)
-        
-        line = file.readline()
-        while line:
-            start_time = time.time()  # Get the start time
-            pixels = line.split(",")
-            pixels.pop()
-            
-            for i in pixels:
-                #print(i)
-                pixel_details = i.split(" ")
-                index = int(pixel_details[1])
-                #strip.setPixelColor(int(pixel_details[1]), Color(int(pixel_details[2]), int(pixel_details[3]), int(pixel_details[4])))
-
-                # Calculate row and column indices based on the pattern 
-                row = (index % rows)
-                col = (index // rows)
-                
-                if col % 2 != 0:
-                    row = translation_map[row]
-                     
-                     
-                #print("Row: " + str(row) + " Col: " + str(col))
-                colors[row][col] = (rgb_to_hex((int(pixel_details[2]), int(pixel_details[3]), int(pixel_details[4]))))
-                
-                
-            line = file.readline()
-            #strip.show()
-            
-            create_grid()
-            root.update()
+    animation = decode_animation(file_name)
+    if animation.side_length != side_length:
+        print("THIS ANIMATION FILE ISN'T MADE FOR A MATRIX OF THIS SIZE")
+        exit()
 
-            if when_to_quit != -1:
-                if time.time() >= when_to_quit:
-                    return
-
-            end_time = time.time()  # Get the end time
-            
-            duration_ms = (end_time - start_time) * 1000  # Convert duration to milliseconds
-
-            print("Frame took: " + str(duration_ms)  + " / " + str(fps_interval_ms))
+    # held frames come with how many steps they stay up, so the scheduler sleeps through the hold in one go
+    scheduler = FrameScheduler(animation.fps, animation.frame_steps[-1],
+                               cancelled=lambda: when_to_quit != -1 and time.time() >= when_to_quit)
+    if animation.play(panel, scheduler, start_seconds) is not None:
+        return
 
-            if duration_ms < fps_interval_ms:
-                time.sleep((fps_interval_ms - duration_ms) / 1000)  # Convert back to seconds for sleep
-                
-            else:
-                frames_that_lagged += 1
-                if print_flag:
-                    print("FRAME TOOK TOO LONG TO PRINT BY: " + str(duration_ms - fps_interval_ms) + " ms")
-                    #print_flag = False  # Turn off the flag to prevent repetitive printing
-                    time.sleep(fps_interval_ms / 1000)  # Sleep for the full FPS interval
-                # Continue your existing loop
-            
-                
-            
-        if kind != "gif":
-            pass
-            #color_wipe(rgb_to_hex(0,0,0))
-            
-        if not print_flag:
-            print("There were a total of " + str(frames_that_lagged) + " frames that lagged or took longer to display than the FPS interval")
+    print(scheduler.report())
 
 """
 Function: temp_test - Emulates the displaying of temperature on the emulated LED panel (Tkinter GUI)
@@ -393,81 +342,47 @@ def clock_player(file_name, side_length, when_to_quit, rainbow_clock):
         if extentsion_check.lower() != ".ani":
             file_name = file_name + ".ani"
 
-    with open(file_name, "r") as file:
-        line = file.readline()
-        while True:
-            line = file.readline()
-            if "\"" in line:
-                line = file.readline()
-                break
-        fps = line.split().pop()
-        length = file.readline()
-        kind = file.readline().split()[1]
-        length_of_side = int(file.readline().split().pop())
-
-        if length_of_side != side_length:
+    with AniReader(file_name) as animation:
+        if animation.side_length != side_length:
             print("THIS ANIMATION FILE ISN'T MADE FOR A MATRIX OF THIS SIZE")
             exit()
 
-        print_flag = True
-        frames_that_lagged = 0
-
-        fps_interval_ms = 1000.0 / float(fps)
-
-        line = file.readline()
-        for i in range(0, minutes_since_midnight):
-            line = file.readline()
-
-        while line:
-            start_time = time.time()  # Get the start time
-            pixels = line.split(",")
-            pixels.pop()
-
-            for i in pixels:
-                pixel_details = i.split(" ")
-                index = int(pixel_details[1])
-
+        # jump straight to the current minute, the panel is rebuilt from the keyframe before it instead of every minute
+        # since midnight being replayed
+        if animation.version == 2:
+            start_frame = animation.frame_at_time(minutes_since_midnight * 60)
+        else:
+            start_frame = minutes_since_midnight
+
+        # each frame comes with the minutes it stays up for (less the ones already past for the frame showing now)
+        for step, minutes, frame in animation.timed_frames(start_frame):
+            minutes -= max(minutes_since_midnight - step, 0)
+            for index, r, g, b in frame:
                 # Calculate row and column indices based on the pattern
-                row = (index % rows)
-                col = (index // rows)
+                row, col = divmod(int(strip_positions[index]), cols)
 
-                if col % 2 != 0:
-                    row = translation_map[row]
-
-                # colors[row][col] = (rgb_to_hex((int(pixel_details[2]), int(pixel_details[3]), int(pixel_details[4]))))
-
-                if rainbow_clock and (
-                        int(pixel_details[2]) != 0 or int(pixel_details[3]) != 0 or int(pixel_details[4]) != 0):
+                if rainbow_clock and (r != 0 or g != 0 or b != 0):
                     random_color = get_random_color()
                     colors[row][col] = (random_color)
 
                 else:
-                    colors[row][col] = (rgb_to_hex((int(pixel_details[2]), int(pixel_details[3]), int(pixel_details[4]))))
+                    colors[row][col] = rgb_to_hex((r, g, b))
 
-            line = file.readline()
             # strip.show()
 
             temp_test(side_length, temperature)
             temperature = temperature + 1
-            create_grid()
-
-            root.update()
+            show_frame()
 
             if when_to_quit != -1:
                 if time.time() >= when_to_quit:
                     return
 
-            end_time = time.time()  # Get the end time
-
-            duration_ms = (end_time - start_time) * 1000  # Convert duration to milliseconds
-
-            print("Frame took: " + str(duration_ms) + " / " + str(fps_interval_ms))
-
             # Get the current time
             now = datetime.now()
 
             # Calculate the time of the next minute (with seconds and microseconds set to 0)
-            next_minute = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
+            next_minute = (now + timedelta(minutes=minutes)).replace(second=0, microsecond=0)
 
             # Calculate the difference between now and the next minute
             seconds_until_next_minute = (next_minute - now).total_seconds()
@@ -476,19 +391,6 @@ def clock_player(file_name, side_length, when_to_quit, rainbow_clock):
 
             time.sleep(seconds_until_next_minute)
 
-            """
-            if duration_ms < fps_interval_ms:
-                time.sleep((fps_interval_ms - duration_ms) / 1000)  # Convert back to seconds for sleep
-
-            else:
-                frames_that_lagged += 1
-                if print_flag:
-                    print("FRAME TOOK TOO LONG TO PRINT BY: " + str(duration_ms - fps_interval_ms) + " ms")
-                    #print_flag = False  # Turn off the flag to prevent repetitive printing
-                    time.sleep(fps_interval_ms / 1000)  # Sleep for the full FPS interval
-                # Continue your existing loop
-            """
-
 
 
 # Set the size of the grid
@@ -503,22 +405,17 @@ colors = [[rgb_to_hex((255, 255, 255)) for _ in range(cols)] for _ in range(rows
 # Set specific indexes to salmon color
 # For example, set cell at row 1, column 2 to salmon
 
-# Create the main window
-root = tk.Tk()
-root.title("Grid of Colors")
+# frame position (row * cols + col) of every strip index, the gui shows frames unrotated
+strip_positions = panel_geometry.strip_gather(square_matrix_size, 0)
 
-# Create a canvas to draw the grid
-canvas = tk.Canvas(root, width=cols * cell_size, height=rows * cell_size)
-canvas.pack()
+# Create the emulated panel, the same output client.py draws to with PANEL_OUTPUT=tk
+panel = TkOutput(rows * cols, square_matrix_size, 0, cell_size)
+root = panel.root
+root.title("Grid of Colors")
 
 # Draw the initial grid
 create_grid()
 
-translation_map = {}
-
-for i in range(0, cols):
-    translation_map[i] = (cols - 1) - i
-
 color_wipe(rgb_to_hex((0,0,0)))
 try:
 
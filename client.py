@@ -10,6 +10,7 @@ Future goals - Add more hardware support, add more software support, adjustable
 
 """
 
+import asyncio
 import heapq
 import os
 import random
@@ -20,7 +21,13 @@ import time
 from datetime import datetime, timedelta
 
 import requests  # type: ignore
-from rpi_ws281x import *  # type: ignore
+
+from animation_cache import AnimationCache
+from frame_scheduler import FrameScheduler
+from layered_framebuffer import LayeredFramebuffer
+import panel_geometry
+from panel_output import Color, Ws281xOutput, create_output
+from playlist_index import PlaylistIndex
 
 """
 Function:
@@ -45,15 +52,29 @@ LED_DMA = 10  # DMA channel to use for generating signal (try 10)
 LED_BRIGHTNESS = 10  # Set to 0 for darkest and 255 for brightest
 LED_INVERT = False  # True to invert the signal (when using NPN transistor level shift)
 LED_CHANNEL = 0  # set to '1' for GPIOs 13, 19, 41, 45 or 53
+PANEL_ROTATE_K = 3  # 90 degree rotations between the frames and how the panel is mounted (matches the generator)
+PANEL_SIDE_LENGTH = 16  # LED_COUNT is PANEL_SIDE_LENGTH squared
+
+# Where frames go, ws281x for the panel or null, memory, recording, tk, shm to run without it (see panel_output.py)
+PANEL_OUTPUT = os.environ.get("PANEL_OUTPUT", "ws281x")
 
 
 # Define the MicroPython device's IP and port for the sensor collection
 MICROPYTHON_IP = "PLACE WITH YOURS"
 PORT =
 
+# Seconds an idle keep-alive HTTP connection is kept open
+HTTP_KEEP_ALIVE_SECONDS = 30
+
 # define the max brightness allowed
 MAX_BRIGHTNESS = 35
 
+# Most memory decoded animations are allowed to take up (least recently played are dropped first)
+ANIMATION_CACHE_BYTES = 24 * 1024 * 1024
+
+# Folder holding the .ani files the gif shift commands cycle through
+RANDOM_GIF_DIRECTORY = "random_gif_anis"
+
 
 global exit_animation
 global animation_thread_flag
@@ -64,241 +85,278 @@ global color_position
 global gif_change  # 1 indicates true, 0 indicates false, and 2 indicates loop
 global gif_position
 global lock
+global state_changed
 global temperature
 global humidity
 global ambient_light_lux
 global auto_brightness
 auto_brightness = True
-lock = threading.Lock()
+# reentrant so time cards can be added while a command holds it, state_changed wakes the clock loop
+lock = threading.RLock()
+state_changed = threading.Condition(lock)
+animation_cache = AnimationCache(ANIMATION_CACHE_BYTES)
+gif_playlist = PlaylistIndex(RANDOM_GIF_DIRECTORY)
 
 
 """
-Function: random_gif_helper - Given a directory it returns a list of all the files in the directory
-Expects: Expects the directory to be valid
-Does: Returns a list of all files in the directory
+Command handlers - one function per network command, looked up through COMMANDS by handle_command for both the HTTP
+and UDP listeners
 """
 
 
-def random_gif_helper(directory):
-    try:
-        # Get a sorted list of all files in the directory (excluding subdirectories)
-        files = [
-            file
-            for file in os.listdir(directory)
-            if os.path.isfile(os.path.join(directory, file))
-        ]
-        return sorted(files)  # Sort the files to ensure consistent order
-    except FileNotFoundError:
-        print(f"The directory {directory} was not found.")
-        return []
-    except PermissionError:
-        print(f"Permission denied to access {directory}.")
-        return []
+def command_print_done():
+    add_time_card(datetime.now(), "Print Done")
 
 
-def handle_command(command):
+def command_brightness_up():
     global brightness
     global brightness_change
+    with lock:
+        if not auto_brightness and brightness < MAX_BRIGHTNESS:
+            brightness += 1
+            brightness_change = True
+
+
+def command_brightness_down():
+    global brightness
+    global brightness_change
+    with lock:
+        if not auto_brightness and brightness > 1:
+            brightness -= 1
+            brightness_change = True
+
+
+def command_screen_off():
+    global brightness
+    global brightness_change
+    with lock:
+        if not auto_brightness:
+            brightness = 0
+            brightness_change = True
+
+
+def command_right_color_shift():
+    global color_position
+    global color_change
+    with lock:
+        if color_position < 51:
+            color_position += 1
+            color_change = True
+
+
+def command_left_color_shift():
     global color_position
     global color_change
+    with lock:
+        if color_position > 0:
+            color_position -= 1
+            color_change = True
+
+
+"""
+Function: shift_gif - Moves gif_position by step (wrapping around the playlist) and asks for it to be played
+Expects: step be 1 or -1
+Does: Stops the playing gif if one is playing, otherwise moves gif_position, and sets gif_change
+"""
+
+
+def shift_gif(step):
     global gif_change
     global gif_position
     global exit_animation
-    global lock
+    with lock:
+        if len(gif_playlist) == 0:
+            print("No gifs found")
+        else:
+            if gif_change == 1:
+                exit_animation = True
+            else:
+                gif_position = (gif_position + step) % len(gif_playlist)
+            gif_change = 1
+
+
+def command_left_gif_shift():
+    shift_gif(-1)
+
+
+def command_right_gif_shift():
+    shift_gif(1)
+
+
+def command_replay_gif():
+    global gif_change
+    with lock:
+        gif_change = 1
+
+
+def command_loop_gif():
+    global gif_change
+    global exit_animation
+    with lock:
+        if gif_change == 2:
+            exit_animation = True
+        gif_change = 2
+
+
+def command_auto_brightness_toggle():
     global auto_brightness
-    random_gif_directory = "random_gif_anis"
+    with lock:
+        auto_brightness = not auto_brightness
+        if auto_brightness:
+            add_time_card(datetime.now() + timedelta(seconds=1), "Auto_Brightness")
+
+
+# command name (without the leading / HTTP paths have) -> handler
+COMMANDS = {
+    "print_done": command_print_done,
+    "brightness_up": command_brightness_up,
+    "brightness_down": command_brightness_down,
+    "screen_off": command_screen_off,
+    "right_color_shift": command_right_color_shift,
+    "left_color_shift": command_left_color_shift,
+    "left_gif_shift": command_left_gif_shift,
+    "right_gif_shift": command_right_gif_shift,
+    "replay_gif": command_replay_gif,
+    "loop_gif": command_loop_gif,
+    "auto_brightness_toggle": command_auto_brightness_toggle,
+}
 
-    if command == "/print_done":
-        add_time_card(datetime.now(), "Print Done")
 
-    elif command == "/brightness_up":
-        with lock:
-            if not auto_brightness and brightness < 35:
-                brightness += 1
-                brightness_change = True
+"""
+Function: handle_command - Runs the handler registered for a command from either transport
+Expects: command be a HTTP path ("/brightness_up", query strings are ignored) or a UDP payload ("brightness_up")
+Does: Runs the command's handler and wakes the clock loop, returns False if the command isn't known
+"""
 
-    elif command == "/brightness_down":
-        with lock:
-            if not auto_brightness and brightness > 1:
-                brightness -= 1
-                brightness_change = True
 
-    elif command == "/screen_off":
-        with lock:
-            if not auto_brightness:
-                brightness = 0
-                brightness_change = True
+def handle_command(command):
+    name = command.strip().split("?", 1)[0].strip("/")
+    handler = COMMANDS.get(name)
+    if handler is None:
+        print("Unknown command: " + command)
+        return False
 
-    elif command == "/right_color_shift":
-        with lock:
-            if color_position < 51:
-                color_position += 1
-                color_change = True
+    handler()
 
-    elif command == "/left_color_shift":
-        with lock:
-            if color_position > 0:
-                color_position -= 1
-                color_change = True
+    # wake the clock loop so the change shows up immediately
+    post_event()
+    return True
 
-    elif command == "/left_gif_shift":
-        with lock:
-            if len(random_gif_helper(random_gif_directory)) == 0:
-                print("No gifs found")
-            else:
-                if gif_change == 1:
-                    exit_animation = True
-                else:
-                    gif_position -= 1
-                    if gif_position < 0:
-                        gif_position = len(random_gif_helper(random_gif_directory)) - 1
-                gif_change = 1
 
-    elif command == "/right_gif_shift":
-        with lock:
-            if len(random_gif_helper(random_gif_directory)) == 0:
-                print("No gifs found")
+"""
+Function: handle_http_connection - Serves HTTP requests on one connection until the client closes it or goes idle
+Expects: reader and writer come from asyncio.start_server
+Does: Reads whole requests (request line, headers, and any body even when split over several packets), dispatches
+the path as a command, and keeps the connection open for following requests when the client allows keep-alive
+"""
+
+
+async def handle_http_connection(reader, writer):
+    addr = writer.get_extra_info("peername")
+    try:
+        while True:
+            request_line = await asyncio.wait_for(reader.readline(), HTTP_KEEP_ALIVE_SECONDS)
+            if not request_line:
+                break
+
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), HTTP_KEEP_ALIVE_SECONDS)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            content_length = int(headers.get("content-length", "0") or 0)
+            if content_length:
+                await reader.readexactly(content_length)
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                status, body = "400 Bad Request", b"Bad Request"
             else:
-                if gif_change == 1:
-                    exit_animation = True
+                method, path = parts[0], parts[1]
+                print(f"Received {method} {path} from {addr}")
+                if handle_command(path):
+                    status, body = "200 OK", b"OK"
                 else:
-                    gif_position += 1
-                    if gif_position == len(random_gif_helper(random_gif_directory)):
-                        gif_position = 0
-                gif_change = 1
+                    status, body = "404 Not Found", b"Unknown command"
+
+            version = parts[2] if len(parts) > 2 else "HTTP/1.0"
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+            writer.write(
+                (
+                    f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                ).encode()
+                + body
+            )
+            await writer.drain()
 
-    elif command == "/replay_gif":
-        with lock:
-            gif_change = 1
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
 
-    elif command == "/loop_gif":
-        with lock:
-            if gif_change == 2:
-                exit_animation = True
-            gif_change = 2
 
-    elif command == "/auto_brightness_toggle":
-        with lock:
-            auto_brightness = not auto_brightness
-            if auto_brightness:
-                add_time_card(datetime.now() + timedelta(seconds=1), "Auto_Brightness")
+"""
+Class: CommandDatagramProtocol - asyncio UDP protocol that runs every received packet as a command
+Expects: Used with loop.create_datagram_endpoint
+Does: Decodes each datagram once and passes it to handle_command
 
+"""
 
-def listen_for_http():
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("", ))
-        s.listen()
-        while True:
-            conn, addr = s.accept()
-            with conn:
-                request = conn.recv(1024).decode()
-                if not request:
-                    continue
-                first_line = request.splitlines()[0]
-                parts = first_line.split()
-                if len(parts) >= 2:
-                    method, path = parts[0], parts[1]
-                    print(f"Received {method} {path} from {addr}")
-                    handle_command(path)
-                # basic response
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n\r\nOK"
-                conn.sendall(response.encode())
-
-
-def listen_for_packets():
-    global brightness
-    global brightness_change
-    global color_position
-    global color_change
-    global gif_change
-    global gif_position
-    global exit_animation
-    global lock
-    global auto_brightness
-    random_gif_directory = "random_gif_anis"
 
-    # Set up the server
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    server_socket.bind(("", ))
+class CommandDatagramProtocol(asyncio.DatagramProtocol):
+    def datagram_received(self, data, addr):
+        command = data.decode(errors="replace").strip()
+        print(f"Received packet from {addr}: {command}")
+        handle_command(command)
 
-    while True:
-        data, addr = server_socket.recvfrom(1024)
-        print(f"Received packet from {addr}: {data.decode()}")
-        if data.decode() == "print_done":
-            add_time_card(datetime.now(), "Print Done")
-        elif data.decode() == "brightness_up":
-            with lock:
-                if auto_brightness == False:
-                    if brightness < 35:
-                        brightness += 1
-                        brightness_change = True
-        elif data.decode() == "brightness_down":
-            with lock:
-                if auto_brightness == False:
-                    if brightness > 1:
-                        brightness -= 1
-                        brightness_change = True
-        elif data.decode() == "screen_off":
-            with lock:
-                if auto_brightness == False:
-                    brightness = 0
-                    brightness_change = True
-        elif data.decode() == "right_color_shift":
-            with lock:
-                if color_position < 51:
-                    color_position += 1
-                    color_change = True
-        elif data.decode() == "left_color_shift":
-            with lock:
-                if color_position > 0:
-                    color_position -= 1
-                    color_change = True
-        elif data.decode() == "left_gif_shift":
-            with lock:
-                if len(random_gif_helper(random_gif_directory)) == 0:
-                    print("No gifs found")
 
-                else:
-                    if gif_change == 1:
-                        exit_animation = True
-                    else:
-                        gif_position -= 1
-                        if gif_position < 0:
-                            gif_position = (
-                                len(random_gif_helper(random_gif_directory)) - 1
-                            )
-
-                    gif_change = 1
-
-        elif data.decode() == "right_gif_shift":
-            with lock:
-                if len(random_gif_helper(random_gif_directory)) == 0:
-                    print("No gifs found")
-                else:
-                    if gif_change == 1:
-                        exit_animation = True
-                    else:
-                        gif_position += 1
-                        if gif_position == len(random_gif_helper(random_gif_directory)):
-                            gif_position = 0
+"""
+Function: serve_commands - Runs the HTTP and UDP command listeners on one asyncio event loop
+Expects: http_port (TCP) and udp_port be free, both default to the configured PORT the listeners have always used (a TCP
+and a UDP socket can share a port number) so existing shortcuts and senders keep working unchanged
+Does: Serves both transports forever (each HTTP connection is its own task so slow clients don't block others)
+"""
 
-                    gif_change = 1
 
-        elif data.decode() == "replay_gif":
-            with lock:
-                gif_change = 1
-        elif data.decode() == "loop_gif":
-            with lock:
-                if gif_change == 2:
-                    exit_animation = True
-                gif_change = 2
-        elif data.decode() == "auto_brightness_toggle":
-            with lock:
-                auto_brightness = not auto_brightness
-                if auto_brightness:
-                    add_time_card(
-                        datetime.now() + timedelta(seconds=1), "Auto_Brightness"
-                    )
+async def serve_commands(http_port=PORT, udp_port=PORT):
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(CommandDatagramProtocol, local_addr=("0.0.0.0", udp_port))
+    server = await asyncio.start_server(handle_http_connection, "0.0.0.0", http_port)
+    async with server:
+        await server.serve_forever()
+
+
+def listen_for_commands(http_port=PORT, udp_port=PORT):
+    asyncio.run(serve_commands(http_port, udp_port))
+
+
+"""
+Function: create_strip - Creates the output the panel draws to
+Expects: backend be "ws281x" or one of panel_output's hardware free backends
+Does: Returns the PanelOutput, rpi_ws281x is only imported for the ws281x backend
+"""
+
+
+def create_strip(backend):
+    if backend == "ws281x":
+        return Ws281xOutput.open(
+            LED_COUNT,
+            LED_PIN,
+            LED_FREQ_HZ,
+            LED_DMA,
+            LED_INVERT,
+            LED_BRIGHTNESS,
+            LED_CHANNEL,
+        )
+    return create_output(backend, LED_COUNT, PANEL_SIDE_LENGTH, PANEL_ROTATE_K)
 
 
 """
@@ -329,13 +387,15 @@ Does: Sets the entire panel to the given color doing so pixel by pixel per wait_
 
 def color_wipe(strip, color, wait_ms=0):
     """Wipe color across display a pixel at a time."""
+    if wait_ms == 0:
+        strip.fill(color)
+        strip.show()
+        return
+
     for i in range(strip.numPixels()):
         strip.setPixelColor(i, color)
-
-        if wait_ms != 0:
-            strip.show()
-            time.sleep(wait_ms / 1000)
-    strip.show()
+        strip.show()
+        time.sleep(wait_ms / 1000)
 
 
 """
@@ -347,10 +407,7 @@ Does: Sets the entire panel to black without updating it
 
 
 def colorless_wipe(strip):
-    black = Color(0, 0, 0)
-    """Wipe color across display a pixel at a time."""
-    for i in range(strip.numPixels()):
-        strip.setPixelColor(i, black)
+    strip.fill(Color(0, 0, 0))
 
 
 """
@@ -386,7 +443,7 @@ def itinerary_player(itinerary_file_name, strip, side_length):
             print("Should run for: " + str(time_to_run) + " seconds")
             while time.time() - start_time < time_to_run:
                 print("playing file: " + file_path)
-                play_animation(strip, file_path, side_length, time.time() + time_to_run)
+                play_animation(strip, file_path, side_length)
 
             print("finished")
             line = file.readline()
@@ -396,12 +453,13 @@ def itinerary_player(itinerary_file_name, strip, side_length):
 """
 Function: play_animation - plays a given ani file
 Expects: Expects the strip to be correctly initialized, file_name to be valid, side_length to be correct for the panel, and when_to_exit to be a multiple of the ani file (if played more than once)
-Does:
+start_seconds is how far into the animation to start playing
+Does: Plays the animation from start_seconds, returns the frame it was exited at (None if it played to the end)
 
 """
 
 
-def play_animation(strip, file_name, side_length):
+def play_animation(strip, file_name, side_length, start_seconds=0):
     global exit_animation
     global lock
 
@@ -414,110 +472,43 @@ def play_animation(strip, file_name, side_length):
         if extentsion_check.lower() != ".ani":
             file_name = file_name + ".ani"
 
-    with open(file_name, "r") as file:
-        line = file.readline()
-        while True:
-            line = file.readline()
-            if '"' in line:
-                line = file.readline()
-                break
-        fps = line.split().pop()
-        length = file.readline()
-        kind = file.readline().split()[1]
-        length_of_side = int(file.readline().split().pop())
-
-        if length_of_side != side_length:
-            print("THIS ANIMATION FILE ISN'T MADE FOR A MATRIX OF THIS SIZE")
-            exit()
-
-        print_flag = False
-        frames_that_lagged = 0
-
-        fps_interval_ms = 1000.0 / float(fps)
-
-        line = file.readline()
-        while line:
-            start_time = time.time()  # Get the start time
-            pixels = line.split(",")
-            pixels.pop()
-
-            for i in pixels:
-                pixel_details = i.split(" ")
-                strip.setPixelColor(
-                    int(pixel_details[1]),
-                    Color(
-                        int(pixel_details[2]),
-                        int(pixel_details[3]),
-                        int(pixel_details[4]),
-                    ),
-                )  # type: ignore
-
-            line = file.readline()
-            strip.show()
-
-            with lock:
-                if exit_animation:
-                    print("exited early")
-                    return
-
-            end_time = time.time()  # Get the end time
-
-            duration_ms = (
-                end_time - start_time
-            ) * 1000  # Convert duration to milliseconds
-
-            if print_flag:
-                print("Frame took: " + str(duration_ms) + " / " + str(fps_interval_ms))
+    # decoded frames come from the cache so replays and loops never go back to the disk
+    try:
+        animation = animation_cache.get(file_name)
+    except ValueError as e:
+        print("CAN'T PLAY THIS ANIMATION FILE: " + str(e))
+        exit()
+    if animation.side_length != side_length:
+        print("THIS ANIMATION FILE ISN'T MADE FOR A MATRIX OF THIS SIZE")
+        exit()
+
+    # frames are shown on absolute deadlines, when playback falls a whole frame behind the late frame's pixels are
+    # still set but its strip.show() is skipped so the panel catches up instead of drifting
+    # holds can last seconds, so the scheduler waits on state_changed and a command that sets exit_animation (every
+    # command posts an event) cuts the wait short
+    scheduler = FrameScheduler(animation.fps, animation.frame_steps[-1], condition=state_changed,
+                               cancelled=lambda: exit_animation)
+
+    exited_at = animation.play(strip, scheduler, start_seconds)
+    if exited_at is not None:
+        print("exited early")
+        return exited_at
+    colorless_wipe(strip)  # type: ignore
 
-            if duration_ms < fps_interval_ms:
-                time.sleep(
-                    (fps_interval_ms - duration_ms) / 1000
-                )  # Convert back to seconds for sleep
-            else:
-                frames_that_lagged += 1
-                if print_flag:
-                    print(
-                        "FRAME TOOK TOO LONG TO PRINT BY: "
-                        + str(duration_ms - fps_interval_ms)
-                        + " ms"
-                    )
-                    print_flag = (
-                        False  # Turn off the flag to prevent repetitive printing
-                    )
-                    time.sleep(
-                        fps_interval_ms / 1000
-                    )  # Sleep for the full FPS interval
-                # Continue your existing loop
-
-        colorless_wipe(strip)  # type: ignore
-
-        if print_flag:
-            print(
-                "There were a total of "
-                + str(frames_that_lagged)
-                + " frames that lagged or took longer to display than the FPS interval"
-            )
+    if scheduler.late_frames:
+        print("Animation fell behind: " + scheduler.report())
 
 
 """
-Function: rotate_matrix - Given a matrix, and k ( k = // 90 degrees)
-Expects: Expects the matrix to be square and k to be a integer
-Does: Rotates the matrix by 90 degrees for EACH K
+Function: prefetch_neighbouring_gifs - Asks the animation cache to decode the gifs on either side of position
+Expects: position be a valid index into gif_playlist
+Does: Queues the previous and next gif for background decoding so shifting to them starts instantly
 """
 
 
-def rotate_matrix(matrix, k):
-    def rotate_90(matrix):
-        # Transpose and then reverse rows to rotate 90 degrees clockwise
-        return [list(row) for row in zip(*matrix[::-1])]
-
-    # Reduce k to the equivalent number of rotations (k % 4 because 4 rotations = 360 degrees = original matrix)
-    k = k % 4
-
-    for _ in range(k):
-        matrix = rotate_90(matrix)
-
-    return matrix
+def prefetch_neighbouring_gifs(position):
+    if len(gif_playlist) > 1:
+        animation_cache.prefetch([gif_playlist.path(position + 1), gif_playlist.path(position - 1)])
 
 
 """
@@ -596,7 +587,9 @@ Does: Adds the card to the time_card_heap
 
 def add_time_card(when_card_should_be_ran, task_description):
     global time_card_heap
-    heapq.heappush(time_card_heap, (when_card_should_be_ran, task_description))
+    with state_changed:
+        heapq.heappush(time_card_heap, (when_card_should_be_ran, task_description))
+        state_changed.notify()
 
 
 # Ping every 5 seconds
@@ -830,85 +823,6 @@ def print_done(strip):
     color_wipe(strip, desired_color, 1000)
 
 
-"""
-Function/helper: helper_is_black - returns if a passed color is black
-Expects: Expects nothing
-Does: returns if a passed color is black
-
-"""
-
-
-def helper_is_black(color):
-    return color == 0x000000
-
-
-"""
-Function: change_clocks_color - Simply changes the strips color (goes through the entire strip and changes all non black colors to the desired color_
-Expects: Expects strip and desired_color to be correctly initializaed
-Does: Changes all the pixels on the strip that aren't black to the desired color
-
-"""
-
-
-def change_clocks_color(strip, desired_color):
-    for i in range(strip.numPixels()):
-        color = strip.getPixelColor(i)
-        if not helper_is_black(color):
-            strip.setPixelColor(i, desired_color)
-
-    strip.show()
-
-
-"""
-Function: compositor - functions as a typical compositor would. AKA Laying multiple images (matrixes) onto a display (strip)
-Expects: Expects strip, matrixes, translation_map, and the desired color be correctly intialized
-Does: Compsites the panel using multiple matrixes, translation_map (matrix to strip), and the desired color
-"""
-
-
-def compositor(strip, matrixes, translation_map, desired_color):
-    debug = False
-
-    color_black = Color(0, 0, 0)  # type: ignore # type: ignore
-    """Wipe color across display a pixel at a time."""
-    for i in range(strip.numPixels()):
-        strip.setPixelColor(i, color_black)
-
-    if debug:
-        print(matrixes)
-        print("\n\n\n\n")
-        print(translation_map)
-        print("\n\n\n\n")
-    for matrix in matrixes:
-        row_count = 0
-        col_count = 0
-        for row in matrix:
-            for element in row:
-                if debug:
-                    print(
-                        "Row_count " + str(row_count) + " Col_count " + str(col_count)
-                    )
-                    print(
-                        "Accessing pixel " + str(translation_map[row_count][col_count])
-                    )
-
-                if element == 1:
-                    if debug:
-                        print("true")
-                    strip.setPixelColor(
-                        translation_map[row_count][col_count], desired_color
-                    )
-                elif element != 0:
-                    strip.setPixelColor(translation_map[row_count][col_count], element)
-
-                col_count += 1
-
-            col_count = 0
-            row_count += 1
-
-    strip.show()
-
-
 """
 Function: delete_file - Given a file path it deletes the file
 Expects: Expects the file path to be valid
@@ -987,6 +901,45 @@ def check_brightness():
         add_time_card(datetime.now() + timedelta(seconds=10), "Auto_Brightness")
 
 
+"""
+Function: has_pending_event - Checks if the clock loop has anything to do
+Expects: Expects lock to be held by the caller
+Does: Returns True if a command changed the panels state or the first time card is due
+"""
+
+
+def has_pending_event(time_card_heap):
+    if brightness_change or color_change or gif_change != 0:
+        return True
+    return bool(time_card_heap) and time_card_heap[0][0] <= datetime.now()
+
+
+"""
+Function: seconds_until_next_time_card - How long the clock loop can sleep before the first time card is due
+Expects: Expects lock to be held by the caller
+Does: Returns the seconds until the first time card (None if there are no time cards meaning wait for an event)
+"""
+
+
+def seconds_until_next_time_card(time_card_heap):
+    if not time_card_heap:
+        return None
+    return max(0.0, (time_card_heap[0][0] - datetime.now()).total_seconds())
+
+
+"""
+Function: post_event - Wakes the clock loop (and a playing animation) so it handles a state change right away
+Expects: Expects nothing (safe to call with or without lock held)
+Does: Notifies everything waiting on state_changed
+"""
+
+
+def post_event():
+    with state_changed:
+        # the clock loop and a playing animation can both be waiting
+        state_changed.notify_all()
+
+
 """
 Function: clock_player - Handles all tasks related to the clock behavior of the panel (time, temperature, brightness, etc)
 Expects: Expects strip to be correctly initialized and side_length to be valid
@@ -1011,7 +964,6 @@ def clock_player(strip, side_length, time_card_heap):
     gif_change = 0
     global gif_position
     gif_position = 0
-    random_gif_directory = "random_gif_anis"
     global exit_animation
     exit_animation = False
     temp_position = 0
@@ -1026,113 +978,97 @@ def clock_player(strip, side_length, time_card_heap):
     # Calculate the difference in minutes and convert to an integer
     minutes_since_midnight = int((now - midnight).total_seconds() / 60)
 
-    translation_map = [[0 for _ in range(side_length)] for _ in range(side_length)]
-
-    rows = len(translation_map)
-    cols = len(translation_map[0])  # Assuming the matrix is not empty
-    count = 0
-
-    for col in range(cols):
-        if col % 2 == 0:
-            # Traverse down for even-numbered columns
-            for row in range(rows):
-                translation_map[row][col] = count
-                count = count + 1
-        else:
-            # Traverse up for odd-numbered columns
-            for row in range(rows - 1, -1, -1):
-                translation_map[row][col] = count
-                count = count + 1
-
-    translation_map = rotate_matrix(translation_map, 3)
+    # strip index of every [row][col] (plain ints as setPixelColor won't take numpy integers)
+    translation_map = panel_geometry.strip_index_map(side_length, PANEL_ROTATE_K).tolist()
     num_rows = 16
     num_cols = 16
-    matrixes = []
     time_matrix = [[0 for _ in range(num_cols)] for _ in range(num_rows)]
     temperature_matrix = [[0 for _ in range(num_cols)] for _ in range(num_rows)]
-    update_time_on_panel(time_matrix)
-    matrixes.append(time_matrix)
-    update_temperature_on_panel(temperature_matrix)
-    matrixes.append(temperature_matrix)
+
+    # layers are drawn in order (later layers over earlier ones), only changed pixels are pushed on present
+    framebuffer = LayeredFramebuffer(
+        side_length, translation_map, desired_color, ["time", "temperature"]
+    )
+    framebuffer.set_layer("time", update_time_on_panel(time_matrix))
+    framebuffer.set_layer("temperature", update_temperature_on_panel(temperature_matrix))
     check_brightness()
-    compositor(strip, matrixes, translation_map, desired_color)
+    framebuffer.present(strip)
 
     while True:
-        current_time = datetime.now()
-        if time_card_heap:
-            first_task_time, first_task_description = time_card_heap[0]
+        with lock:
+            # Sleep until the next time card is due or a command posts an event (no polling while idle)
+            while not has_pending_event(time_card_heap):
+                state_changed.wait(seconds_until_next_time_card(time_card_heap))
+
+            due_tasks = []
+            current_time = datetime.now()
+            while time_card_heap and time_card_heap[0][0] <= current_time:
+                due_tasks.append(heapq.heappop(time_card_heap)[1])
 
-            # time to do a task
-            if first_task_time <= current_time:
-                heapq.heappop(time_card_heap)
+        # time cards are ran without the lock as they can block on the network (sensor data)
+        for first_task_description in due_tasks:
+            print(
+                "running task "
+                + first_task_description
+                + " Time: "
+                + datetime.now().strftime("%I:%M:%S %p %B %d %Y")
+            )
+            if first_task_description == "Time":
+                framebuffer.set_layer("time", update_time_on_panel(time_matrix))
+                framebuffer.present(strip)
+            elif first_task_description == "Temperature":
+                framebuffer.set_layer(
+                    "temperature", update_temperature_on_panel(temperature_matrix)
+                )
+                framebuffer.present(strip)
+            elif first_task_description == "Print Done":
+                print_done(strip)
+                # the wipe drew over the clock so the next update has to redraw everything
+                framebuffer.invalidate()
+            elif first_task_description == "Auto_Brightness":
+                check_brightness()
+            else:
                 print(
-                    "running task "
-                    + first_task_description
-                    + " Time: "
-                    + datetime.now().strftime("%I:%M:%S %p %B %d %Y")
+                    "Invalid desired task no task called " + first_task_description
                 )
-                if first_task_description == "Time":
-                    matrixes[0] = update_time_on_panel(time_matrix)
-                    compositor(strip, matrixes, translation_map, desired_color)
-                elif first_task_description == "Temperature":
-                    matrixes[1] = update_temperature_on_panel(temperature_matrix)
-                    compositor(strip, matrixes, translation_map, desired_color)
-                elif first_task_description == "Print Done":
-                    print_done(strip)
-                elif first_task_description == "Auto_Brightness":
-                    check_brightness()
-                else:
-                    print(
-                        "Invalid desired task no task called " + first_task_description
-                    )
 
         # check todo list of possible state changes
-        lock.acquire()
-        try:
+        with lock:
+            gif_mode = 0
             if brightness_change:
                 change_brightness(strip, brightness)
                 brightness_change = False
             elif color_change:
                 desired_color = get_color(color_position)
-                change_clocks_color(strip, desired_color)
+                framebuffer.set_color(desired_color)
+                framebuffer.present(strip)
                 color_change = False
-            elif gif_change == 1:
+            else:
+                gif_mode = gif_change
                 temp_position = gif_position
-                lock.release()
-                play_animation(
-                    strip,
-                    "random_gif_anis/"
-                    + random_gif_helper(random_gif_directory)[temp_position],
-                    16,
-                )
+
+        # animations play without the lock so commands can still change position or exit them
+        if gif_mode == 1:
+            prefetch_neighbouring_gifs(temp_position)
+            play_animation(strip, gif_playlist.path(temp_position), 16)
+            with lock:
                 gif_change = 0
-                compositor(strip, matrixes, translation_map, desired_color)
-                lock.acquire()
                 exit_animation = False
-                lock.release()
-            elif gif_change == 2:
-                while not exit_animation:
+            framebuffer.invalidate()
+            framebuffer.present(strip)
+        elif gif_mode == 2:
+            while True:
+                with lock:
+                    if exit_animation:
+                        exit_animation = False
+                        gif_change = 0
+                        break
                     temp_position = gif_position
-                    lock.release()
-                    play_animation(
-                        strip,
-                        "random_gif_anis/"
-                        + random_gif_helper(random_gif_directory)[temp_position],
-                        16,
-                    )
-                    lock.acquire()
+                prefetch_neighbouring_gifs(temp_position)
+                play_animation(strip, gif_playlist.path(temp_position), 16)
 
-                exit_animation = False
-                gif_change = 0
-                compositor(strip, matrixes, translation_map, desired_color)
-        finally:
-            if lock.locked():
-                lock.release()
-
-        first_task_time, first_task_description = time_card_heap[0]
-        # time to do a task
-        if first_task_time >= current_time:
-            time.sleep(0.0166)
+            framebuffer.invalidate()
+            framebuffer.present(strip)
 
 
 """
@@ -1145,21 +1081,17 @@ if __name__ == "__main__":
     animation_thread_flag = False
     exit_animation = False
 
-    # Create NeoPixel object with appropriate configuration.
-    strip = Adafruit_NeoPixel(
-        LED_COUNT,
-        LED_PIN,
-        LED_FREQ_HZ,
-        LED_DMA,
-        LED_INVERT,
-        LED_BRIGHTNESS,
-        LED_CHANNEL,
-    )  # type: ignore
+    # Create the output (the NeoPixel strip unless PANEL_OUTPUT picks another backend), renderers draw into the outputs
+    # frame which is pushed to the strip in bulk on show()
+    strip = create_strip(PANEL_OUTPUT)
     # Intialize the library (must be called once before other functions).
     strip.begin()
 
+    # Keep the gif playlist up to date in the background so commands never list the directory
+    gif_playlist.watch()
+
     # Create thread to handle network requests
-    listener_thread = threading.Thread(target=listen_for_http, daemon=True)
+    listener_thread = threading.Thread(target=listen_for_commands, daemon=True)
     listener_thread.start()
 
     global brightness
@@ -1170,7 +1102,7 @@ if __name__ == "__main__":
 
     # 35 max
     change_brightness(strip, brightness)
-    clock_player(strip, 16, time_card_heap)
+    clock_player(strip, PANEL_SIDE_LENGTH, time_card_heap)
 
     if brightness > 35:
         brightness = 35
@@ -1215,12 +1147,12 @@ if __name__ == "__main__":
     while True:
         try:
             if is_ani:
-                play_animation(strip, file_name, 16)
+                play_animation(strip, file_name, PANEL_SIDE_LENGTH)
 
             elif is_iti:
-                itinerary_player(file_name, strip, 16)
+                itinerary_player(file_name, strip, PANEL_SIDE_LENGTH)
             elif is_clock:
-                clock_player(strip, 16, time_card_heap)
+                clock_player(strip, PANEL_SIDE_LENGTH, time_card_heap)
 
         except KeyboardInterrupt:
             print("\nexiting")
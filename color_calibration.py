@@ -0,0 +1,137 @@
+"""
+color_calibration.py - Compiles calibration.cal into a 3D lookup table so whole frames are calibrated with one index
+
+calibration.cal pairs colors as they were requested with the color the panel needed to be sent to show them. Rather
+than searching every calibration entry for the closest requested color per pixel, every color of a quantized RGB cube
+(bits per channel, 6 by default so 64 * 64 * 64 cells) is matched once to its closest entry (euclidean, ties going to
+the earlier entry like the original search) and the calibrated colors are stored in a (n, n, n, 3) uint8 table.
+The table is cached next to the calibration file (calibration.lut<bits>.npz) and rebuilt whenever the file changes.
+With bits = 8 the table covers every color so lookups are exact (at 48 MB).
+
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+
+
+# bits kept per channel when quantizing colors into the table
+LUT_BITS = 6
+
+
+"""
+Function: read_calibration_file - Reads a calibration file into a dictionary
+Expects: filename point to a calibration file, one color per line as "name" (r g b) -> (r g b)
+Does: Returns {name: ((r_original, g_original, b_original), (r_calibrated, g_calibrated, b_calibrated))}
+"""
+def read_calibration_file(filename):
+    # Initialize an empty dictionary to store color calibration data
+    colors = {}
+    # Open the calibration file for reading
+    with open(filename, "r") as file:
+        # Iterate over each line in the file
+        for line in file:
+            # Extract the color name from the line
+            name = line[1:line.rfind('"')]
+            # Remove unnecessary characters and split the line into components
+            line = line[line.find("(") + 1:]
+            line = line.split()
+            # Extract original RGB values from the line
+            r_original = [int(num) for num in re.findall(r'\d+', line[0])][0]
+            g_original = [int(num) for num in re.findall(r'\d+', line[1])][0]
+            b_original = [int(num) for num in re.findall(r'\d+', line[2])][0]
+            # Extract calibrated RGB values from the line
+            r_calibrated = [int(num) for num in re.findall(r'\d+', line[4])][0]
+            g_calibrated = [int(num) for num in re.findall(r'\d+', line[5])][0]
+            b_calibrated = [int(num) for num in re.findall(r'\d+', line[6])][0]
+            # Store the color data in the dictionary
+            colors[name] = ((r_original, g_original, b_original), (r_calibrated, g_calibrated, b_calibrated))
+
+    # Return the dictionary containing color calibration data
+    return colors
+
+
+"""
+Function: compile_calibration_lut - Builds the lookup table for a calibration dictionary
+Expects: calibrated_colors be read_calibration_file output (at least one entry) and bits be 1-8
+Does: Returns a (2**bits, 2**bits, 2**bits, 3) uint8 table of the calibrated color closest to each cells center
+"""
+def compile_calibration_lut(calibrated_colors, bits=LUT_BITS):
+    originals = np.array([values[0] for values in calibrated_colors.values()], dtype=np.int32)
+    calibrated = np.array([values[1] for values in calibrated_colors.values()], dtype=np.uint8)
+
+    size = 1 << bits
+    shift = 8 - bits
+    centers = (np.arange(size, dtype=np.int32) << shift) + ((1 << shift) >> 1)
+
+    lut = np.empty((size, size, size, 3), dtype=np.uint8)
+    green, blue = np.meshgrid(centers, centers, indexing="ij")
+    plane = np.stack((green.ravel(), blue.ravel()), axis=1)
+
+    # one red plane at a time keeps the distance matrix at size * size * entries
+    for red_index, red in enumerate(centers.tolist()):
+        distances = (originals[:, 0] - red) ** 2 + ((plane[:, None, :] - originals[None, :, 1:]) ** 2).sum(axis=2)
+        lut[red_index] = calibrated[distances.argmin(axis=1)].reshape(size, size, 3)
+
+    return lut
+
+
+"""
+Class: ColorCalibration - A compiled calibration table
+Expects: lut be a compile_calibration_lut table
+Does: calibrate_color() calibrates one color and calibrate_image() a whole (..., 3) array with a single index
+
+"""
+class ColorCalibration:
+    def __init__(self, lut):
+        self.lut = lut
+        self.shift = 8 - (lut.shape[0].bit_length() - 1)
+
+    def calibrate_color(self, r, g, b):
+        return tuple(self.lut[r >> self.shift, g >> self.shift, b >> self.shift].tolist())
+
+    def calibrate_image(self, image_array):
+        quantized = np.asarray(image_array, dtype=np.uint8) >> self.shift
+        return self.lut[quantized[..., 0], quantized[..., 1], quantized[..., 2]]
+
+
+"""
+Function_Helper: lut_cache_path - Returns where the table for a calibration file is cached
+Expects: calibration_path be the calibration files path
+Does: Returns the path next to it, calibration.cal -> calibration.lut6.npz
+"""
+def lut_cache_path(calibration_path, bits):
+    return os.path.splitext(calibration_path)[0] + f".lut{bits}.npz"
+
+
+"""
+Function: load_calibration - Loads the compiled calibration for a calibration file, compiling and caching it if needed
+Expects: calibration_path point to a calibration file
+Does: Returns a ColorCalibration, the cached table is used unless the calibration files contents changed
+"""
+def load_calibration(calibration_path, bits=LUT_BITS):
+    with open(calibration_path, "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+
+    cache_path = lut_cache_path(calibration_path, bits)
+    try:
+        with np.load(cache_path) as cached:
+            if str(cached["digest"]) == digest:
+                return ColorCalibration(cached["lut"])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    lut = compile_calibration_lut(read_calibration_file(calibration_path), bits)
+
+    # written to a temporary file first so a half written cache is never loaded
+    temp_path = cache_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            np.savez(file, lut=lut, digest=np.array(digest))
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Couldn't cache the calibration table at {cache_path}: {e}")
+
+    return ColorCalibration(lut)
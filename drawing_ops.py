@@ -0,0 +1,233 @@
+"""
+drawing_ops.py - Finds the drawing ops (fills, scrolls, copies) that take the panel from one frame to the next in fewer
+bytes than a record per changed pixel
+
+Effects mostly move what is already on the panel, a shift down or a scroll along the strip changes nearly every lit
+pixel but is a single copy op (see ani_format.py for the ops and the panel grid they work on). find_ops() builds a frame
+greedily, every round it tries
+
+    copying a rect of the grid by every shift up to SHIFT_RADIUS cells (plus the shifts that wrap a row around to the
+    next, a scroll in the frames row order crosses the grid edge that way)
+    copying a run of the strip by up to SHIFT_RADIUS pixels
+    filling the pixels of the most common new colors as a rect or a strip run
+
+covering the pixels each would fix, and keeps whichever leaves the fewest bytes to write. What no op fixes is left as pixel
+records, and if the ops don't come out smaller than the plain delta the frame is written as a delta as before.
+
+"""
+
+import numpy as np
+
+import ani_format
+import panel_geometry
+
+
+# most ops in a frame before the rest is left to pixel records
+MAX_OPS = 8
+
+# furthest shift (in cells or strip pixels) copies are tried at
+SHIFT_RADIUS = 2
+
+# new colors tried as fills each round
+FILL_COLORS = 2
+
+# rect ops store their coordinates in a byte
+MAX_RECT_SIDE = 255
+
+PIXEL_BYTES = ani_format.DELTA_RECORD.size
+
+
+"""
+Function_Helper: op_size - returns the bytes an op takes up in a FRAME_OPS frame
+Expects: opcode be one of the ani_format OP_ codes other than OP_PIXELS
+Does: Returns 1 (the opcode) plus the size of its fields
+"""
+def op_size(opcode):
+    return 1 + ani_format.OP_FIELDS[opcode].size
+
+
+"""
+Function_Helper: pack_panel - packs strip order rgb bytes into one integer per pixel
+Expects: panel be rgb triplets in strip order
+Does: Returns an int32 array of (r << 16) | (g << 8) | b
+"""
+def pack_panel(panel):
+    pixels = np.frombuffer(bytes(panel), dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    return (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+
+
+"""
+Function_Helper: unpack_color - the inverse of pack_panel for one pixel
+Expects: color be a packed integer
+Does: Returns (r, g, b)
+"""
+def unpack_color(color):
+    return (color >> 16) & 255, (color >> 8) & 255, color & 255
+
+
+"""
+Function_Helper: grid_shifts - returns the (dx, dy) shifts grid copies are tried at
+Expects: side_length be the panels side length
+Does: Returns every shift up to SHIFT_RADIUS in each direction and the shifts that wrap a row onto the next
+"""
+def grid_shifts(side_length):
+    shifts = [(dx, dy) for dy in range(-SHIFT_RADIUS, SHIFT_RADIUS + 1) for dx in range(-SHIFT_RADIUS, SHIFT_RADIUS + 1)
+              if dx or dy]
+    edge = side_length - 1
+    for a in (-1, 1):
+        for b in (-edge, edge):
+            shifts += [(a, b), (b, a)]
+    return shifts
+
+
+"""
+Class: OpSearch - The state of one frame's search
+Expects: before and target be pack_panel arrays of the panel as it is and as the frame should leave it
+Does: candidates() yields (op, resulting panel) for every op tried this round, apply() keeps one
+
+"""
+class OpSearch:
+    def __init__(self, before, target, side_length):
+        self.current = before
+        self.target = target
+        self.side_length = side_length
+        self.grid = panel_geometry.strip_index_map(side_length, 0)
+        self.use_rects = side_length <= MAX_RECT_SIDE
+
+    def wrong(self):
+        return self.current != self.target
+
+    def cost(self, panel):
+        return PIXEL_BYTES * int(np.count_nonzero(panel != self.target))
+
+    def apply(self, panel):
+        self.current = panel
+
+    # copying grid cells (x - dx, y - dy) onto (x, y) over the bounding box of the cells that would be fixed
+    def _grid_copy(self, dx, dy, wrong_grid, current_grid, target_grid):
+        side = self.side_length
+        x0, x1 = max(dx, 0), side + min(dx, 0)
+        y0, y1 = max(dy, 0), side + min(dy, 0)
+        if x0 >= x1 or y0 >= y1:
+            return None
+
+        source = current_grid[y0 - dy:y1 - dy, x0 - dx:x1 - dx]
+        fixed = wrong_grid[y0:y1, x0:x1] & (source == target_grid[y0:y1, x0:x1])
+        if not fixed.any():
+            return None
+
+        rows = np.flatnonzero(fixed.any(axis=1))
+        cols = np.flatnonzero(fixed.any(axis=0))
+        top, bottom = y0 + int(rows[0]), y0 + int(rows[-1]) + 1
+        left, right = x0 + int(cols[0]), x0 + int(cols[-1]) + 1
+
+        panel = self.current.copy()
+        panel[self.grid[top:bottom, left:right]] = self.current[self.grid[top - dy:bottom - dy, left - dx:right - dx]]
+        op = (ani_format.OP_COPY_RECT, left - dx, top - dy, right - left, bottom - top, left, top)
+        return op, panel
+
+    # copying strip pixels i - shift onto i over the run of pixels that would be fixed
+    def _strip_copy(self, shift, wrong):
+        length = len(self.current)
+        start, stop = max(shift, 0), length + min(shift, 0)
+        fixed = wrong[start:stop] & (self.current[start - shift:stop - shift] == self.target[start:stop])
+        indexes = np.flatnonzero(fixed)
+        if not len(indexes):
+            return None
+
+        first, last = start + int(indexes[0]), start + int(indexes[-1]) + 1
+        panel = self.current.copy()
+        panel[first:last] = self.current[first - shift:last - shift]
+        return (ani_format.OP_COPY_RUN, first - shift, first, last - first), panel
+
+    def _fills(self, color, wrong):
+        fill = wrong & (self.target == color)
+        rgb = unpack_color(color)
+
+        indexes = np.flatnonzero(fill)
+        panel = self.current.copy()
+        panel[indexes[0]:indexes[-1] + 1] = color
+        yield (ani_format.OP_FILL_RUN, int(indexes[0]), int(indexes[-1] - indexes[0] + 1)) + rgb, panel
+
+        if self.use_rects:
+            fill_grid = fill[self.grid]
+            rows = np.flatnonzero(fill_grid.any(axis=1))
+            cols = np.flatnonzero(fill_grid.any(axis=0))
+            top, bottom, left, right = int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+            panel = self.current.copy()
+            panel[self.grid[top:bottom, left:right]] = color
+            yield (ani_format.OP_FILL_RECT, left, top, right - left, bottom - top) + rgb, panel
+
+    def candidates(self):
+        wrong = self.wrong()
+
+        if self.use_rects:
+            wrong_grid = wrong[self.grid]
+            current_grid = self.current[self.grid]
+            target_grid = self.target[self.grid]
+            for dx, dy in grid_shifts(self.side_length):
+                candidate = self._grid_copy(dx, dy, wrong_grid, current_grid, target_grid)
+                if candidate is not None:
+                    yield candidate
+
+        for shift in range(-SHIFT_RADIUS, SHIFT_RADIUS + 1):
+            if shift:
+                candidate = self._strip_copy(shift, wrong)
+                if candidate is not None:
+                    yield candidate
+
+        colors, counts = np.unique(self.target[wrong], return_counts=True)
+        for color in colors[np.argsort(-counts)][:FILL_COLORS].tolist():
+            yield from self._fills(color, wrong)
+
+
+"""
+Function: find_ops - Finds drawing ops for a frame that are smaller than writing its changed pixels
+Expects: panel be the rgb bytes (strip order) the panel shows before the frame (AniWriter.panel), records the
+(index, r, g, b) pixels the frame changes, and side_length the panels side length
+Does: Returns a list of op tuples for AniWriter.write_ops() (ending with the pixels the ops didn't cover) or None when a
+plain delta of records is at least as small
+"""
+def find_ops(panel, records, side_length):
+    delta_bytes = PIXEL_BYTES * len(records)
+    # the smallest op frame (a copy or fill and nothing else) can't beat a single record
+    if delta_bytes <= op_size(ani_format.OP_COPY_RUN):
+        return None
+
+    before = pack_panel(panel)
+    target = before.copy()
+    for index, r, g, b in records:
+        target[index] = (r << 16) | (g << 8) | b
+
+    search = OpSearch(before, target, side_length)
+    ops = []
+    ops_bytes = 0
+    remaining = search.cost(search.current)
+
+    while remaining and len(ops) < MAX_OPS:
+        best = None
+        for op, result in search.candidates():
+            cost = op_size(op[0]) + search.cost(result)
+            if cost < remaining and (best is None or cost < best[0]):
+                best = (cost, op, result)
+        if best is None:
+            break
+
+        cost, op, result = best
+        ops.append(op)
+        ops_bytes += op_size(op[0])
+        search.apply(result)
+        remaining = search.cost(result)
+
+    if not ops:
+        return None
+
+    leftover = np.flatnonzero(search.wrong())
+    if len(leftover):
+        ops.append((ani_format.OP_PIXELS, [(index,) + unpack_color(color)
+                                           for index, color in zip(leftover.tolist(), target[leftover].tolist())]))
+        ops_bytes += op_size(ani_format.OP_PIXELS) + PIXEL_BYTES * len(leftover)
+
+    if ops_bytes >= delta_bytes:
+        return None
+    return ops
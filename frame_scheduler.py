@@ -0,0 +1,132 @@
+"""
+frame_scheduler.py - Paces animation playback against absolute deadlines instead of per frame sleeps
+
+Frame n is due at start + n * interval (time.monotonic_ns()) so sleep overshoot, garbage collection pauses, and the time
+strip.show() spends pushing data out never add up over a long loop. When playback has fallen so far behind that the next
+frame is already due the current one is dropped (its pixels are still applied by the caller, it just isn't shown) so the
+panel skips to the latest frame rather than playing in slow motion.
+
+Frame numbers count intervals (steps of a .ani) rather than frames shown, a frame held on the panel for several intervals
+is presented once with its duration and the next frame is simply due that many intervals later, so playback sleeps
+through the whole hold in one go. That wait can be cut short, given a threading.Condition and a cancelled() predicate the
+scheduler waits on the condition instead of sleeping, so whoever changes what cancelled() returns and notifies the
+condition stops playback straight away rather than after the hold.
+
+"""
+
+import time
+
+
+"""
+Class: FrameScheduler - Deadline based pacing and lag statistics for playing frames at a fixed fps
+Expects: fps be greater than 0, frame_count be the number of intervals playback lasts (None if unknown),
+drop_late_frames whether frames that are already a whole interval late should be skipped, cancelled() whether playback
+has been stopped and condition a threading.Condition notified when it may have become True (without one the waits sleep
+and cancelled() is only for the caller to check between frames)
+Does: present() waits for a frame's deadline and shows it (or drops it), finish() waits out the last frame, both return
+as soon as cancelled() is True, and stats()/report() describe how playback kept up
+
+"""
+class FrameScheduler:
+    def __init__(self, fps, frame_count=None, drop_late_frames=True, condition=None, cancelled=None):
+        self.interval_ns = int(1000000000 / float(fps))
+        self.frame_count = frame_count
+        self.drop_late_frames = drop_late_frames
+        self.condition = condition
+        self.cancelled = cancelled
+        self.start()
+
+    # (re)starts the clock, the deadlines are anchored to when the first frame is presented
+    def start(self):
+        self.start_ns = None
+        self.last_frame_number = -1
+        self.last_duration = 1
+        self._work_start_ns = time.monotonic_ns()
+        self.frame_times_ns = []
+        self.presented_frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.max_jitter_ns = 0
+
+    def deadline_ns(self, frame_number):
+        return self.start_ns + frame_number * self.interval_ns
+
+    # waits until deadline_ns, returns False if cancelled() was (or became) True first
+    def _wait_until(self, deadline_ns):
+        if self.condition is None:
+            remaining_ns = deadline_ns - time.monotonic_ns()
+            if remaining_ns > 0:
+                time.sleep(remaining_ns / 1000000000)
+            return True
+
+        with self.condition:
+            while not self.cancelled():
+                remaining_ns = deadline_ns - time.monotonic_ns()
+                if remaining_ns <= 0:
+                    return True
+                self.condition.wait(remaining_ns / 1000000000)
+            return False
+
+    # waits until frame_number is due and calls show(), returns False (without calling show) if the frame was dropped
+    # or playback was cancelled, duration is how many intervals the frame stays up (it's only dropped once the frame
+    # after it is due)
+    def present(self, frame_number, show, duration=1):
+        now = time.monotonic_ns()
+        if self.start_ns is None:
+            self.start_ns = now - frame_number * self.interval_ns
+        deadline = self.deadline_ns(frame_number)
+        self.last_frame_number = frame_number
+        self.last_duration = duration
+        is_last_frame = self.frame_count is not None and frame_number + duration >= self.frame_count
+
+        if self.drop_late_frames and not is_last_frame and now >= self.deadline_ns(frame_number + duration):
+            self.dropped_frames += 1
+            self.late_frames += 1
+            return False
+
+        if not self._wait_until(deadline):
+            return False
+        if now > deadline:
+            self.late_frames += 1
+
+        woke_ns = time.monotonic_ns()
+        show()
+        shown_ns = time.monotonic_ns()
+
+        # work is everything since the previous frame was shown (decoding, applying pixels) plus the show itself
+        self.frame_times_ns.append((now - self._work_start_ns) + (shown_ns - woke_ns))
+        self.max_jitter_ns = max(self.max_jitter_ns, abs(woke_ns - deadline))
+        self.presented_frames += 1
+        self._work_start_ns = shown_ns
+        return True
+
+    # waits until the last frame has been on the panel for its full duration, returns False if playback was cancelled
+    def finish(self):
+        if self.start_ns is None:
+            return True
+        return self._wait_until(self.deadline_ns(self.last_frame_number + self.last_duration))
+
+    # returns the frame time (in ms) that percentile percent of frames finished within
+    def frame_time_percentile_ms(self, percentile):
+        if not self.frame_times_ns:
+            return 0.0
+        ordered = sorted(self.frame_times_ns)
+        return ordered[int(round((len(ordered) - 1) * percentile / 100))] / 1000000
+
+    def stats(self):
+        return {
+            "presented_frames": self.presented_frames,
+            "late_frames": self.late_frames,
+            "dropped_frames": self.dropped_frames,
+            "max_jitter_ms": self.max_jitter_ns / 1000000,
+            "p99_frame_ms": self.frame_time_percentile_ms(99),
+            "interval_ms": self.interval_ns / 1000000,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (
+            f"{stats['presented_frames']} frames shown, {stats['late_frames']} late, "
+            f"{stats['dropped_frames']} dropped, max jitter {stats['max_jitter_ms']:.2f} ms, "
+            f"p99 frame time {stats['p99_frame_ms']:.2f} / {stats['interval_ms']:.2f} ms"
+        )
@@ -0,0 +1,113 @@
+"""
+layered_framebuffer.py - Layered framebuffer for the clock face that only pushes pixels that actually changed
+
+Each layer (time, temperature, overlays, ...) is a side_length by side_length matrix where 0 is transparent, 1 is the
+clock color, and anything else is a packed color to show as is. Later layers are drawn over earlier ones. Every layer
+keeps a damage rectangle covering the cells that changed since the last present() so only those cells are recomposited,
+only pixels whose final color differs from what is already on the strip are set, and strip.show() is skipped entirely
+when nothing changed.
+
+"""
+
+
+"""
+Function_Helper: union_rect - returns the smallest rectangle covering both rectangles
+Expects: rectangles be (top, left, bottom, right) with bottom/right exclusive, either may be None
+Does: Returns the covering rectangle (or the other rectangle if one is None)
+"""
+def union_rect(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return (min(first[0], second[0]), min(first[1], second[1]), max(first[2], second[2]), max(first[3], second[3]))
+
+
+"""
+Class: LayeredFramebuffer - Stack of layer matrices composited onto the strip with per layer damage tracking
+Expects: side_length be the panels side length, translation_map map [row][col] to the strip index, and color be the
+packed color drawn for cells holding 1
+Does: set_layer()/set_color() record damage, present() pushes only the changed pixels, and invalidate() forces every
+pixel to be pushed again (after something else such as an animation drew on the strip)
+
+"""
+class LayeredFramebuffer:
+    def __init__(self, side_length, translation_map, color, layer_names):
+        self.side_length = side_length
+        self.translation_map = translation_map
+        self.color = color
+        self.layers = {}
+        self.damage = {}
+        for name in layer_names:
+            self.add_layer(name)
+
+        # colors last pushed to the strip for each cell, None means unknown so it must be pushed
+        self.pushed = None
+        self.invalidate()
+
+    def add_layer(self, name):
+        self.layers[name] = [[0 for _ in range(self.side_length)] for _ in range(self.side_length)]
+        self.damage[name] = None
+
+    # replaces the contents of a layer, damaging only the cells that differ from what the layer held
+    def set_layer(self, name, matrix):
+        layer = self.layers[name]
+        rect = None
+        for row in range(self.side_length):
+            if layer[row] == matrix[row]:
+                continue
+            for col in range(self.side_length):
+                if layer[row][col] != matrix[row][col]:
+                    rect = union_rect(rect, (row, col, row + 1, col + 1))
+            layer[row] = list(matrix[row])
+
+        self.damage[name] = union_rect(self.damage[name], rect)
+
+    # changes the clock color, damaging the cells of every layer that are drawn in it
+    def set_color(self, color):
+        if color == self.color:
+            return
+        self.color = color
+
+        for name, layer in self.layers.items():
+            for row in range(self.side_length):
+                for col in range(self.side_length):
+                    if layer[row][col] == 1:
+                        self.damage[name] = union_rect(self.damage[name], (row, col, row + 1, col + 1))
+
+    # forgets what is on the strip so the next present() pushes every pixel
+    def invalidate(self):
+        self.pushed = [[None for _ in range(self.side_length)] for _ in range(self.side_length)]
+        for name in self.damage:
+            self.damage[name] = (0, 0, self.side_length, self.side_length)
+
+    # returns the final color of a cell (the top most non transparent layer)
+    def cell_color(self, row, col):
+        for layer in reversed(list(self.layers.values())):
+            element = layer[row][col]
+            if element == 1:
+                return self.color
+            elif element != 0:
+                return element
+        return 0
+
+    # pushes the changed pixels to the strip and shows them, returns how many pixels were pushed
+    def present(self, strip):
+        changed = 0
+        for name, rect in self.damage.items():
+            if rect is None:
+                continue
+            top, left, bottom, right = rect
+            for row in range(top, bottom):
+                pushed_row = self.pushed[row]
+                for col in range(left, right):
+                    color = self.cell_color(row, col)
+                    if pushed_row[col] != color:
+                        strip.setPixelColor(self.translation_map[row][col], color)
+                        pushed_row[col] = color
+                        changed += 1
+            self.damage[name] = None
+
+        if changed:
+            strip.show()
+        return changed
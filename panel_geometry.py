@@ -0,0 +1,83 @@
+"""
+panel_geometry.py - Mapping between frames (rows and columns) and the order pixels sit on the LED strip
+
+The strip snakes through the panel column by column, down the even columns and back up the odd ones, after the frame
+has been rotated by rotate_k * 90 degrees (np.rot90, 3 is used for the wall mounted panel). Rather than walking that
+pattern with loops for every frame the mapping is computed once per side length/rotation as a NumPy index array so a
+whole frame is converted (or diffed) with a single gather or scatter. Works for any side length (16, 32, 64, ...).
+
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+"""
+Function: strip_gather - Returns the gather index taking a flattened frame to strip order
+Expects: side_length be the panels side length and rotate_k the number of 90 degree rotations
+Does: Returns a read only array where strip pixel i is frame.flat[gather[i]] (cached per side_length/rotate_k)
+"""
+@lru_cache(maxsize=None)
+def strip_gather(side_length, rotate_k):
+    frame_indexes = np.arange(side_length * side_length).reshape(side_length, side_length)
+    rotated = np.rot90(frame_indexes, k=rotate_k)
+
+    # one row per strip column, reversing the odd ones as the strip runs back up them
+    columns = rotated.T.copy()
+    columns[1::2] = columns[1::2, ::-1]
+
+    gather = columns.ravel()
+    gather.flags.writeable = False
+    return gather
+
+
+"""
+Function: strip_index_map - Returns the strip index of every [row][col] of a frame
+Expects: side_length be the panels side length and rotate_k the number of 90 degree rotations
+Does: Returns a side_length by side_length read only array (the inverse of strip_gather, cached)
+"""
+@lru_cache(maxsize=None)
+def strip_index_map(side_length, rotate_k):
+    index_map = np.empty(side_length * side_length, dtype=np.int64)
+    index_map[strip_gather(side_length, rotate_k)] = np.arange(side_length * side_length)
+
+    index_map = index_map.reshape(side_length, side_length)
+    index_map.flags.writeable = False
+    return index_map
+
+
+"""
+Function: frame_to_strip - Converts a frame of colors to strip order
+Expects: frame be a square (side, side, channels) array (or nested lists of color tuples) or (side, side) of packed colors
+Does: Returns a (side * side, channels) or (side * side,) array in strip order
+"""
+def frame_to_strip(frame, rotate_k):
+    frame = np.asarray(frame)
+    side_length = frame.shape[0]
+    flat = frame.reshape((side_length * side_length,) + frame.shape[2:])
+    return flat[strip_gather(side_length, rotate_k)]
+
+
+"""
+Function: strip_to_frame - Converts strip order colors back into a frame
+Expects: strip_colors be (side * side, channels) or (side * side,) and side_length match it
+Does: Returns the (side, side, channels) or (side, side) frame the strip colors came from
+"""
+def strip_to_frame(strip_colors, side_length, rotate_k):
+    strip_colors = np.asarray(strip_colors)
+    flat = np.empty_like(strip_colors)
+    flat[strip_gather(side_length, rotate_k)] = strip_colors
+    return flat.reshape((side_length, side_length) + strip_colors.shape[1:])
+
+
+"""
+Function: changed_strip_mask - Diffs two strip order frames
+Expects: previous_strip and current_strip be same shaped strip order arrays (from frame_to_strip)
+Does: Returns a boolean array that is True for every strip index whose color differs between the two
+"""
+def changed_strip_mask(previous_strip, current_strip):
+    difference = previous_strip != current_strip
+    if difference.ndim > 1:
+        difference = difference.any(axis=1)
+    return difference
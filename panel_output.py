@@ -0,0 +1,501 @@
+"""
+panel_output.py - Output backends that hold a whole frame of packed colors and push it to the panel in one go
+
+Renderers write into an in memory frame (array of packed uint32 colors in strip order, the same value rpi_ws281x's
+Color() returns) which costs a plain Python array store per pixel instead of a call across the rpi_ws281x SWIG boundary.
+show() then hands the whole frame to the backend at once. The backends keep the Adafruit_NeoPixel method names
+(setPixelColor, numPixels, setBrightness, show, ...) so code written against the strip works with any of them.
+
+Backends
+    ws281x   - the real panel (rpi_ws281x is only imported when this backend is created)
+    tk       - a window drawing the panel, for working without the hardware
+    null     - discards frames, only counts and times them (headless benchmarking)
+    memory   - keeps the last shown frame
+    recording - keeps every shown frame with the time it was shown
+    shm      - publishes frames to a shared memory block other processes can read (read_shared_frame)
+
+The real panel still has to be given each pixel with its own call across the SWIG boundary (rpi_ws281x's slice setter
+is a loop of those too), so Ws281xOutput only sends the pixels that changed since the last show, what the per pixel
+setPixelColor loop it replaced sent for delta frames.
+
+Running this file benchmarks the bulk path and the ws281x push against a stand in strip that counts the calls made
+into it (python panel_output.py [led_count] [frames] [changed pixels per frame]) or, given a .ani file, plays it
+through a backend as fast as possible (python panel_output.py file.ani [backend]).
+
+"""
+
+import struct
+import sys
+import time
+from array import array
+
+from animation_cache import pack_color
+
+
+"""
+Function: Color - Packs r, g, b the same way rpi_ws281x's Color() does
+Expects: red, green, blue, and white be within 0-255
+Does: Returns the packed color so callers don't need rpi_ws281x installed to build colors
+"""
+def Color(red, green, blue, white=0):
+    return (white << 24) | pack_color(red, green, blue)
+
+
+# pixels compared at a time when looking for the ones that changed, runs that didn't change are skipped as a whole
+COMPARE_CHUNK = 64
+
+
+"""
+Function_Helper: changed_indexes - Finds the pixels of a frame that differ from the frame last pushed
+Expects: pixels and shown be arrays of packed colors of the same length
+Does: Returns the indexes where pixels differs from shown, comparing COMPARE_CHUNK pixels at once first
+"""
+def changed_indexes(pixels, shown):
+    if pixels == shown:
+        return []
+
+    changed = []
+    for start in range(0, len(pixels), COMPARE_CHUNK):
+        stop = start + COMPARE_CHUNK
+        if pixels[start:stop] != shown[start:stop]:
+            changed += [index for index in range(start, min(stop, len(pixels))) if pixels[index] != shown[index]]
+    return changed
+
+
+"""
+Class: PanelOutput - Base for the output backends, holds the frame that show() pushes
+Expects: led_count be the number of pixels on the panel and brightness be 0-255
+Does: Keeps the frame in self.pixels, the pixel setters only touch that frame, and show() calls the backends _push()
+
+"""
+class PanelOutput:
+    def __init__(self, led_count, brightness=255):
+        self.pixels = array("I", bytes(4 * led_count))
+        self.brightness = brightness
+
+    # does nothing by default, backends that need to set up hardware override it
+    def begin(self):
+        pass
+
+    def numPixels(self):
+        return len(self.pixels)
+
+    def setPixelColor(self, index, color):
+        self.pixels[index] = color
+
+    def getPixelColor(self, index):
+        return self.pixels[index]
+
+    def setBrightness(self, brightness):
+        self.brightness = brightness
+
+    def getBrightness(self):
+        return self.brightness
+
+    # sets the pixels at indexes to the matching packed colors (a decoded frame from the animation cache)
+    def write_pixels(self, indexes, colors):
+        pixels = self.pixels
+        for index, color in zip(indexes, colors):
+            pixels[index] = color
+
+    # replaces the whole frame, colors must be led_count packed colors in strip order
+    def write_frame(self, colors):
+        if len(colors) != len(self.pixels):
+            raise ValueError(f"Frame has {len(colors)} pixels but the panel has {len(self.pixels)}")
+        self.pixels[:] = colors if isinstance(colors, array) and colors.typecode == "I" else array("I", colors)
+
+    # sets every pixel to color
+    def fill(self, color):
+        self.pixels[:] = array("I", [color]) * len(self.pixels)
+
+    def show(self):
+        self._push()
+
+    def _push(self):
+        raise NotImplementedError
+
+    # releases anything the backend holds (windows, shared memory), the output can't be shown afterwards
+    def close(self):
+        pass
+
+
+"""
+Class: Ws281xOutput - Backend for a real panel driven by rpi_ws281x
+Expects: strip be an Adafruit_NeoPixel/PixelStrip (begin() is called through this object), open() builds one
+Does: The setters note which pixels they touched and show() sends only those whose color changed since the last show to
+the strip (one setPixelColor each, so a held or sparse frame costs as little as it did with the per pixel loop) and
+then shows it
+
+"""
+class Ws281xOutput(PanelOutput):
+    # creates the strip from its wiring configuration, importing rpi_ws281x only now so nothing else needs it installed
+    @classmethod
+    def open(cls, led_count, pin, freq_hz, dma, invert, brightness, channel):
+        from rpi_ws281x import Adafruit_NeoPixel  # type: ignore
+
+        return cls(Adafruit_NeoPixel(led_count, pin, freq_hz, dma, invert, brightness, channel))
+
+    def __init__(self, strip):
+        super().__init__(strip.numPixels())
+        self.strip = strip
+
+        # what the strip's LED data holds (it starts off) and the pixels set since the last show (None once the whole
+        # frame was replaced)
+        self.shown = array("I", self.pixels)
+        self._dirty = set()
+
+    def begin(self):
+        self.strip.begin()
+
+    def setBrightness(self, brightness):
+        super().setBrightness(brightness)
+        self.strip.setBrightness(brightness)
+
+    def getBrightness(self):
+        return self.strip.getBrightness()
+
+    def setPixelColor(self, index, color):
+        self.pixels[index] = color
+        if self._dirty is not None:
+            self._dirty.add(index)
+
+    def write_pixels(self, indexes, colors):
+        super().write_pixels(indexes, colors)
+        if self._dirty is not None:
+            self._dirty.update(indexes)
+
+    def write_frame(self, colors):
+        super().write_frame(colors)
+        self._dirty = None
+
+    def fill(self, color):
+        super().fill(color)
+        self._dirty = None
+
+    def _push(self):
+        pixels = self.pixels
+        shown = self.shown
+        set_pixel_color = self.strip.setPixelColor
+        for index in changed_indexes(pixels, shown) if self._dirty is None else self._dirty:
+            color = pixels[index]
+            if shown[index] != color:
+                set_pixel_color(index, color)
+                shown[index] = color
+        self._dirty = set()
+        self.strip.show()
+
+
+"""
+Class: MemoryOutput - In memory stand in for the strip so the bulk path can be run and benchmarked off the Pi
+Expects: led_count be the number of pixels to emulate
+Does: show() copies the frame into self.leds (the emulated LED data) and counts how many frames were shown
+
+"""
+class MemoryOutput(PanelOutput):
+    def __init__(self, led_count, brightness=255):
+        super().__init__(led_count, brightness)
+        self.leds = array("I", self.pixels)
+        self.show_count = 0
+
+    def _push(self):
+        self.leds[:] = self.pixels
+        self.show_count += 1
+
+
+"""
+Class: NullOutput - Backend that throws frames away, used to measure playback without any output cost
+Expects: led_count be the number of pixels to emulate
+Does: show() only counts the frame and remembers when it was shown
+
+"""
+class NullOutput(PanelOutput):
+    def __init__(self, led_count, brightness=255):
+        super().__init__(led_count, brightness)
+        self.show_count = 0
+        self.last_show_ns = None
+
+    def _push(self):
+        self.show_count += 1
+        self.last_show_ns = time.monotonic_ns()
+
+
+"""
+Class: RecordingOutput - In memory backend that keeps every frame shown
+Expects: led_count be the number of pixels to emulate, max_frames the most frames to keep (None keeps all of them)
+Does: show() appends (time.monotonic_ns(), copy of the frame) to self.frames, dropping the oldest past max_frames
+
+"""
+class RecordingOutput(MemoryOutput):
+    def __init__(self, led_count, brightness=255, max_frames=None):
+        super().__init__(led_count, brightness)
+        self.max_frames = max_frames
+        self.frames = []
+
+    def _push(self):
+        super()._push()
+        self.frames.append((time.monotonic_ns(), array("I", self.pixels)))
+        if self.max_frames is not None and len(self.frames) > self.max_frames:
+            del self.frames[0]
+
+
+"""
+Class: TkOutput - Backend drawing the panel in a tkinter window
+Expects: led_count be side_length squared and rotate_k the rotation frames are given before strip mapping
+(panel_geometry), must be created and shown from the thread running tkinter
+Does: show() recolors the cells whose pixel changed since the last show and lets tkinter process the update
+
+"""
+class TkOutput(PanelOutput):
+    def __init__(self, led_count, side_length, rotate_k, cell_size=None, brightness=255):
+        import tkinter as tk
+
+        import panel_geometry
+
+        super().__init__(led_count, brightness)
+        if side_length * side_length != led_count:
+            raise ValueError(f"A {side_length} by {side_length} panel doesn't have {led_count} pixels")
+
+        cell_size = cell_size or max(1, 720 // side_length)
+        self.root = tk.Tk()
+        self.root.title("Panel")
+        self.canvas = tk.Canvas(self.root, width=side_length * cell_size, height=side_length * cell_size)
+        self.canvas.pack()
+
+        # one rectangle per strip index placed where that pixel sits in the frame
+        self.cells = []
+        for position in panel_geometry.strip_gather(side_length, rotate_k).tolist():
+            row, col = divmod(position, side_length)
+            x, y = col * cell_size, row * cell_size
+            self.cells.append(self.canvas.create_rectangle(x, y, x + cell_size, y + cell_size, fill="#000000"))
+        self.drawn = array("I", self.pixels)
+        self.root.update()
+
+    def _push(self):
+        for index, color in enumerate(self.pixels):
+            if self.drawn[index] != color:
+                self.canvas.itemconfig(self.cells[index], fill=f"#{color & 0xFFFFFF:06x}")
+        self.drawn[:] = self.pixels
+        self.root.update()
+
+    def close(self):
+        self.root.destroy()
+
+
+# shared memory layout, a header of (led_count, sequence) followed by led_count packed colors
+SHARED_FRAME_HEADER = struct.Struct("<II")
+
+
+"""
+Class: SharedMemoryOutput - Backend publishing frames to a named shared memory block
+Expects: led_count be the number of pixels and name the shared memory name readers will attach to
+Does: show() copies the frame into the block, the sequence is odd while a frame is being written and even once it is
+complete (read_shared_frame retries on odd or changed sequences), close() unlinks the block
+
+"""
+class SharedMemoryOutput(PanelOutput):
+    def __init__(self, led_count, name="ruepanel", brightness=255):
+        from multiprocessing import shared_memory
+
+        super().__init__(led_count, brightness)
+        self.shared_memory = shared_memory.SharedMemory(
+            name=name, create=True, size=SHARED_FRAME_HEADER.size + 4 * led_count
+        )
+        self.sequence = 0
+        SHARED_FRAME_HEADER.pack_into(self.shared_memory.buf, 0, led_count, self.sequence)
+        self._frame_view = self.shared_memory.buf[SHARED_FRAME_HEADER.size:].cast("I")
+
+    def _push(self):
+        buffer = self.shared_memory.buf
+        SHARED_FRAME_HEADER.pack_into(buffer, 0, len(self.pixels), self.sequence + 1)
+        self._frame_view[:] = self.pixels
+        self.sequence += 2
+        SHARED_FRAME_HEADER.pack_into(buffer, 0, len(self.pixels), self.sequence)
+
+    def close(self):
+        self._frame_view.release()
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+"""
+Function: read_shared_frame - Reads the latest complete frame published by a SharedMemoryOutput
+Expects: name be the name the output was created with
+Does: Returns (sequence, array of packed colors), sequence only grows so readers can tell if the frame is new
+"""
+def read_shared_frame(name="ruepanel"):
+    from multiprocessing import shared_memory
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        while True:
+            led_count, sequence = SHARED_FRAME_HEADER.unpack_from(block.buf, 0)
+            if sequence % 2:
+                continue
+            frame = array("I", bytes(block.buf[SHARED_FRAME_HEADER.size:SHARED_FRAME_HEADER.size + 4 * led_count]))
+            if SHARED_FRAME_HEADER.unpack_from(block.buf, 0)[1] == sequence:
+                return sequence, frame
+    finally:
+        block.close()
+
+
+# hardware free backends by name, ws281x needs the wiring so it is created with Ws281xOutput.open()
+OUTPUTS = {
+    "null": lambda led_count, side_length, rotate_k: NullOutput(led_count),
+    "memory": lambda led_count, side_length, rotate_k: MemoryOutput(led_count),
+    "recording": lambda led_count, side_length, rotate_k: RecordingOutput(led_count),
+    "tk": lambda led_count, side_length, rotate_k: TkOutput(led_count, side_length, rotate_k),
+    "shm": lambda led_count, side_length, rotate_k: SharedMemoryOutput(led_count),
+}
+
+
+"""
+Function: create_output - Creates one of the hardware free backends by name
+Expects: name be a key of OUTPUTS, led_count be side_length squared, and rotate_k the panels rotation
+Does: Returns the new PanelOutput (raises ValueError for unknown names)
+"""
+def create_output(name, led_count, side_length, rotate_k):
+    if name not in OUTPUTS:
+        raise ValueError(f"Unknown output {name}, expected one of {', '.join(OUTPUTS)}")
+    return OUTPUTS[name](led_count, side_length, rotate_k)
+
+
+"""
+Function: benchmark - Times pushing frames through a backend per pixel and in bulk
+Expects: output be a PanelOutput and frames be greater than 0
+Does: Returns (per pixel, bulk) frames per second for full frames of changing colors
+"""
+def benchmark(output, frames):
+    led_count = output.numPixels()
+    frame_colors = [array("I", [(frame * 7 + index) & 0xFFFFFF for index in range(led_count)]) for frame in range(8)]
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        colors = frame_colors[frame % len(frame_colors)]
+        for index in range(led_count):
+            output.setPixelColor(index, colors[index])
+        output.show()
+    per_pixel = frames / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        output.write_frame(frame_colors[frame % len(frame_colors)])
+        output.show()
+    bulk = frames / (time.perf_counter() - start)
+
+    return per_pixel, bulk
+
+
+"""
+Class: CountingStrip - Stand in for an rpi_ws281x strip that counts the calls made into it
+Expects: led_count be the number of pixels to emulate
+Does: setPixelColor() stores the color and counts the call (each is a SWIG call on the real strip), show() counts frames
+
+"""
+class CountingStrip:
+    def __init__(self, led_count):
+        self.leds = array("I", bytes(4 * led_count))
+        self.calls = 0
+        self.show_count = 0
+
+    def numPixels(self):
+        return len(self.leds)
+
+    def setPixelColor(self, index, color):
+        self.leds[index] = color
+        self.calls += 1
+
+    def show(self):
+        self.show_count += 1
+
+
+"""
+Function: benchmark_ws281x_push - Times getting delta frames onto a strip the old and the current way
+Expects: led_count be the number of pixels, frames greater than 0, and changed the pixels each frame changes
+Does: Returns {way: (frames per second, strip calls per frame)} for calling setPixelColor per changed pixel (the loop
+Ws281xOutput replaced), sending every pixel on each show (what the slice setter does), and Ws281xOutput
+"""
+def benchmark_ws281x_push(led_count, frames, changed):
+    # every frame gives its pixels a color they haven't had yet so each one really changes
+    deltas = []
+    for frame in range(frames):
+        indexes = array("H", sorted(set((frame * 37 + step * 53) % led_count for step in range(changed))))
+        deltas.append((indexes, array("I", [(frame << 12 | index) & 0xFFFFFF for index in indexes])))
+
+    def per_changed_pixel(strip):
+        for frame in range(frames):
+            indexes, colors = deltas[frame]
+            for index, color in zip(indexes, colors):
+                strip.setPixelColor(index, color)
+            strip.show()
+
+    def every_pixel(strip):
+        pixels = array("I", bytes(4 * led_count))
+        for frame in range(frames):
+            indexes, colors = deltas[frame]
+            for index, color in zip(indexes, colors):
+                pixels[index] = color
+            for index, color in enumerate(pixels):
+                strip.setPixelColor(index, color)
+            strip.show()
+
+    def ws281x_output(strip):
+        output = Ws281xOutput(strip)
+        for frame in range(frames):
+            output.write_pixels(*deltas[frame])
+            output.show()
+
+    results = {}
+    for name, play in (("per changed pixel", per_changed_pixel), ("every pixel", every_pixel),
+                       ("Ws281xOutput", ws281x_output)):
+        strip = CountingStrip(led_count)
+        start = time.perf_counter()
+        play(strip)
+        results[name] = (frames / (time.perf_counter() - start), strip.calls / frames)
+    return results
+
+
+"""
+Function: benchmark_animation - Plays a .ani through an output as fast as it can
+Expects: file_name be a .ani file and output a PanelOutput with as many pixels as the animation
+Does: Returns (frames per second, p50 ms, p99 ms) for writing and showing each frame
+"""
+def benchmark_animation(file_name, output):
+    from animation_cache import decode_animation
+
+    animation = decode_animation(file_name)
+    frame_times_ns = []
+    start = time.perf_counter()
+    for indexes, colors in animation.frames:
+        frame_start_ns = time.monotonic_ns()
+        output.write_pixels(indexes, colors)
+        output.show()
+        frame_times_ns.append(time.monotonic_ns() - frame_start_ns)
+    elapsed = time.perf_counter() - start
+
+    if not frame_times_ns:
+        return 0.0, 0.0, 0.0
+    ordered = sorted(frame_times_ns)
+    percentile = lambda p: ordered[int(round((len(ordered) - 1) * p / 100))] / 1000000
+    return len(ordered) / elapsed, percentile(50), percentile(99)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1].lower().endswith(".ani"):
+        from ani_format import read_ani_header
+
+        side_length = read_ani_header(sys.argv[1])[3]
+        output = create_output(sys.argv[2] if len(sys.argv) > 2 else "null", side_length * side_length, side_length, 3)
+        try:
+            fps, p50, p99 = benchmark_animation(sys.argv[1], output)
+        finally:
+            output.close()
+        print(f"{sys.argv[1]}: {fps:.0f} fps, p50 {p50:.3f} ms, p99 {p99:.3f} ms per frame")
+    else:
+        led_count = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+        frames = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        changed = int(sys.argv[3]) if len(sys.argv) > 3 else max(led_count // 16, 1)
+
+        per_pixel, bulk = benchmark(MemoryOutput(led_count), frames)
+        print(f"{led_count} leds: {per_pixel:.0f} fps per pixel, {bulk:.0f} fps bulk")
+        for name, (fps, calls) in benchmark_ws281x_push(led_count, frames, changed).items():
+            print(f"ws281x push of {changed} changed pixels, {name}: {fps:.0f} fps, {calls:.0f} strip calls per frame")
@@ -0,0 +1,110 @@
+"""
+perceptual_delta.py - Lossy "only update necessary pixels" that skips color changes too small to see
+
+Pixels are compared in CIELAB where the distance between two colors (delta E, CIE76) roughly follows how different they
+look, about 2.3 being a just noticeable difference. A pixel is only updated when the color it should have is more than
+threshold away from the color the panel is already showing for it. Changes that are skipped aren't forgotten, every frame
+a pixel is left showing the wrong color its delta E is added to an accumulated error and once that passes max_error the
+pixel is updated anyway, so slow drifts (fades, gradients) still land on the right color.
+
+A threshold of 0 is lossless (any change is an update) and behaves exactly like the plain comparison.
+
+"""
+
+import numpy as np
+
+
+# sRGB value -> linear light, the gamma curve only has 256 inputs so it is a table lookup
+_SRGB_TO_LINEAR = np.where(
+    np.arange(256) / 255 <= 0.04045,
+    np.arange(256) / 255 / 12.92,
+    ((np.arange(256) / 255 + 0.055) / 1.055) ** 2.4,
+)
+
+# linear sRGB -> XYZ already divided by the D65 white point
+_LINEAR_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+]) / np.array([[0.95047], [1.0], [1.08883]])
+
+
+"""
+Function: srgb_to_lab - Converts sRGB colors to CIELAB
+Expects: colors be a (..., 3) array of 0-255 RGB values
+Does: Returns a (..., 3) float array of L*, a*, b*
+"""
+def srgb_to_lab(colors):
+    linear = _SRGB_TO_LINEAR[np.asarray(colors, dtype=np.uint8)]
+    xyz = linear @ _LINEAR_TO_XYZ.T
+
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack((116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])), axis=-1)
+
+
+"""
+Class: PerceptualDelta - Decides which pixels of each frame of one .ani need updating
+Expects: threshold be the delta E a change has to exceed to be written (0 for lossless), max_error the accumulated
+delta E that forces an update (defaults to 4 * threshold), and record_bytes the size of one written update (for report)
+Does: changed_mask() returns the pixels to write for the next frame and keeps track of what the panel shows, reset() is
+called when a full frame is written, and report() describes the updates (and bytes) saved over lossless encoding
+
+"""
+class PerceptualDelta:
+    def __init__(self, threshold, max_error=None, record_bytes=None):
+        self.threshold = threshold
+        self.max_error = 4 * threshold if max_error is None else max_error
+        self.record_bytes = record_bytes
+
+        # what the panel is showing (strip order) once the frames written so far are played
+        self.shown = None
+        self.shown_lab = None
+        self.error = None
+
+        self.frames = 0
+        self.updates = 0
+        self.lossless_updates = 0
+
+    # the panel now shows strip (a full frame was written)
+    def reset(self, strip):
+        self.shown = np.array(strip, dtype=np.uint8)
+        self.shown_lab = srgb_to_lab(self.shown)
+        self.error = np.zeros(len(self.shown))
+
+    # returns a boolean mask of the strip indexes of current_strip that have to be written
+    def changed_mask(self, previous_strip, current_strip):
+        current_strip = np.asarray(current_strip, dtype=np.uint8)
+        if self.shown is None:
+            self.reset(previous_strip)
+
+        lossless_mask = (np.asarray(previous_strip) != current_strip).any(axis=1)
+        self.frames += 1
+        self.lossless_updates += int(np.count_nonzero(lossless_mask))
+
+        if self.threshold <= 0:
+            mask = (self.shown != current_strip).any(axis=1)
+            self.shown[mask] = current_strip[mask]
+            self.updates += int(np.count_nonzero(mask))
+            return mask
+
+        current_lab = srgb_to_lab(current_strip)
+        difference = np.sqrt(((current_lab - self.shown_lab) ** 2).sum(axis=1))
+
+        # pixels left showing the wrong color build up error until they're forced out
+        self.error += difference
+        mask = (difference > self.threshold) | (self.error > self.max_error)
+
+        self.shown[mask] = current_strip[mask]
+        self.shown_lab[mask] = current_lab[mask]
+        self.error[mask] = 0
+        self.updates += int(np.count_nonzero(mask))
+        return mask
+
+    def report(self):
+        saved = self.lossless_updates - self.updates
+        percent = 100 * saved / self.lossless_updates if self.lossless_updates else 0.0
+        report = (f"{self.updates} pixel updates over {self.frames} delta frames, {saved} ({percent:.1f}%) saved "
+                  f"at delta E {self.threshold}")
+        if self.record_bytes is not None:
+            report += f", {saved * self.record_bytes} bytes saved"
+        return report
@@ -0,0 +1,97 @@
+"""
+playlist_index.py - In memory listing of a directory of .ani files (the random gif carousel)
+
+The directory is listed once and only listed again when its modification time changes (a file was added, removed, or
+renamed). With watch() the modification time is checked on a background thread so callers (network commands holding
+the panels lock) never do any filesystem work, they only read the current snapshot.
+
+"""
+
+import os
+import threading
+import time
+
+
+"""
+Function_Helper: list_directory_files - Given a directory it returns a sorted list of all the files in the directory
+Expects: Expects nothing (missing or unreadable directories are reported and treated as empty)
+Does: Returns a sorted list of all files in the directory (excluding subdirectories and hidden files such as the
+temporary files .ani files are written to)
+"""
+def list_directory_files(directory):
+    try:
+        files = [
+            file
+            for file in os.listdir(directory)
+            if not file.startswith(".") and os.path.isfile(os.path.join(directory, file))
+        ]
+        return sorted(files)  # Sort the files to ensure consistent order
+    except FileNotFoundError:
+        print(f"The directory {directory} was not found.")
+        return []
+    except PermissionError:
+        print(f"Permission denied to access {directory}.")
+        return []
+
+
+"""
+Class: PlaylistIndex - a cached sorted listing of a directory with O(1) length, position, and name lookups
+Expects: directory be the folder holding the playlist and poll_interval the seconds between watch() checks
+Does: Lists the directory on creation and again whenever refresh() sees the directory's mtime change
+
+"""
+class PlaylistIndex:
+    def __init__(self, directory, poll_interval=2.0):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._mtime_ns = -1
+        # (sorted file names, name -> position) swapped as one object so readers never see half a refresh
+        self._listing = ([], {})
+        self._watch_thread = None
+        self.refresh()
+
+    def __len__(self):
+        return len(self._listing[0])
+
+    def __getitem__(self, position):
+        return self._listing[0][position]
+
+    # full path of the file at position (wrapped so a position left over from before a removal stays valid)
+    def path(self, position):
+        files = self._listing[0]
+        return os.path.join(self.directory, files[position % len(files)])
+
+    # position of the named file or None if it isn't in the playlist
+    def position_of(self, file_name):
+        return self._listing[1].get(file_name)
+
+    # returns the current snapshot of the file names
+    def files(self):
+        return list(self._listing[0])
+
+    # lists the directory again if it changed since the last listing, returns True if the listing changed
+    def refresh(self):
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+
+        if mtime_ns == self._mtime_ns:
+            return False
+
+        files = list_directory_files(self.directory)
+        self._listing = (files, {file: position for position, file in enumerate(files)})
+        self._mtime_ns = mtime_ns
+        return True
+
+    # starts a daemon thread that calls refresh every poll_interval seconds
+    def watch(self):
+        if self._watch_thread is None:
+            self._watch_thread = threading.Thread(target=self._watch_loop, daemon=True)
+            self._watch_thread.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            if self.refresh():
+                print(f"Playlist {self.directory} now has {len(self)} files")
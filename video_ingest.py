@@ -0,0 +1,157 @@
+"""
+video_ingest.py - Streams the frames of a video (or any multi frame image) resized to the panel and resampled to an fps
+
+Frames move through a chain of generators, read -> resample in time -> shrink to the panel, so only the frame being
+converted (and the one before it) is ever held in memory no matter how long the clip is. Frames the resampling drops are
+never converted or shrunk. Sources can be
+
+    multi frame images PIL decodes (animated PNG, animated WebP, multi page TIFF, GIF) using each frames duration
+    MJPEG streams (.mjpeg/.mjpg, back to back JPEGs) split on the JPEG end markers as the file is read in chunks
+    folders of numbered images (frame1.png, frame2.png, ...) played at a given source fps
+
+Frames are cropped to a centered square before they're shrunk so wide video isn't squashed, JPEG frames are decoded
+straight at a reduced scale (Image.draft) as only side_length pixels of them are kept anyway.
+
+"""
+
+import io
+import os
+import re
+
+from PIL import Image, ImageOps, ImageSequence
+
+
+MJPEG_EXTENSIONS = (".mjpeg", ".mjpg")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".webp")
+
+# bytes read from a MJPEG stream at a time
+MJPEG_CHUNK_SIZE = 1 << 16
+
+JPEG_START = b"\xff\xd8"
+JPEG_END = b"\xff\xd9"
+
+
+"""
+Function_Helper: numbered_image_paths - Returns the images of a folder in the order of the numbers in their names
+Expects: folder_path be a folder of images named with a frame number (1.png, frame_0002.jpg, ...)
+Does: Returns the image paths sorted by the last number in each name (names without one sort after, alphabetically)
+"""
+def numbered_image_paths(folder_path):
+    def frame_number(filename):
+        numbers = re.findall(r"\d+", filename)
+        return (0, int(numbers[-1]), filename) if numbers else (1, 0, filename)
+
+    filenames = [
+        filename for filename in os.listdir(folder_path)
+        if filename.lower().endswith(IMAGE_EXTENSIONS) and not filename.startswith(".")
+    ]
+    return [os.path.join(folder_path, filename) for filename in sorted(filenames, key=frame_number)]
+
+
+"""
+Function_Helper: iter_mjpeg_frames - Yields the JPEG frames of a MJPEG stream without reading the whole file
+Expects: file_path point to a file of back to back JPEG images
+Does: Yields each frame as an opened PIL image, at most one frame plus one chunk of the file is held at a time
+"""
+def iter_mjpeg_frames(file_path):
+    buffer = bytearray()
+    search_from = 0
+    with open(file_path, "rb") as file:
+        while True:
+            chunk = file.read(MJPEG_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+
+            while True:
+                start = buffer.find(JPEG_START)
+                if start < 0:
+                    # keep a trailing 0xff in case the marker is split across chunks
+                    del buffer[:max(len(buffer) - 1, 0)]
+                    search_from = 0
+                    break
+
+                end = buffer.find(JPEG_END, max(search_from, start + 2))
+                if end < 0:
+                    del buffer[:start]
+                    search_from = max(len(buffer) - 1, 2)
+                    break
+
+                yield Image.open(io.BytesIO(bytes(buffer[start:end + 2])))
+                del buffer[:end + 2]
+                search_from = 0
+
+
+"""
+Function: iter_source_frames - Yields every frame of a video source with how long it's shown
+Expects: source_path point to a multi frame image, a MJPEG stream, or a folder of numbered images and source_fps be the
+fps used for frames that don't carry a duration (every MJPEG and folder frame)
+Does: Yields (frame, duration in ms) for each frame, the frame is a PIL image only valid until the next one is asked for
+"""
+def iter_source_frames(source_path, source_fps):
+    default_duration = 1000 / float(source_fps)
+
+    if os.path.isdir(source_path):
+        for image_path in numbered_image_paths(source_path):
+            with Image.open(image_path) as image:
+                yield image, default_duration
+
+    elif source_path.lower().endswith(MJPEG_EXTENSIONS):
+        for image in iter_mjpeg_frames(source_path):
+            yield image, default_duration
+
+    else:
+        with Image.open(source_path) as video:
+            for frame in ImageSequence.Iterator(video):
+                yield frame, frame.info.get("duration") or default_duration
+
+
+"""
+Function_Helper: fit_frame - Shrinks a frame to the panel
+Expects: frame be a PIL image and side_length the panels side length
+Does: Returns a side_length by side_length RGB image of the frames centered square
+"""
+def fit_frame(frame, side_length):
+    # JPEG decoding can skip straight to a smaller scale (it only ever goes down to at least the requested size)
+    if frame.format == "JPEG":
+        frame.draft("RGB", (side_length, side_length))
+
+    return ImageOps.fit(frame.convert("RGB"), (side_length, side_length), Image.LANCZOS)
+
+
+"""
+Function: resample_frames - Resamples timed frames to a fixed fps
+Expects: timed_frames be an iterable of (frame, duration in ms) and target_fps greater than 0
+Does: Yields (frame, repeats), how many 1 / target_fps steps of the output show each frame. Slower sources repeat
+frames and faster ones get repeats of 0 (those frames can be skipped without converting them)
+"""
+def resample_frames(timed_frames, target_fps):
+    interval = 1000 / float(target_fps)
+    output_steps = 0
+    source_end = 0.0
+
+    for frame, duration in timed_frames:
+        source_end += duration
+        # the frame covers [source_end - duration, source_end), every output step starting in there shows it
+        repeats = 0
+        while output_steps * interval < source_end:
+            repeats += 1
+            output_steps += 1
+        yield frame, repeats
+
+
+"""
+Function: stream_video - Streams the frames of a video source ready to be written to a .ani
+Expects: source_path be as iter_source_frames expects, side_length the panels side length, target_fps the .ani fps,
+and source_fps the fps of sources that don't carry frame durations (defaults to target_fps)
+Does: Yields side_length by side_length RGB images at target_fps, one at a time as the source is read
+"""
+def stream_video(source_path, side_length, target_fps, source_fps=None):
+    if source_fps is None:
+        source_fps = target_fps
+
+    for frame, repeats in resample_frames(iter_source_frames(source_path, source_fps), target_fps):
+        if repeats:
+            fitted = fit_frame(frame, side_length)
+            for _ in range(repeats):
+                yield fitted